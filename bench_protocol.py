@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+protocol.py 微基准测试和黄金向量校验
+每个被测函数在真实输入上运行（所有寄存器类型、2KB升级包、各种错误应答），
+报告每次调用的耗时(ns/op)和内存分配情况
+
+用法:
+    python bench_protocol.py                          # 校验黄金向量并运行微基准
+    python bench_protocol.py --output proto.json      # 保存结果
+    python bench_protocol.py --baseline proto.json    # 任一函数变慢超过阈值时返回1
+    python bench_protocol.py --golden-only            # 只校验黄金向量
+    python bench_protocol.py --regen-golden           # 协议有意变更后重新生成黄金向量
+黄金向量不一致时返回2
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from protocol import (
+    calculate_crc16, generate_read_command, generate_write_command, parse_response,
+    pack_value_by_type, unpack_value_by_type, generate_upgrade_packets,
+    generate_upgrade_crc_command, generate_e0_handshake, generate_status_response,
+    get_type_info, validate_value_for_type,
+)
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protocol_golden.json')
+
+TYPES = ['int8_t', 'uint8_t', 'int16_t', 'uint16_t', 'int32_t', 'uint32_t', 'float']
+
+def crc16_reference(data, length):
+    """逐位计算的CRC-16-CCITT参考实现（与最初的 protocol.calculate_crc16 相同）"""
+    crc = 0xFFFF
+    for i in range(length):
+        crc ^= (data[i] << 8) & 0xFFFF
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x11021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
+def _frame(body):
+    body = bytearray(body)
+    crc = crc16_reference(body, len(body))
+    return bytes(body + bytes([(crc >> 8) & 0xFF, crc & 0xFF]))
+
+def _type_values(type_str):
+    if type_str == 'float':
+        return [0.0, 1.5, -3.25, 3.4e38, -3.4e38, 1e-30, 123.456]
+    info = get_type_info(type_str)
+    values = [info['min'], info['max'], 0, 1, (info['min'] + info['max']) // 2]
+    if info['min'] < 0:
+        values.append(-1)
+    # 超出范围的值也记录下来，保证截断行为不变
+    values.append(info['max'] + 1)
+    return values
+
+def _call(fn, *args, **kwargs):
+    """调用函数，返回可JSON序列化的结果；异常记录为异常类型"""
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        return {'error': type(e).__name__, 'message': str(e)}
+    if isinstance(result, (bytes, bytearray)):
+        return bytes(result).hex()
+    return result
+
+def _malformed_responses():
+    ok_read = _frame([0x5A, 0x11, 0x00, 0x06, 0x10, 0x00, 0x00, 0x00, 0x01, 0x2C])
+    return {
+        'read_ok': (ok_read, {'expected_addr': 0x1000, 'data_type': 'int16_t'}),
+        'read_ok_float': (_frame([0x5A, 0x11, 0x00, 0x06, 0x12, 0x34, 0x3F, 0xC0, 0x00, 0x00]), {'data_type': 'float'}),
+        'read_addr_mismatch': (ok_read, {'expected_addr': 0x1004}),
+        'status_ok_write': (_frame([0x5A, 0xF1, 0x00, 0x02, 0x20, 0x00]), {'is_write': True}),
+        'status_error': (_frame([0x5A, 0xF1, 0x00, 0x02, 0x20, 0xF3]), {'is_write': True}),
+        'status_error_read': (_frame([0x5A, 0xF1, 0x00, 0x02, 0x10, 0xF2]), {}),
+        'too_short': (bytes([0x5A, 0x11, 0x00]), {}),
+        'bad_head': (bytes([0xA5]) + ok_read[1:], {}),
+        'bad_crc': (ok_read[:-1] + bytes([ok_read[-1] ^ 0xFF]), {}),
+        'data_for_write': (ok_read, {'is_write': True}),
+        'bad_read_len': (_frame([0x5A, 0x11, 0x00, 0x04, 0x10, 0x00, 0x00, 0x00]), {}),
+        'truncated_read': (_frame([0x5A, 0x11, 0x00, 0x06, 0x10, 0x00, 0x00, 0x00]), {}),
+        'bad_status_len': (_frame([0x5A, 0xF1, 0x00, 0x03, 0x20, 0x00, 0x00]), {}),
+        'unknown_type': (_frame([0x5A, 0x77, 0x00, 0x02, 0x20, 0x00]), {}),
+    }
+
+def _golden_inputs():
+    rng = random.Random(20240601)
+    crc_inputs = [b'', bytes(range(256)), bytes(2048), b'\xff' * 2048]
+    crc_inputs += [bytes([b]) for b in range(256)]
+    crc_inputs += [bytes(rng.getrandbits(8) for _ in range(rng.randint(1, 4096))) for _ in range(20)]
+    addrs = [0x0000, 0x0001, 0x1000, 0x1234, 0x7FFF, 0x8000, 0xFFFF, 0x12345]
+    try:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uart_command_set.json'),
+                  'r', encoding='utf-8') as f:
+            addrs += sorted({int(item['index'], 16) for item in json.load(f)})
+    except (OSError, ValueError, KeyError):
+        pass
+    raw_samples = [bytes.fromhex(h) for h in (
+        '00000000', 'ffffffff', '0000007f', '00000080', '000000ff', '00007fff', '00008000',
+        '0000ffff', '7fffffff', '80000000', '3fc00000', 'ff7fffff', '12345678', 'deadbeef')]
+    bins = [bytes(rng.getrandbits(8) for _ in range(n)) for n in (2048, 4096, 5000)]
+    return crc_inputs, addrs, raw_samples, bins
+
+def build_golden():
+    crc_inputs, addrs, raw_samples, bins = _golden_inputs()
+    golden = {'crc16': [], 'read_command': [], 'write_command': [], 'pack': [], 'unpack': [],
+              'validate': [], 'parse_response': {}, 'upgrade': [], 'misc': {}}
+    # 输入由固定种子生成，只保存 [长度, CRC]
+    for data in crc_inputs:
+        golden['crc16'].append([len(data), calculate_crc16(data, len(data))])
+        if len(data) > 4:
+            # 只计算前一部分长度
+            golden['crc16'].append([4, calculate_crc16(data, 4)])
+    for addr in addrs:
+        golden['read_command'].append([addr, _call(generate_read_command, addr)])
+    for type_str in TYPES + ['unknown_t']:
+        for value in _type_values(type_str if type_str != 'unknown_t' else 'int32_t'):
+            golden['write_command'].append([0x1008, value, type_str, _call(generate_write_command, 0x1008, value, type_str)])
+            golden['pack'].append([value, type_str, _call(pack_value_by_type, value, type_str)])
+        for text in ('0', '-1', '12', '1.5', 'abc', '', '300', '-129', '65535', '1e3'):
+            golden['validate'].append([text, type_str, _call(validate_value_for_type, text, type_str)])
+        for raw in raw_samples:
+            golden['unpack'].append([raw.hex(), type_str, _call(unpack_value_by_type, raw, type_str)])
+    golden['unpack'].append(['0102', 'int16_t', _call(unpack_value_by_type, b'\x01\x02', 'int16_t')])
+    golden['write_command'].append([0x1008, 'abc', 'int16_t', _call(generate_write_command, 0x1008, 'abc', 'int16_t')])
+    for name, (response, kwargs) in _malformed_responses().items():
+        golden['parse_response'][name] = [response.hex(), kwargs, _call(parse_response, response, **kwargs)]
+    for data in bins:
+        packets = generate_upgrade_packets(data)
+        golden['upgrade'].append({
+            'sha256_in': hashlib.sha256(data).hexdigest(),
+            'size': len(data),
+            'packets': len(packets),
+            'packets_sha256': hashlib.sha256(b''.join(bytes(p) for p in packets)).hexdigest(),
+            'first_packet_head': bytes(packets[0][:16]).hex(),
+            'packet_crcs': [bytes(p[-2:]).hex() for p in packets],
+            'crc_command': _call(generate_upgrade_crc_command, data, len(packets)),
+        })
+    golden['misc']['e0_handshake'] = _call(generate_e0_handshake)
+    golden['misc']['status_responses'] = [[f, s, _call(generate_status_response, f, s)]
+                                          for f in (0x10, 0x20, 0x30, 0x31, 0x40, 0x50, 0x60)
+                                          for s in (0x00, 0xF0, 0xF1, 0xF8)]
+    return golden, bins
+
+def check_golden(path=GOLDEN_FILE):
+    """与保存的黄金向量逐项比较，返回不一致项列表"""
+    with open(path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    current, _ = build_golden()
+    mismatches = []
+    def cmp(section, key, a, b):
+        # 经过JSON规范化后比较（NaN != NaN，元组与列表等）
+        if json.dumps(a, sort_keys=True) != json.dumps(b, sort_keys=True):
+            mismatches.append(f"{section}[{key}]: expected {a!r}, got {b!r}")
+    for section in ('crc16', 'read_command', 'write_command', 'pack', 'unpack', 'validate', 'upgrade'):
+        if len(saved[section]) != len(current[section]):
+            mismatches.append(f"{section}: {len(saved[section])} vectors saved, {len(current[section])} generated")
+            continue
+        for i, (a, b) in enumerate(zip(saved[section], current[section])):
+            cmp(section, i, a, b)
+    for name, vector in saved['parse_response'].items():
+        cmp('parse_response', name, vector, current['parse_response'].get(name))
+    cmp('misc', 'all', saved['misc'], current['misc'])
+    # 随机输入与逐位参考实现交叉校验
+    rng = random.Random()
+    for _ in range(200):
+        data = bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 300)))
+        n = rng.randint(0, len(data))
+        cmp('crc16_random', data[:8].hex(), crc16_reference(data, n), calculate_crc16(data, n))
+    return mismatches
+
+# ---------------- 微基准 ----------------
+
+def _bench(fn, args_list, min_time=0.2, repeats=9):
+    """
+    返回 (ns/op, peak_bytes/op, blocks/op)
+    peak_bytes: 单次调用期间tracemalloc观察到的峰值内存增量（临时分配）
+    blocks: 保留全部返回值时每次调用新增的内存块数（返回对象的分配个数）
+    """
+    n_args = len(args_list)
+    # 校准循环次数
+    loops = 1
+    while True:
+        t0 = time.perf_counter_ns()
+        for i in range(loops):
+            fn(*args_list[i % n_args])
+        elapsed = time.perf_counter_ns() - t0
+        if elapsed >= min_time * 1e9 / repeats or loops >= 1 << 24:
+            break
+        loops *= 4
+    best = None
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            t0 = time.perf_counter_ns()
+            for i in range(loops):
+                fn(*args_list[i % n_args])
+            per_op = (time.perf_counter_ns() - t0) / loops
+            best = per_op if best is None else min(best, per_op)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        peaks = []
+        for args in args_list[:64]:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        peak = sum(peaks) / len(peaks)
+    finally:
+        tracemalloc.stop()
+
+    sample = min(n_args, 256)
+    keep = []
+    gc.collect()
+    before = sys.getallocatedblocks()
+    for args in args_list[:sample]:
+        keep.append(fn(*args))
+    blocks = (sys.getallocatedblocks() - before - 1) / sample  # 减去keep列表自身
+    return best, peak, max(0.0, blocks)
+
+def _response(fun, body):
+    return _frame([0x5A, fun, (len(body) >> 8) & 0xFF, len(body) & 0xFF] + list(body))
+
+def build_cases(bins):
+    rng = random.Random(7)
+    addrs = [0x1000 + 4 * i for i in range(241)]
+    read_frame = bytes(generate_read_command(0x1000))
+    write_frame = bytes(generate_write_command(0x1000, 1234, 'int16_t'))
+    upgrade_frame = bytes(generate_upgrade_packets(bins[0])[0])
+    image_256k = bytes(rng.getrandbits(8) for _ in range(256 * 1024))
+    cases = {
+        'calculate_crc16/read_frame_6B': (calculate_crc16, [(read_frame[:6], 6)]),
+        'calculate_crc16/write_frame_10B': (calculate_crc16, [(write_frame[:10], 10)]),
+        'calculate_crc16/upgrade_frame_2054B': (calculate_crc16, [(upgrade_frame[:-2], len(upgrade_frame) - 2)]),
+        'calculate_crc16/image_256KB': (calculate_crc16, [(image_256k, len(image_256k))]),
+        'generate_read_command': (generate_read_command, [(a,) for a in addrs]),
+        'generate_upgrade_packets/2KB': (generate_upgrade_packets, [(bins[0],)]),
+        'generate_upgrade_packets/256KB': (generate_upgrade_packets, [(image_256k,)]),
+        'generate_upgrade_crc_command/256KB': (generate_upgrade_crc_command, [(image_256k, 128)]),
+    }
+    for type_str in TYPES:
+        values = _type_values(type_str)[:-1]
+        raws = [pack_value_by_type(v, type_str) for v in values]
+        cases[f'generate_write_command/{type_str}'] = (
+            generate_write_command, [(addrs[i % len(addrs)], v, type_str) for i, v in enumerate(values)])
+        cases[f'pack_value_by_type/{type_str}'] = (pack_value_by_type, [(v, type_str) for v in values])
+        cases[f'unpack_value_by_type/{type_str}'] = (unpack_value_by_type, [(r, type_str) for r in raws])
+        cases[f'parse_response/read_{type_str}'] = (
+            parse_response, [(_response(0x11, [0x10, 0x00] + list(r)), False, 0x1000, type_str) for r in raws])
+    cases['parse_response/status'] = (parse_response, [(_response(0xF1, [0x20, 0x00]), True)])
+    malformed = _malformed_responses()
+    def parse_malformed(response, kwargs):
+        try:
+            parse_response(response, **kwargs)
+        except ValueError:
+            pass
+    cases['parse_response/malformed'] = (parse_malformed, [
+        malformed[k] for k in ('too_short', 'bad_head', 'bad_crc', 'bad_read_len', 'unknown_type')])
+    return cases
+
+def run_microbench(min_time):
+    _, bins = build_golden()
+    results = {}
+    for name, (fn, args_list) in build_cases(bins).items():
+        ns, peak, blocks = _bench(fn, args_list, min_time)
+        results[name] = {'ns_per_op': round(ns, 1), 'peak_bytes_per_op': round(peak, 1),
+                         'blocks_per_op': round(blocks, 2)}
+        print(f"{name:<42} {ns:>14,.1f} ns/op {peak:>10,.0f} B peak {blocks:>6.2f} blocks/op", flush=True)
+    return results
+
+def compare(current, baseline, threshold, min_delta_ns=150.0):
+    """变慢超过相对阈值且绝对差值超过 min_delta_ns（计时噪声下限）时视为退化"""
+    regressions = []
+    for name, metrics in current.items():
+        old = baseline.get(name, {}).get('ns_per_op')
+        new = metrics['ns_per_op']
+        if old and (new - old) / old > threshold and new - old > min_delta_ns:
+            regressions.append((name, old, new, (new - old) / old))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="protocol.py microbenchmarks and golden vector check")
+    parser.add_argument('--output', help="write results JSON to this file")
+    parser.add_argument('--baseline', help="compare ns/op against a saved results JSON")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="relative slowdown counted as a regression (default 0.25)")
+    parser.add_argument('--min-delta-ns', type=float, default=150.0,
+                        help="ignore slowdowns smaller than this many ns/op (timer noise)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds per case (approximate)")
+    parser.add_argument('--golden-only', action='store_true')
+    parser.add_argument('--regen-golden', action='store_true',
+                        help="rewrite protocol_golden.json from the current implementation")
+    args = parser.parse_args()
+
+    if args.regen_golden:
+        golden, _ = build_golden()
+        with open(GOLDEN_FILE, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, indent=1)
+        print(f"golden vectors written to {GOLDEN_FILE}")
+        return 0
+
+    mismatches = check_golden()
+    if mismatches:
+        for m in mismatches[:50]:
+            print("GOLDEN MISMATCH", m)
+        print(f"{len(mismatches)} golden vector mismatches")
+        return 2
+    print("golden vectors: OK")
+    if args.golden_only:
+        return 0
+
+    results = {
+        'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'python': platform.python_version(), 'platform': platform.platform()},
+        'cases': run_microbench(args.min_time),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results['cases'], baseline['cases'], args.threshold, args.min_delta_ns)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:,.1f} -> {new:,.1f} ns/op ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
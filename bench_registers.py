@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+大寄存器表的扩展性基准测试
+按 uart_command_set.json 中模块/子模块大小、数据类型和读写权限的实际分布生成合成寄存器表（1千、1万、10万个寄存器），
+逐层测量：JSON解析、ItemManager.load_items（编译/读缓存）、organize_items、地址表、搜索索引、
+每个寄存器占用的内存，以及（--gui，需要显示器）寄存器表建表、折叠/展开和切换语言的耗时。
+地址按 模块 0x1000、子模块 0x100 排布，约4千个寄存器后 index 会超过 0xFFFF（协议帧中地址只有16位），
+这样的表只用于测量上位机各层的扩展性
+
+用法:
+    python bench_registers.py                                   # 1000 10000 100000
+    python bench_registers.py --sizes 1000 50000 --gui --output registers.json
+    python bench_registers.py --generate 10000 --map-output big.json    # 只生成寄存器表
+"""
+import argparse
+import collections
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from protocol import generate_read_command, generate_write_command
+import register_map
+from register_map import RegisterMap
+from item_manager import ItemManager
+from register_search import RegisterSearchIndex
+from utils import get_resource_path
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+def _hex_bytes(data):
+    return ' '.join(f"{b:02X}" for b in data)
+
+class MapProfile:
+    """实际寄存器表的分布：子模块大小、每个模块的子模块数、数据类型、权限、模块/子模块/寄存器名称"""
+    def __init__(self, items):
+        self.types = collections.Counter(item.get('type', 'int32_t') for item in items)
+        self.permissions = collections.Counter(item.get('permission', 'R') for item in items)
+        modules = collections.OrderedDict()
+        for item in items:
+            module = modules.setdefault((item.get('Module', ''), item.get('模块', '')), collections.OrderedDict())
+            module.setdefault((item.get('Submodule', ''), item.get('子模块', '')), []).append(item)
+        self.module_names = list(modules)
+        self.submodule_names = [name for submodules in modules.values() for name in submodules]
+        self.submodule_sizes = [len(regs) for submodules in modules.values() for regs in submodules.values()]
+        self.submodule_counts = [len(submodules) for submodules in modules.values()]
+        self.item_names = [(item.get('item', ''), item.get('项目', '')) for item in items]
+
+def generate_register_map(count, profile=None, seed=0):
+    """生成 count 个寄存器，字段与 uart_command_set.json 相同"""
+    if profile is None:
+        with open(get_resource_path('uart_command_set.json'), 'r', encoding='utf-8') as f:
+            profile = MapProfile(json.load(f))
+    rng = random.Random(seed)
+    types, type_weights = zip(*profile.types.items())
+    perms, perm_weights = zip(*profile.permissions.items())
+    items = []
+    module_no = 0
+    while len(items) < count:
+        module_en, module_cn = profile.module_names[module_no % len(profile.module_names)]
+        suffix = f" {module_no // len(profile.module_names)}" if module_no >= len(profile.module_names) else ''
+        module_base = 0x1000 * (module_no + 1)
+        # 每个模块最多 16 个子模块（0x100 间隔）
+        for sub_no in range(min(rng.choice(profile.submodule_counts), 16)):
+            if len(items) >= count:
+                break
+            sub_en, sub_cn = rng.choice(profile.submodule_names)
+            sub_base = 0x100 * sub_no
+            for offset in range(min(rng.choice(profile.submodule_sizes), 0x100, count - len(items))):
+                name_en, name_cn = profile.item_names[len(items) % len(profile.item_names)]
+                addr = module_base + sub_base + offset
+                data_type = rng.choices(types, type_weights)[0]
+                items.append({
+                    '模块': module_cn + suffix, 'Module': module_en + suffix, 'base addr': f"0x{module_base:04X}",
+                    '子模块': f"{sub_cn}_{sub_no}", 'Submodule': f"{sub_en}.{sub_no}", 'base addr.1': f"0x{sub_base:04X}",
+                    'addr': f"0x{offset:04X}", 'index': f"0x{addr:04X}",
+                    '项目': f"{name_cn}{len(items)}", 'item': f"{name_en}_{len(items)}",
+                    'permission': rng.choices(perms, perm_weights)[0], 'type': data_type,
+                    'write command': _hex_bytes(generate_write_command(addr & 0xFFFF, 0, data_type)),
+                    'read command': _hex_bytes(generate_read_command(addr)),
+                    'write data': '0',
+                })
+        module_no += 1
+    return items
+
+def _timed(fn, *args):
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def _traced(fn, *args):
+    """返回 (结果, 新分配并仍存活的字节数)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn(*args)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+def bench_size(count, workdir, gui_root=None):
+    items = generate_register_map(count)
+    path = os.path.join(workdir, f"uart_command_set_{count}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False, indent=1)
+    del items
+    with open(path, 'rb') as f:
+        data = f.read()
+    r = {'registers': count, 'json_kb': round(len(data) / 1024, 1)}
+    items, r['json_parse_ms'] = _timed(json.loads, data.decode('utf-8'))
+    _, r['compile_ms'] = _timed(RegisterMap, items)
+    # ItemManager：第一次解析并写缓存，第二次（清掉进程内缓存后）读 pickle 缓存
+    register_map._loaded.clear()
+    _, r['load_items_cold_ms'] = _timed(ItemManager, path)
+    register_map._loaded.clear()
+    manager, r['load_items_cached_ms'] = _timed(ItemManager, path)
+    _, r['organize_items_ms'] = _timed(manager.organize_items)
+    _, r['addr_map_ms'] = _timed(lambda: {int(item['index'], 16): item for item in manager.items})
+    _, r['search_index_ms'] = _timed(RegisterSearchIndex, manager.items)
+    # 内存（字节/寄存器）：json.loads 得到的 dict、由它编译的表（寄存器记录、层级、地址表、帧）、
+    # 从缓存加载的 ItemManager 实际保留的全部内存、搜索索引
+    items, item_bytes = _traced(json.loads, data.decode('utf-8'))
+    compiled, map_bytes = _traced(RegisterMap, items)
+    del items
+    register_map._loaded.clear()
+    manager, manager_bytes = _traced(ItemManager, path)
+    _, index_bytes = _traced(RegisterSearchIndex, manager.items)
+    r['bytes_per_register'] = {'json_dicts': item_bytes // count, 'register_map': map_bytes // count,
+                               'item_manager': manager_bytes // count, 'search_index': index_bytes // count}
+    if gui_root is not None:
+        r.update(bench_gui(gui_root, compiled))
+    register_map._loaded.clear()
+    try:
+        os.remove(register_map.cache_path(path))
+    except OSError:
+        pass
+    return r
+
+def bench_gui(root, compiled):
+    """寄存器表：建表（CellVar 和行模型）、折叠/展开第一个模块、切换语言，各自包含一次排布"""
+    from register_table import RegisterTable
+    table = RegisterTable(root)
+    table.pack(fill='both', expand=True)
+    root.update()
+    module_states, submodule_states = {}, {}
+    def build():
+        table.set_items(compiled.organized['EN'], module_states, submodule_states)
+        root.update()
+    _, build_ms = _timed(build)
+    first = next(iter(compiled.organized['EN']), None)
+    def toggle():
+        for state in (False, True):
+            module_states[first] = state
+            table.rows_changed()
+            root.update()
+    _, toggle_ms = _timed(toggle)
+    def switch():
+        for language in ('CN', 'EN'):
+            table.set_language(language, compiled.organized[language], module_states, submodule_states)
+            root.update()
+    _, switch_ms = _timed(switch)
+    table.destroy()
+    return {'gui_build_ms': build_ms, 'gui_toggle_ms': toggle_ms / 2, 'gui_language_ms': switch_ms / 2}
+
+COLUMNS = [
+    ('json_parse_ms', 'parse'), ('compile_ms', 'compile'), ('load_items_cold_ms', 'load cold'),
+    ('load_items_cached_ms', 'load cache'), ('organize_items_ms', 'organize'), ('addr_map_ms', 'addr map'),
+    ('search_index_ms', 'search idx'), ('gui_build_ms', 'gui build'), ('gui_toggle_ms', 'toggle'),
+    ('gui_language_ms', 'language'),
+]
+
+def print_table(results):
+    columns = [(key, title) for key, title in COLUMNS if any(key in r for r in results)]
+    print(f"{'registers':>10}" + ''.join(f"{title:>12}" for _, title in columns) + f"{'B/reg':>8}")     # ItemManager 保留的内存
+    for r in results:
+        memory = r['bytes_per_register']['item_manager']
+        print(f"{r['registers']:>10}" + ''.join(f"{r.get(key, 0):>9.1f} ms" for key, _ in columns) + f"{memory:>8}")
+    # 每个寄存器的耗时：随规模增大而上升的层就是不再线性扩展的层
+    print("\nper register (us):")
+    for r in results:
+        print(f"{r['registers']:>10}" + ''.join(f"{r.get(key, 0) * 1000 / r['registers']:>12.2f}" for key, _ in columns))
+    print("\nbytes per register: " + ', '.join(
+        f"{r['registers']}: " + '/'.join(f"{k} {v}" for k, v in r['bytes_per_register'].items()) for r in results))
+
+def main():
+    parser = argparse.ArgumentParser(description="Register map scalability benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--gui', action='store_true', help="also time the Tk register table (needs a display)")
+    parser.add_argument('--output', help="write results JSON to this file")
+    parser.add_argument('--generate', type=int, metavar='COUNT', help="only write a synthetic map with COUNT registers")
+    parser.add_argument('--map-output', help="file for --generate (default uart_command_set_COUNT.json)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.generate:
+        path = args.map_output or f"uart_command_set_{args.generate}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(generate_register_map(args.generate, seed=args.seed), f, ensure_ascii=False, indent=4)
+        print(f"{args.generate} registers written to {path}")
+        return 0
+
+    root = None
+    if args.gui:
+        import tkinter as tk
+        try:
+            root = tk.Tk()
+            root.geometry("1200x700")
+        except tk.TclError as e:
+            print(f"GUI timings skipped: {e}")
+    workdir = tempfile.mkdtemp(prefix='bench_registers_')
+    results = []
+    try:
+        for count in args.sizes:
+            results.append(bench_size(count, workdir, root))
+            print(f"{count} registers done", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if root is not None:
+            root.destroy()
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                                'python': platform.python_version(), 'platform': platform.platform()},
+                       'results': results}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+UARTService 端到端性能测试
+每个场景启动一个独立进程的仿真MCU（mcu_simulator.py --pty），UARTService 通过 pty 连接，
+因此 CPU 时间和内存只统计被测进程
+
+用法:
+    python bench_service.py                                 # 运行全部场景
+    python bench_service.py --scenarios read_all,upgrade    # 只运行部分场景
+    python bench_service.py --output bench.json             # 结果保存为JSON
+    python bench_service.py --baseline bench.json           # 与基线比较，退化超过阈值时返回1
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from item_manager import ItemManager
+from log_manager import LogManager
+from protocol import validate_value_for_type
+from register_model import PERM_WRITE, permission_flags
+from tracing import Tracer
+from uart_service import UARTService
+from utils import get_resource_path
+
+# 与基线比较时各指标的方向：True表示越大越好
+METRIC_DIRECTIONS = {
+    'throughput_ops_s': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'cpu_s': False,
+    'cpu_per_op_us': False,
+    'rss_growth_kb': False,
+}
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def current_rss_kb():
+    """当前常驻内存(KB)；没有 /proc 的平台返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+class RssSampler:
+    """
+    在后台线程中定期采样当前 RSS，得到这一段运行期间的峰值相对开始时的增长。
+    getrusage 的 ru_maxrss 是整个进程的历史峰值，前面场景的峰值会带到后面，不能按场景比较
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_kb = None
+        self.peak_kb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_kb = self.peak_kb = current_rss_kb()
+        if self.start_kb is not None:
+            self._thread = threading.Thread(target=self._run, name="RSS sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss_kb()
+        if rss is not None and self.peak_kb is not None:
+            self.peak_kb = max(self.peak_kb, rss)
+
+    @property
+    def growth_kb(self):
+        return None if self.start_kb is None else self.peak_kb - self.start_kb
+
+class SimulatorProcess:
+    """在子进程中运行 mcu_simulator.py，退出时自动结束"""
+    def __init__(self, *sim_args):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcu_simulator.py')
+        self.proc = subprocess.Popen([sys.executable, script, '--pty'] + [str(a) for a in sim_args],
+                                     stdout=subprocess.PIPE, text=True)
+        line = self.proc.stdout.readline().strip()
+        if ' on ' not in line:
+            self.close()
+            raise RuntimeError(f"simulator failed to start: {line!r}")
+        self.url = line.rsplit(' on ', 1)[1]
+        # 仿真器会周期性打印统计信息，持续读取避免管道写满
+        threading.Thread(target=self.proc.stdout.read, daemon=True).start()
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BenchContext:
+    def __init__(self, args):
+        self.args = args
+        self.items = ItemManager(json_file=get_resource_path('uart_command_set.json')).items
+        self.addr_map = {int(item['index'], 16): item for item in self.items}
+        self.log_lines = 0
+        # --trace 时所有场景共用一个 Tracer，结束后一起导出
+        self.tracer = Tracer() if getattr(args, 'trace', None) else None
+
+    def sim_args(self, *extra):
+        args = list(extra)
+        if self.args.baud:
+            args += ['--baud', self.args.baud]
+        if self.args.latency:
+            args += ['--latency', self.args.latency]
+        return args
+
+    def log_func(self, msg):
+        self.log_lines += 1
+
+    def connect(self, url, **kwargs):
+        kwargs.setdefault('log_func', self.log_func)
+        service = UARTService.from_url(url, addr_map=self.addr_map, **kwargs)
+        service.tracer = self.tracer
+        service.start_listener()
+        service.start_e0_handshake()
+        if not service.e0_handshake_stop.wait(5.0) or not service.is_mcu_connected():
+            self.disconnect(service)
+            raise RuntimeError("simulator handshake failed")
+        return service
+
+    @staticmethod
+    def disconnect(service):
+        service.e0_handshake_stop.set()
+        service.stop_listener()
+        service.uart.close()
+
+def _measure(run):
+    """运行 run()，返回 (结果, 墙钟时间, CPU时间, 运行期间RSS峰值的增长KB)"""
+    with RssSampler() as rss:
+        cpu0 = time.process_time()
+        t0 = time.perf_counter()
+        result = run()
+        wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    return result, wall, cpu, rss.growth_kb
+
+def _summary(ops, wall, cpu, latencies=None, rss_growth_kb=None, **extra):
+    lat = sorted(latencies or [])
+    result = {
+        'ops': ops,
+        'duration_s': round(wall, 4),
+        'throughput_ops_s': round(ops / wall, 2) if wall > 0 else None,
+        'cpu_s': round(cpu, 4),
+        'cpu_per_op_us': round(cpu * 1e6 / ops, 2) if ops else None,
+        'rss_growth_kb': rss_growth_kb,
+    }
+    if lat:
+        result['p50_ms'] = round(percentile(lat, 50) * 1000, 3)
+        result['p99_ms'] = round(percentile(lat, 99) * 1000, 3)
+    result.update(extra)
+    return result
+
+def _link_fields(service, since):
+    """这一轮的线路利用率和协议效率（见 link_budget.py）"""
+    report = service.link.report(since)
+    return {
+        'tx_utilisation': report['tx']['utilisation'],
+        'rx_utilisation': report['rx']['utilisation'],
+        'link_efficiency': report['efficiency'],
+    }
+
+def _writable(item):
+    """与界面相同：permission 中含 W 即可写（W、RW）"""
+    return bool(permission_flags(item.get('permission', 'R')) & PERM_WRITE)
+
+def _write_value(item):
+    value = validate_value_for_type(item.get('write data', '0'), item.get('type', 'int32_t'))
+    return 0 if value is None else value
+
+def _sync_call(fn, *args):
+    """调用 read_item/write_item 并返回 (result, error, latency)"""
+    out = {}
+    def cb(result, error=None):
+        out.setdefault('result', result)
+        out.setdefault('error', error)
+    t0 = time.perf_counter()
+    fn(*args, cb)
+    return out.get('result'), out.get('error'), time.perf_counter() - t0
+
+def bench_read_all(ctx):
+    with SimulatorProcess(*ctx.sim_args()) as sim:
+        service = ctx.connect(sim.url)
+        try:
+            latencies, errors = [], 0
+            def run():
+                nonlocal errors
+                for item in ctx.items:
+                    result, error, dt = _sync_call(service.read_item, item)
+                    latencies.append(dt)
+                    if error or not result or result['status'] != 'success':
+                        errors += 1
+            since = service.link.snapshot()
+            _, wall, cpu, rss = _measure(run)
+            link = _link_fields(service, since)
+        finally:
+            ctx.disconnect(service)
+    return _summary(len(ctx.items), wall, cpu, latencies, rss, errors=errors, **link)
+
+def bench_write_all(ctx):
+    writable = [item for item in ctx.items if _writable(item)]
+    with SimulatorProcess(*ctx.sim_args()) as sim:
+        service = ctx.connect(sim.url)
+        try:
+            latencies, errors = [], 0
+            def run():
+                nonlocal errors
+                for item in writable:
+                    result, error, dt = _sync_call(service.write_item, item, _write_value(item))
+                    latencies.append(dt)
+                    if error or not result or result['status'] != 'success':
+                        errors += 1
+            since = service.link.snapshot()
+            _, wall, cpu, rss = _measure(run)
+            link = _link_fields(service, since)
+        finally:
+            ctx.disconnect(service)
+    return _summary(len(writable), wall, cpu, latencies, rss, errors=errors, **link)
+
+def bench_cycle_send(ctx):
+    """与GUI循环发送相同的流程：每个寄存器先读，可写的再写，持续N秒"""
+    seconds = ctx.args.cycle_seconds
+    with SimulatorProcess(*ctx.sim_args()) as sim:
+        service = ctx.connect(sim.url)
+        try:
+            latencies, errors, cycles = [], 0, 0
+            def run():
+                nonlocal errors, cycles
+                deadline = time.perf_counter() + seconds
+                while time.perf_counter() < deadline:
+                    for item in ctx.items:
+                        if time.perf_counter() >= deadline:
+                            return
+                        result, error, dt = _sync_call(service.read_item, item)
+                        latencies.append(dt)
+                        errors += 1 if error else 0
+                        if _writable(item):
+                            result, error, dt = _sync_call(service.write_item, item, _write_value(item))
+                            latencies.append(dt)
+                            errors += 1 if error else 0
+                    cycles += 1
+            _, wall, cpu, rss = _measure(run)
+        finally:
+            ctx.disconnect(service)
+    return _summary(len(latencies), wall, cpu, latencies, rss, errors=errors, full_cycles=cycles)
+
+def bench_report_flood(ctx):
+    """MCU 以不同速率主动上报，统计上位机实际处理的上报帧"""
+    results = {}
+    seconds = ctx.args.report_seconds
+    batch = 8
+    for rate in ctx.args.report_rates:
+        updates = [0]
+        def on_update(addr, value):
+            updates[0] += 1
+        with SimulatorProcess(*ctx.sim_args('--report-rate', rate, '--report-batch', batch)) as sim:
+            service = ctx.connect(sim.url, gui_update_callback=on_update,
+                                  response_40_50_getter=lambda: True)
+            try:
+                updates[0] = 0
+                _, wall, cpu, rss = _measure(lambda: time.sleep(seconds))
+            finally:
+                ctx.disconnect(service)
+        frames = updates[0] / batch
+        results[f"rate_{rate:g}"] = _summary(
+            int(frames), wall, cpu, rss_growth_kb=rss,
+            expected_frames=int(rate * seconds),
+            registers_updated=updates[0],
+            delivered_ratio=round(frames / (rate * seconds), 3) if rate else None)
+    return results
+
+def bench_file_logging(ctx):
+    """最高上报速率下，日志写文件开/关时监听线程的处理能力"""
+    results = {}
+    seconds = ctx.args.report_seconds
+    rate = max(ctx.args.report_rates)
+    batch = 8
+    log_dir = tempfile.mkdtemp(prefix='uart_bench_log_')
+    try:
+        for mode in ('off', 'on'):
+            updates = [0]
+            def on_update(addr, value):
+                updates[0] += 1
+            log_manager = LogManager()
+            log_manager.set_log_callback(ctx.log_func)
+            if mode == 'on':
+                log_manager.set_log_file_path(os.path.join(log_dir, 'bench.log'))
+            with SimulatorProcess(*ctx.sim_args('--report-rate', rate, '--report-batch', batch)) as sim:
+                service = ctx.connect(sim.url, log_func=log_manager.add_log, gui_update_callback=on_update,
+                                      response_40_50_getter=lambda: True)
+                try:
+                    updates[0] = 0
+                    _, wall, cpu, rss = _measure(lambda: time.sleep(seconds))
+                finally:
+                    ctx.disconnect(service)
+            log_manager.flush()
+            stats = log_manager.get_stats()
+            log_manager.close()
+            frames = updates[0] / batch
+            results[f"file_{mode}"] = _summary(
+                int(frames), wall, cpu, rss_growth_kb=rss,
+                delivered_ratio=round(frames / (rate * seconds), 3),
+                lines_written=stats.get('lines', 0),
+                lines_dropped=stats.get('dropped', 0))
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+    return results
+
+def bench_handshake(ctx):
+    """从发起E0握手到MCU连接成功的时间"""
+    latencies = []
+    cpu = 0.0
+    with SimulatorProcess(*ctx.sim_args()) as sim, RssSampler() as rss:
+        for _ in range(ctx.args.handshake_repeats):
+            service = UARTService.from_url(sim.url, log_func=ctx.log_func)
+            service.start_listener()
+            cpu0 = time.process_time()
+            t0 = time.perf_counter()
+            service.start_e0_handshake()
+            service.e0_handshake_stop.wait(5.0)
+            latencies.append(time.perf_counter() - t0)
+            cpu += time.process_time() - cpu0
+            ctx.disconnect(service)
+    return _summary(len(latencies), sum(latencies), cpu, latencies, rss.growth_kb)
+
+def bench_upgrade(ctx):
+    size = ctx.args.upgrade_kb * 1024
+    bin_data = bytes((i * 7 + 3) & 0xFF for i in range(size))
+    with SimulatorProcess(*ctx.sim_args()) as sim:
+        service = ctx.connect(sim.url)
+        try:
+            progress_times = []
+            last = [time.perf_counter()]
+            def on_progress(current, total):
+                now = time.perf_counter()
+                progress_times.append(now - last[0])
+                last[0] = now
+            def run():
+                last[0] = time.perf_counter()
+                return service.upgrade_mcu(bin_data, progress_callback=on_progress)
+            since = service.link.snapshot()
+            (ok, msg), wall, cpu, rss = _measure(run)
+            link = _link_fields(service, since)
+        finally:
+            ctx.disconnect(service)
+    return _summary(len(progress_times), wall, cpu, progress_times, rss,
+                    ok=ok, bytes=size, kib_per_s=round(size / 1024 / wall, 2), **link)
+
+SCENARIOS = {
+    'read_all': bench_read_all,
+    'write_all': bench_write_all,
+    'cycle_send': bench_cycle_send,
+    'report_flood': bench_report_flood,
+    'file_logging': bench_file_logging,
+    'handshake': bench_handshake,
+    'upgrade': bench_upgrade,
+}
+
+def _flatten(results, prefix=''):
+    """{'report_flood': {'rate_10': {...}}} -> {'report_flood/rate_10': {...}}"""
+    flat = {}
+    for name, value in results.items():
+        key = f"{prefix}{name}"
+        if isinstance(value, dict) and value and all(isinstance(v, dict) for v in value.values()):
+            flat.update(_flatten(value, key + '/'))
+        else:
+            flat[key] = value
+    return flat
+
+def compare(current, baseline, threshold):
+    """返回退化列表 [(场景, 指标, 基线值, 当前值, 变化比例)]"""
+    regressions = []
+    cur = _flatten(current['scenarios'])
+    base = _flatten(baseline['scenarios'])
+    for name, metrics in cur.items():
+        if name not in base:
+            continue
+        for metric, higher_is_better in METRIC_DIRECTIONS.items():
+            old, new = base[name].get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+def run_benchmarks(args, scenario_names):
+    ctx = BenchContext(args)
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'baud': args.baud,
+            'latency': args.latency,
+        },
+        'scenarios': {},
+    }
+    for name in scenario_names:
+        print(f"running {name} ...", file=sys.stderr, flush=True)
+        results['scenarios'][name] = SCENARIOS[name](ctx)
+    if ctx.tracer is not None:
+        count = ctx.tracer.dump(args.trace)
+        print(f"wrote {count} trace events to {args.trace}", file=sys.stderr)
+    return results
+
+def _cell(value, width, precision=None):
+    if value is None:
+        return '-'.rjust(width)
+    return f"{value:>{width}.{precision}f}" if precision is not None else f"{value:>{width}}"
+
+def print_results(results):
+    flat = _flatten(results['scenarios'])
+    print(f"{'scenario':<26} {'ops':>7} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'cpu s':>8} {'+rss KB':>9}")
+    for name, m in flat.items():
+        print(f"{name:<26} {m['ops']:>7} {_cell(m.get('throughput_ops_s'), 10, 1)} "
+              f"{_cell(m.get('p50_ms'), 9, 3)} {_cell(m.get('p99_ms'), 9, 3)} "
+              f"{_cell(m.get('cpu_s'), 8, 3)} {_cell(m.get('rss_growth_kb'), 9)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end UARTService benchmarks against a simulated MCU")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--baud', type=int, default=None, help="emulate wire time at this baud rate")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated MCU response latency (s)")
+    parser.add_argument('--cycle-seconds', type=float, default=10.0)
+    parser.add_argument('--report-rates', default='10,50,200')
+    parser.add_argument('--report-seconds', type=float, default=5.0)
+    parser.add_argument('--handshake-repeats', type=int, default=10)
+    parser.add_argument('--upgrade-kb', type=int, default=256)
+    parser.add_argument('--output', help="write results JSON to this file")
+    parser.add_argument('--trace', help="record request spans and write them as Chrome trace JSON to this file")
+    parser.add_argument('--baseline', help="compare against a saved results JSON")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="relative change counted as a regression (default 0.15)")
+    args = parser.parse_args()
+    args.report_rates = [float(r) for r in args.report_rates.split(',') if r]
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = run_benchmarks(args, names)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, old, new, change in regressions:
+            print(f"REGRESSION {name} {metric}: {old} -> {new} ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+串口原始数据抓包与回放
+在传输层记录每一次 TX/RX 的数据块（单调时钟纳秒时间戳 + 方向），写入只追加的二进制文件，
+之后可以按实时、N倍速或尽快的速度把 RX 数据重新送入 UARTService.feed，离线复现解析和时序问题
+
+文件格式（小端）:
+    头部:  b'UARTCAP\\x01' + uint32 头部JSON长度 + JSON (port/baudrate/... 打开参数)
+    记录:  uint64 ts_ns + uint8 方向 + uint32 长度 + 数据
+方向: 0=TX(上位机->MCU) 1=RX(MCU->上位机) 2=会话标记(数据为JSON，追加到已有文件时写入)
+
+用法:
+    python capture.py info field.cap
+    python capture.py replay field.cap --speed 10
+    python capture.py replay field.cap --speed 0        # 尽快
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from transport import Transport
+
+CAPTURE_MAGIC = b'UARTCAP\x01'
+DIR_TX = 0
+DIR_RX = 1
+DIR_MARK = 2
+DIRECTION_NAMES = {DIR_TX: 'TX', DIR_RX: 'RX', DIR_MARK: 'MARK'}
+
+_HEADER_LEN = struct.Struct('<I')
+_RECORD = struct.Struct('<QBI')
+CAPTURE_FLUSH_INTERVAL = 1.0    # 最长多久把缓冲写入磁盘（秒）
+
+class CaptureWriter:
+    """线程安全的抓包文件写入，文件已存在时追加并写入一条会话标记"""
+    def __init__(self, path, meta=None, buffer_size=64 * 1024):
+        self.path = path
+        meta = dict(meta or {})
+        meta.setdefault('start_time', time.time())
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, 'rb') as f:
+                if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                    raise ValueError(f"{path} is not a capture file")
+        self._file = open(path, 'ab', buffering=buffer_size)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.records = 0
+        self.bytes = 0
+        if exists:
+            self.record(DIR_MARK, meta_bytes)
+        else:
+            self._file.write(CAPTURE_MAGIC + _HEADER_LEN.pack(len(meta_bytes)) + meta_bytes)
+
+    def record(self, direction, data):
+        with self._lock:
+            if self._file is None:
+                return
+            # 在锁内取时间戳，保证文件中的时间戳单调
+            now = time.monotonic_ns()
+            self._file.write(_RECORD.pack(now, direction, len(data)))
+            self._file.write(data)
+            self.records += 1
+            self.bytes += len(data)
+            if now / 1e9 - self._last_flush >= CAPTURE_FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now / 1e9
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class CaptureTransport(Transport):
+    """包装任意传输层，记录所有经过的 TX/RX 数据"""
+    def __init__(self, inner, writer):
+        self.inner = inner
+        self.writer = writer
+
+    def close(self):
+        try:
+            self.inner.close()
+        finally:
+            self.writer.close()
+
+    def is_open(self):
+        return self.inner.is_open()
+
+    def write(self, data):
+        n = self.inner.write(data)
+        self.writer.record(DIR_TX, bytes(data))
+        return n
+
+    def read(self, size=1):
+        data = self.inner.read(size)
+        if data:
+            self.writer.record(DIR_RX, data)
+        return data
+
+    def readinto(self, buffer):
+        n = self.inner.readinto(buffer)
+        if n:
+            self.writer.record(DIR_RX, bytes(memoryview(buffer)[:n]))
+        return n
+
+    def in_waiting(self):
+        return self.inner.in_waiting()
+
+    def fileno(self):
+        return self.inner.fileno()
+
+    def __getattr__(self, name):
+        # 其它属性（如 SerialTransport.ser）转给被包装的传输层
+        return getattr(self.inner, name)
+
+class _DiscardTransport(Transport):
+    """回放时 UARTService 发出的应答直接丢弃，没有读端，不会在内存中积累"""
+    def __init__(self):
+        self._open = True
+
+    def close(self):
+        self._open = False
+
+    def is_open(self):
+        return self._open
+
+    def write(self, data):
+        self._check_open()
+        return len(data)
+
+    def read(self, size=1):
+        self._check_open()
+        return b''
+
+    def in_waiting(self):
+        return 0
+
+class CaptureReader:
+    """
+    用 mmap 读取抓包文件，迭代得到 (ts_ns, direction, data)，data 为 memoryview 切片
+    文件末尾不完整的记录（程序异常退出）会被忽略，truncated 置为 True
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.buffer = memoryview(self._mm)
+        try:
+            self.meta, self.data_offset = self._read_header()
+        except ValueError:
+            # 头部不完整或不是JSON（json/UnicodeDecodeError 都是 ValueError）
+            self.close()
+            raise ValueError(f"{path} is not a capture file") from None
+        self.truncated = False
+
+    def _read_header(self):
+        buf = self.buffer
+        pos = len(CAPTURE_MAGIC)
+        if bytes(buf[:pos]) != CAPTURE_MAGIC or len(buf) < pos + _HEADER_LEN.size:
+            raise ValueError
+        (meta_len,) = _HEADER_LEN.unpack_from(buf, pos)
+        pos += _HEADER_LEN.size
+        if len(buf) < pos + meta_len:
+            raise ValueError
+        return json.loads(bytes(buf[pos:pos + meta_len]).decode('utf-8')), pos + meta_len
+
+    def __iter__(self):
+        buf = self.buffer
+        for ts_ns, direction, offset, length in self.iter_offsets():
+            yield ts_ns, direction, buf[offset:offset + length]
+
+    def iter_offsets(self):
+        """迭代 (ts_ns, direction, offset, length)，数据在 self.mmap 中，不做任何切片"""
+        buf = self.buffer
+        end = len(buf)
+        pos = self.data_offset
+        unpack_from = _RECORD.unpack_from
+        rec_size = _RECORD.size
+        while pos + rec_size <= end:
+            ts_ns, direction, length = unpack_from(buf, pos)
+            pos += rec_size
+            if pos + length > end:
+                self.truncated = True
+                return
+            yield ts_ns, direction, pos, length
+            pos += length
+        if pos != end:
+            self.truncated = True
+
+    @property
+    def mmap(self):
+        return self._mm
+
+    def close(self):
+        self.buffer = None
+        if isinstance(self._mm, mmap.mmap):
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # 调用方仍持有记录切片，mmap 在切片释放后由垃圾回收关闭
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def replay(path, feed, speed=1.0, directions=(DIR_RX,), stop_event=None):
+    """
+    把抓包中的数据块按原始时序送入 feed（通常是 UARTService.feed）
+    speed: 1.0 实时，10 表示10倍速，0/None 表示尽快
+    会话标记处重新对齐时间，不等待两次抓包之间的空档
+    返回统计 dict
+    """
+    stats = {'chunks': 0, 'bytes': 0, 'sessions': 1, 'capture_s': 0.0}
+    t_start = time.perf_counter()
+    with CaptureReader(path) as reader:
+        base_ts = None
+        base_wall = None
+        span_ns = 0
+        for ts_ns, direction, data in reader:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if direction == DIR_MARK:
+                if base_ts is not None:
+                    span_ns += last_ts - base_ts
+                base_ts = None
+                stats['sessions'] += 1
+                continue
+            if base_ts is None:
+                base_ts = ts_ns
+                base_wall = time.perf_counter()
+            last_ts = ts_ns
+            if direction not in directions:
+                continue
+            if speed:
+                delay = (ts_ns - base_ts) / 1e9 / speed - (time.perf_counter() - base_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            feed(bytes(data))
+            stats['chunks'] += 1
+            stats['bytes'] += len(data)
+        if base_ts is not None:
+            span_ns += last_ts - base_ts
+        stats['truncated'] = reader.truncated
+    stats['capture_s'] = round(span_ns / 1e9, 6)
+    stats['wall_s'] = round(time.perf_counter() - t_start, 6)
+    return stats
+
+def capture_info(path):
+    """统计抓包文件：记录数、各方向字节数、时间跨度"""
+    info = {'records': 0, 'tx_bytes': 0, 'rx_bytes': 0, 'tx_chunks': 0, 'rx_chunks': 0, 'sessions': 1}
+    with CaptureReader(path) as reader:
+        info['meta'] = reader.meta
+        first = last = None
+        for ts_ns, direction, data in reader:
+            info['records'] += 1
+            if direction == DIR_MARK:
+                info['sessions'] += 1
+                continue
+            key = 'tx' if direction == DIR_TX else 'rx'
+            info[f'{key}_chunks'] += 1
+            info[f'{key}_bytes'] += len(data)
+            if first is None:
+                first = ts_ns
+            last = ts_ns
+        info['duration_s'] = round((last - first) / 1e9, 6) if first is not None else 0.0
+        info['truncated'] = reader.truncated
+    return info
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay a UART capture file")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_info = sub.add_parser('info', help="print capture statistics")
+    p_info.add_argument('file')
+    p_replay = sub.add_parser('replay', help="feed RX data into UARTService")
+    p_replay.add_argument('file')
+    p_replay.add_argument('--speed', type=float, default=1.0, help="1=real time, N=N times faster, 0=as fast as possible")
+    p_replay.add_argument('--config', default=None, help="register map JSON (default uart_command_set.json)")
+    p_replay.add_argument('--verbose', action='store_true', help="print the service log")
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        print(json.dumps(capture_info(args.file), indent=2, ensure_ascii=False))
+        return
+
+    from item_manager import ItemManager
+    from uart_interface import UARTInterface
+    from uart_service import UARTService
+    from utils import get_resource_path
+    items = ItemManager(json_file=args.config or get_resource_path('uart_command_set.json')).items
+    addr_map = {int(item['index'], 16): item for item in items}
+    counts = {'log': 0, 'updates': 0}
+    def log_func(record):
+        counts['log'] += 1
+        if args.verbose:
+            print(record)
+    def on_update(addr, value):
+        counts['updates'] += 1
+    # 与GUI默认设置一致（F0应答、上报应答打开）；应答写入 _DiscardTransport 直接丢弃
+    uart = UARTInterface()
+    uart.transport = _DiscardTransport()
+    service = UARTService(uart, log_func=log_func, gui_update_callback=on_update, addr_map=addr_map,
+                          f0_response_getter=lambda: True, response_40_50_getter=lambda: True)
+    stats = replay(args.file, service.feed, speed=args.speed)
+    stats.update(counts)
+    stats['mcu_connected'] = service.is_mcu_connected()
+    uart.close()
+    print(json.dumps(stats, indent=2))
+
+if __name__ == '__main__':
+    main()
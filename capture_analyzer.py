@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+抓包文件离线分析
+对 capture.py 记录的抓包（或 --raw 的纯接收字节流）按与 UARTService.feed 相同的规则分帧，统计:
+    各方向每种功能码的帧数、CRC错误率、丢弃字节率、状态码
+    每个寄存器的取值分布（上报和读应答）
+    请求到应答的延时分布（读/写/升级/握手）
+    MCU 主动上报（40/50/60）的间隔和断流
+文件通过 mmap 读取，包头用 bytes.find 查找，CRC 用 binascii.crc_hqx，内存占用与文件大小无关
+
+用法:
+    python capture_analyzer.py field.cap
+    python capture_analyzer.py field.cap --json report.json
+    python capture_analyzer.py rx_dump.bin --raw
+"""
+import argparse
+import binascii
+import json
+import mmap
+import struct
+from collections import Counter, deque
+try:
+    from _collections import _count_elements   # Counter.update 的 C 实现，省去 Mapping 判断
+except ImportError:
+    def _count_elements(counter, iterable):
+        counter.update(iterable)
+from capture import CaptureReader, DIR_TX, DIR_RX, DIR_MARK
+from metrics import Histogram
+from protocol import (
+    PU_FRAME_HEAD, MIN_PACKET_SIZE, UPGRADE_PACKET_SIZE,
+    PU_FUN_READ, PU_FUN_WRITE, PU_FUN_UPGRADE, PU_FUN_UPGRADE_CRC,
+    PU_FUN_MCU_RESET, PU_FUN_CONNECT,
+    PU_FUN_MCU_WRITE_ALARM, PU_FUN_MCU_WRITE_CONFIG, PU_FUN_MCU_WRITE_DATA,
+    PU_ACK_WITH_DATA, PU_ACK_NO_DATA, PU_STATUS_OK,
+    unpack_value_by_type,
+)
+
+FUN_CODE_NAMES = {
+    PU_FUN_READ: 'read', PU_FUN_WRITE: 'write',
+    PU_FUN_UPGRADE: 'upgrade', PU_FUN_UPGRADE_CRC: 'upgrade_crc',
+    PU_FUN_MCU_RESET: 'mcu_reset', PU_FUN_CONNECT: 'connect',
+    PU_FUN_MCU_WRITE_ALARM: 'report_alarm', PU_FUN_MCU_WRITE_CONFIG: 'report_config',
+    PU_FUN_MCU_WRITE_DATA: 'report_data',
+    PU_ACK_WITH_DATA: 'ack_data', PU_ACK_NO_DATA: 'ack_status',
+}
+REPORT_FUN_CODES = (PU_FUN_MCU_WRITE_ALARM, PU_FUN_MCU_WRITE_CONFIG, PU_FUN_MCU_WRITE_DATA)
+# 比最大升级包还长的 LEN 视为损坏的包头，避免一个坏 LEN 吞掉后面的大量数据
+MAX_FRAME_SIZE = UPGRADE_PACKET_SIZE + 64
+
+MAX_DISTINCT_VALUES = 64    # 每个寄存器最多单独统计的不同取值个数，超出的计入 other
+MAX_PENDING = 4096          # 未应答请求最多保留的个数
+MAX_GAPS = 100              # 最多保留的断流记录
+GAP_FACTOR = 3.0            # 上报间隔超过平均间隔的这个倍数算断流
+_HEAD = bytes((PU_FRAME_HEAD,))
+_ENTRY = struct.Struct('>HI')        # 上报数据项: addr(2) + value(4)
+_ENTRY_I = struct.Struct('>i')
+WINDOW_SIZE = 16 * 1024 * 1024   # 每处理这么多字节释放一次已读的 mmap 页
+FOLD_THRESHOLD = 100000     # (地址, 原始值) 计数超过这么多种时合并到 RegisterStats，保证内存有界
+
+def _release_pages(mm, start, end):
+    """告诉内核已读完 [start, end) 的页，避免大文件的页缓存计入本进程内存，返回新的起点"""
+    page = mmap.PAGESIZE
+    end = end // page * page
+    if end > start and hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+        mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+    return max(start, end)
+
+class RegisterStats:
+    __slots__ = ('count', 'min', 'max', 'total', 'values', 'other', 'sources')
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.values = {}
+        self.other = 0
+        self.sources = {}
+
+    def add(self, value, source, n=1):
+        self.count += n
+        self.sources[source] = self.sources.get(source, 0) + n
+        if value != value:  # NaN
+            self.other += n
+            return
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.total += value * n
+        values = self.values
+        if value in values:
+            values[value] += n
+        elif len(values) < MAX_DISTINCT_VALUES:
+            values[value] = n
+        else:
+            self.other += n
+
+    def summary(self):
+        top = sorted(self.values.items(), key=lambda kv: -kv[1])
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': round(self.total / self.count, 6) if self.count else None,
+            'sources': self.sources,
+            'histogram': [[v, n] for v, n in top],
+            'other': self.other,
+        }
+
+class FrameScanner:
+    """
+    流式分帧，规则与 UARTService.feed 一致:
+    找 0x5A -> 功能码合法 -> LEN -> 整帧 -> CRC；CRC错误的帧整体丢弃
+    跨数据块的半帧保存在 carry 中
+    """
+    def __init__(self, direction, on_frame, stats):
+        self.direction = direction
+        self.on_frame = on_frame
+        self.stats = stats
+        self.carry = bytearray()
+
+    def feed(self, data, ts_ns=None, start=0, end=None):
+        """data[start:end] 为新收到的字节；没有半帧时直接在 data 上扫描，不复制"""
+        if end is None:
+            end = len(data)
+        if self.carry:
+            self.carry += data[start:end]
+            pos = self._scan(self.carry, 0, len(self.carry), ts_ns)
+            del self.carry[:pos]
+        else:
+            pos = self._scan(data, start, end, ts_ns)
+            if pos < end:
+                self.carry = bytearray(data[pos:end])
+
+    def finish(self):
+        """数据结束时剩余的半帧计为丢弃"""
+        self.stats['discard_bytes'] += len(self.carry)
+        self.stats['incomplete_frames'] += 1 if self.carry else 0
+        self.carry = bytearray()
+
+    def _scan(self, buf, pos, end, ts_ns):
+        stats = self.stats
+        find = buf.find
+        crc_hqx = binascii.crc_hqx
+        on_frame = self.on_frame
+        direction = self.direction
+        while end - pos >= MIN_PACKET_SIZE:
+            idx = find(_HEAD, pos, end)
+            if idx == -1:
+                stats['discard_bytes'] += end - pos
+                return end
+            if idx > pos:
+                stats['discard_bytes'] += idx - pos
+                pos = idx
+                if end - pos < MIN_PACKET_SIZE:
+                    break
+            fun = buf[pos + 1]
+            if fun not in FUN_CODE_NAMES:
+                # 与 UARTService 相同：丢到下一个包头
+                nxt = find(_HEAD, pos + 1, end)
+                stats['invalid_fun_code'] += 1
+                if nxt == -1:
+                    stats['discard_bytes'] += end - pos
+                    return end
+                stats['discard_bytes'] += nxt - pos
+                pos = nxt
+                continue
+            total = 6 + ((buf[pos + 2] << 8) | buf[pos + 3])
+            if total > MAX_FRAME_SIZE:
+                stats['bad_length'] += 1
+                stats['discard_bytes'] += 1
+                pos += 1
+                continue
+            if end - pos < total:
+                break
+            frame = buf[pos:pos + total]
+            # 数据+大端CRC 一起计算，余数为0即校验通过
+            if crc_hqx(frame, 0xFFFF):
+                stats['crc_errors'][direction] += 1
+                stats['discard_bytes'] += total
+            else:
+                on_frame(direction, ts_ns, fun, frame)
+            pos += total
+        return pos
+
+class CaptureAnalyzer:
+    def __init__(self, addr_map=None, gap_factor=GAP_FACTOR):
+        self.addr_map = addr_map or {}
+        self.gap_factor = gap_factor
+        self.stats = {
+            'bytes': {'tx': 0, 'rx': 0},
+            'chunks': {'tx': 0, 'rx': 0},
+            'frames': {'tx': {}, 'rx': {}},
+            'crc_errors': {'tx': 0, 'rx': 0},
+            'invalid_fun_code': 0,
+            'bad_length': 0,
+            'discard_bytes': 0,
+            'incomplete_frames': 0,
+            'sessions': 1,
+        }
+        self.status_codes = {}
+        self.registers = {}
+        # 解码推迟到 _fold_values，热路径只做 C 实现的 Counter 计数
+        self.value_counts = {'report': Counter(), 'read': Counter()}
+        self.latency = {}
+        self.report_intervals = {}
+        self.report_ewma = {}
+        self.report_last = {}
+        self.gaps = []
+        self.gap_count = 0
+        self.unknown_addr_reports = 0
+        self.pending_reads = {}
+        self.pending_fifo = {fun: deque(maxlen=MAX_PENDING)
+                             for fun in (PU_FUN_WRITE, PU_FUN_UPGRADE, PU_FUN_UPGRADE_CRC)}
+        self.pending_connect = None
+        self.first_ts = None
+        self.last_ts = None
+        self.scanners = {
+            'tx': FrameScanner('tx', self._on_frame, self.stats),
+            'rx': FrameScanner('rx', self._on_frame, self.stats),
+        }
+
+    # ---------- 输入 ----------
+    def feed(self, direction, data, ts_ns=None, start=0, end=None):
+        """data 需支持 find（bytes/bytearray/mmap）"""
+        if end is None:
+            end = len(data)
+        if ts_ns is not None:
+            if self.first_ts is None:
+                self.first_ts = ts_ns
+            self.last_ts = ts_ns
+        self.stats['bytes'][direction] += end - start
+        self.stats['chunks'][direction] += 1
+        self.scanners[direction].feed(data, ts_ns, start, end)
+
+    def new_session(self):
+        """抓包文件中的会话标记：丢弃跨会话的半帧和未应答请求"""
+        self.stats['sessions'] += 1
+        for scanner in self.scanners.values():
+            scanner.finish()
+        self.pending_reads.clear()
+        for fifo in self.pending_fifo.values():
+            fifo.clear()
+        self.pending_connect = None
+        self.report_last.clear()
+
+    def analyze_capture(self, path):
+        with CaptureReader(path) as reader:
+            self.meta = reader.meta
+            mm = reader.mmap
+            released = 0
+            for ts_ns, direction, offset, length in reader.iter_offsets():
+                if offset - released >= WINDOW_SIZE:
+                    released = _release_pages(mm, released, offset)
+                if direction == DIR_RX:
+                    self.feed('rx', mm, ts_ns, offset, offset + length)
+                elif direction == DIR_TX:
+                    self.feed('tx', mm, ts_ns, offset, offset + length)
+                elif direction == DIR_MARK:
+                    self.new_session()
+            self.truncated = reader.truncated
+        for scanner in self.scanners.values():
+            scanner.finish()
+
+    def analyze_raw(self, path):
+        """无时间戳的纯接收字节流，整个文件 mmap 后直接扫描，不复制"""
+        self.meta = {'raw': path}
+        self.truncated = False
+        with open(path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # 空文件
+                return
+            try:
+                size = len(mm)
+                for start in range(0, size, WINDOW_SIZE):
+                    end = min(start + WINDOW_SIZE, size)
+                    self.feed('rx', mm, None, start, end)
+                    _release_pages(mm, start, end)
+                self.scanners['rx'].finish()
+            finally:
+                mm.close()
+
+    # ---------- 帧处理 ----------
+    def _latency(self, name, ts_req, ts_resp):
+        if ts_req is None or ts_resp is None:
+            return
+        hist = self.latency.get(name)
+        if hist is None:
+            hist = self.latency[name] = Histogram()
+        hist.add((ts_resp - ts_req) // 1000)  # us
+
+    def _fold_values(self):
+        """把 (地址, 原始值) 计数解码后合并到每个寄存器的统计"""
+        addr_map = self.addr_map
+        for source, counter in self.value_counts.items():
+            for (addr, raw), n in counter.items():
+                item = addr_map.get(addr)
+                if addr_map and item is None and source == 'report':
+                    self.unknown_addr_reports += n
+                raw_bytes = raw.to_bytes(4, 'big')
+                try:
+                    value = unpack_value_by_type(raw_bytes, item.get('type', 'int32_t')) if item else None
+                except Exception:
+                    value = None
+                if value is None:
+                    value = _ENTRY_I.unpack(raw_bytes)[0]
+                reg = self.registers.get(addr)
+                if reg is None:
+                    reg = self.registers[addr] = RegisterStats()
+                reg.add(value, source, n)
+            counter.clear()
+
+    def _report_timing(self, fun, ts_ns):
+        last = self.report_last.get(fun)
+        self.report_last[fun] = ts_ns
+        if last is None:
+            return
+        interval = ts_ns - last
+        hist = self.report_intervals.get(fun)
+        if hist is None:
+            hist = self.report_intervals[fun] = Histogram()
+        hist.add(interval // 1000)
+        ewma = self.report_ewma.get(fun)
+        if ewma is not None and interval > ewma * self.gap_factor:
+            self.gap_count += 1
+            if len(self.gaps) < MAX_GAPS:
+                self.gaps.append({
+                    'fun_code': f"0x{fun:02X}",
+                    'at_s': round((last - self.first_ts) / 1e9, 6),
+                    'gap_ms': round(interval / 1e6, 3),
+                    'expected_ms': round(ewma / 1e6, 3),
+                })
+            # 断流不计入平均间隔
+            return
+        self.report_ewma[fun] = interval if ewma is None else ewma * 0.9 + interval * 0.1
+
+    def _on_frame(self, direction, ts_ns, fun, frame):
+        counts = self.stats['frames'][direction]
+        counts[fun] = counts.get(fun, 0) + 1
+        if direction == 'tx':
+            if fun == PU_FUN_READ and len(frame) >= 8:
+                pending = self.pending_reads
+                pending[(frame[4] << 8) | frame[5]] = ts_ns
+                if len(pending) > MAX_PENDING:
+                    del pending[next(iter(pending))]
+            elif fun in self.pending_fifo:
+                self.pending_fifo[fun].append(ts_ns)
+            elif fun == PU_FUN_CONNECT:
+                self.pending_connect = ts_ns
+            return
+        # MCU -> 上位机
+        if fun in REPORT_FUN_CODES:
+            if ts_ns is not None:
+                self._report_timing(fun, ts_ns)
+            if (len(frame) - 6) % 6:
+                return
+            counter = self.value_counts['report']
+            _count_elements(counter, _ENTRY.iter_unpack(memoryview(frame)[4:-2]))
+            if len(counter) > FOLD_THRESHOLD:
+                self._fold_values()
+        elif fun == PU_ACK_WITH_DATA and len(frame) == 12:
+            entry = _ENTRY.unpack_from(frame, 4)
+            counter = self.value_counts['read']
+            counter[entry] += 1
+            if len(counter) > FOLD_THRESHOLD:
+                self._fold_values()
+            addr = entry[0]
+            self._latency('read', self.pending_reads.pop(addr, None), ts_ns)
+        elif fun == PU_ACK_NO_DATA and len(frame) == 8:
+            req_fun, status = frame[4], frame[5]
+            key = f"0x{req_fun:02X}/0x{status:02X}"
+            self.status_codes[key] = self.status_codes.get(key, 0) + 1
+            fifo = self.pending_fifo.get(req_fun)
+            if fifo:
+                self._latency(FUN_CODE_NAMES[req_fun], fifo.popleft(), ts_ns)
+            elif req_fun == PU_FUN_READ and status != PU_STATUS_OK:
+                # 读失败只回状态，不带地址，按最早的未应答读计算
+                if self.pending_reads:
+                    addr = next(iter(self.pending_reads))
+                    self._latency('read', self.pending_reads.pop(addr), ts_ns)
+        elif fun == PU_FUN_CONNECT:
+            self._latency('connect', self.pending_connect, ts_ns)
+            self.pending_connect = None
+
+    # ---------- 输出 ----------
+    def report(self):
+        self._fold_values()
+        s = self.stats
+        total_bytes = s['bytes']['tx'] + s['bytes']['rx']
+        good = {d: sum(s['frames'][d].values()) for d in ('tx', 'rx')}
+        def named(counts):
+            return {f"0x{k:02X} {FUN_CODE_NAMES.get(k, '?')}": v for k, v in sorted(counts.items())}
+        def crc_rate(d):
+            n = good[d] + s['crc_errors'][d]
+            return round(s['crc_errors'][d] / n, 6) if n else 0.0
+        return {
+            'meta': getattr(self, 'meta', {}),
+            'truncated': getattr(self, 'truncated', False),
+            'duration_s': round((self.last_ts - self.first_ts) / 1e9, 6) if self.first_ts is not None else None,
+            'sessions': s['sessions'],
+            'bytes': s['bytes'],
+            'chunks': s['chunks'],
+            'frames': {d: named(s['frames'][d]) for d in ('tx', 'rx')},
+            'frames_total': good,
+            'crc_errors': s['crc_errors'],
+            'crc_error_rate': {d: crc_rate(d) for d in ('tx', 'rx')},
+            'invalid_fun_code': s['invalid_fun_code'],
+            'bad_length': s['bad_length'],
+            'incomplete_frames': s['incomplete_frames'],
+            'discard_bytes': s['discard_bytes'],
+            'discard_rate': round(s['discard_bytes'] / total_bytes, 6) if total_bytes else 0.0,
+            'status_codes': dict(sorted(self.status_codes.items())),
+            'latency_ms': {k: h.summary(scale=0.001) for k, h in sorted(self.latency.items())},
+            'unanswered_reads': len(self.pending_reads),
+            'report_interval_ms': {f"0x{k:02X}": h.summary(scale=0.001)
+                                   for k, h in sorted(self.report_intervals.items())},
+            'report_gaps': self.gap_count,
+            'report_gap_list': self.gaps,
+            'unknown_addr_reports': self.unknown_addr_reports,
+            'registers': {f"0x{addr:04X}": reg.summary() for addr, reg in sorted(self.registers.items())},
+        }
+
+def format_report(rep, top_registers=20):
+    lines = []
+    lines.append(f"duration: {rep['duration_s']} s   sessions: {rep['sessions']}   "
+                 f"bytes tx/rx: {rep['bytes']['tx']}/{rep['bytes']['rx']}"
+                 + ("   (truncated)" if rep['truncated'] else ""))
+    for d in ('tx', 'rx'):
+        lines.append(f"{d} frames: {rep['frames_total'][d]}   crc errors: {rep['crc_errors'][d]} "
+                     f"({rep['crc_error_rate'][d] * 100:.3f}%)")
+        for name, n in rep['frames'][d].items():
+            lines.append(f"    {name:<20} {n}")
+    lines.append(f"discarded: {rep['discard_bytes']} bytes ({rep['discard_rate'] * 100:.3f}%)   "
+                 f"invalid fun code: {rep['invalid_fun_code']}   bad length: {rep['bad_length']}")
+    if rep['status_codes']:
+        lines.append("status (fun/status): " + ', '.join(f"{k}={v}" for k, v in rep['status_codes'].items()))
+    if rep['latency_ms']:
+        lines.append("reply latency ms:")
+        for name, h in rep['latency_ms'].items():
+            lines.append(f"    {name:<12} n={h['count']} p50={h.get('p50')} p90={h.get('p90')} "
+                         f"p99={h.get('p99')} max={h.get('max')}")
+        lines.append(f"    unanswered reads: {rep['unanswered_reads']}")
+    if rep['report_interval_ms']:
+        lines.append("report interval ms:")
+        for fun, h in rep['report_interval_ms'].items():
+            lines.append(f"    {fun} n={h['count']} p50={h.get('p50')} p99={h.get('p99')} max={h.get('max')}")
+        lines.append(f"    gaps: {rep['report_gaps']}")
+        for gap in rep['report_gap_list'][:10]:
+            lines.append(f"        {gap['fun_code']} at {gap['at_s']} s: {gap['gap_ms']} ms "
+                         f"(expected {gap['expected_ms']} ms)")
+    regs = sorted(rep['registers'].items(), key=lambda kv: -kv[1]['count'])
+    if regs:
+        lines.append(f"registers: {len(regs)} (top {min(top_registers, len(regs))} by samples)")
+        for addr, reg in regs[:top_registers]:
+            top = ', '.join(f"{v}x{n}" for v, n in reg['histogram'][:4])
+            lines.append(f"    {addr} n={reg['count']} min={reg['min']} max={reg['max']} "
+                         f"mean={reg['mean']} [{top}{', ...' if len(reg['histogram']) > 4 or reg['other'] else ''}]")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline statistics for UART capture files")
+    parser.add_argument('file')
+    parser.add_argument('--raw', action='store_true', help="file is a raw RX byte stream without capture header")
+    parser.add_argument('--config', default=None, help="register map JSON used to decode values (default uart_command_set.json)")
+    parser.add_argument('--gap-factor', type=float, default=GAP_FACTOR,
+                        help="report interval above this multiple of the average counts as a gap")
+    parser.add_argument('--json', dest='json_out', help="write the full report to this JSON file")
+    parser.add_argument('--top', type=int, default=20, help="registers to list in the text summary")
+    args = parser.parse_args()
+
+    from item_manager import ItemManager
+    from utils import get_resource_path
+    items = ItemManager(json_file=args.config or get_resource_path('uart_command_set.json')).items
+    addr_map = {int(item['index'], 16): item for item in items}
+    analyzer = CaptureAnalyzer(addr_map=addr_map, gap_factor=args.gap_factor)
+    if args.raw:
+        analyzer.analyze_raw(args.file)
+    else:
+        analyzer.analyze_capture(args.file)
+    rep = analyzer.report()
+    print(format_report(rep, top_registers=args.top))
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(rep, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+多串口并行升级
+同一个bin镜像只计算一次升级包和CRC，所有串口共享，每个串口一个升级会话并发执行
+
+用法:
+    python flash_manager.py pu_app.bin COM3 COM4 COM5 --baud 115200
+"""
+import argparse
+import threading
+import time
+from uart_interface import UARTInterface
+from uart_service import UARTService
+from upgrade_image import get_upgrade_image
+
+# 会话状态
+STATE_PENDING = 'pending'
+STATE_CONNECTING = 'connecting'
+STATE_FLASHING = 'flashing'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+class FlashSession:
+    """单个串口的升级进度和结果"""
+    def __init__(self, port):
+        self.port = port
+        self.state = STATE_PENDING
+        self.current = 0
+        self.total = 0
+        self.ok = False
+        self.message = ''
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    @property
+    def percent(self):
+        return 100.0 * self.current / self.total if self.total else 0.0
+
+class MultiFlasher:
+    def __init__(self, ports, bin_data, baudrate=115200, handshake_timeout=10.0,
+                 packet_timeout=2.0, max_retries=3, log_func=None, progress_callback=None):
+        """
+        :param ports: 串口列表
+        :param bin_data: 升级bin文件内容，所有串口共用
+        :param progress_callback: progress_callback(session)，任一串口进度变化时调用（在工作线程中）
+        """
+        # 大小不合法时在这里直接抛ValueError，不会打开任何串口
+        self.image = get_upgrade_image(bin_data)
+        self.sessions = [FlashSession(port) for port in ports]
+        self.baudrate = baudrate
+        self.handshake_timeout = handshake_timeout
+        self.packet_timeout = packet_timeout
+        self.max_retries = max_retries
+        self.log_func = log_func or (lambda msg: None)
+        self.progress_callback = progress_callback
+        self.start_time = None
+        self.end_time = None
+        self._threads = []
+
+    def start(self):
+        self.start_time = time.monotonic()
+        self.end_time = None
+        self._threads = []
+        for session in self.sessions:
+            t = threading.Thread(target=self._flash_port, args=(session,), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if not self.is_running():
+            self.end_time = time.monotonic()
+        return not self.is_running()
+
+    def run(self):
+        self.start()
+        self.join()
+        return self.sessions
+
+    def is_running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def _notify(self, session):
+        if self.progress_callback:
+            try:
+                self.progress_callback(session)
+            except Exception as e:
+                self.log_func(f"[{session.port}] progress callback error: {e}")
+
+    def _flash_port(self, session):
+        session.start_time = time.monotonic()
+        session.total = self.image.pack_count
+        session.state = STATE_CONNECTING
+        self._notify(session)
+        uart = UARTInterface()
+        service = UARTService(uart, log_func=lambda msg: self.log_func(f"[{session.port}] {msg}"))
+        try:
+            uart.open(port=session.port, baudrate=self.baudrate, timeout=1)
+            service.start_listener()
+            service.start_e0_handshake()
+            # 握手成功时e0_handshake_stop会被置位
+            service.e0_handshake_stop.wait(self.handshake_timeout)
+            if not service.is_mcu_connected():
+                service.e0_handshake_stop.set()
+                session.ok, session.message = False, "MCU handshake timeout"
+            else:
+                session.state = STATE_FLASHING
+                self._notify(session)
+                def on_progress(current, total):
+                    session.current = current
+                    self._notify(session)
+                session.ok, session.message = service.upgrade_mcu(
+                    image=self.image, progress_callback=on_progress,
+                    timeout=self.packet_timeout, max_retries=self.max_retries)
+        except Exception as e:
+            session.ok, session.message = False, f"{type(e).__name__}: {e}"
+        finally:
+            service.e0_handshake_stop.set()
+            service.stop_listener()
+            try:
+                uart.close()
+            except Exception:
+                pass
+            session.end_time = time.monotonic()
+            session.state = STATE_DONE if session.ok else STATE_FAILED
+            self._notify(session)
+
+    # 统计
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    def succeeded(self):
+        return [s for s in self.sessions if s.ok]
+
+    def boards_per_hour(self):
+        elapsed = self.elapsed()
+        if elapsed <= 0:
+            return 0.0
+        return len(self.succeeded()) * 3600.0 / elapsed
+
+    def result_table(self):
+        """返回每个串口一行的结果列表，便于GUI或日志使用"""
+        return [{
+            'port': s.port,
+            'state': s.state,
+            'progress': f"{s.current}/{s.total}",
+            'percent': round(s.percent, 1),
+            'elapsed_s': round(s.elapsed, 2),
+            'ok': s.ok,
+            'message': s.message,
+        } for s in self.sessions]
+
+    def format_table(self):
+        rows = self.result_table()
+        port_w = max([len('Port')] + [len(r['port']) for r in rows])
+        lines = [f"{'Port':<{port_w}}  {'State':<10}  {'Progress':>11}  {'%':>6}  {'Time(s)':>8}  Message"]
+        for r in rows:
+            lines.append(f"{r['port']:<{port_w}}  {r['state']:<10}  {r['progress']:>11}  "
+                         f"{r['percent']:>6.1f}  {r['elapsed_s']:>8.2f}  {r['message']}")
+        lines.append(f"Image: {self.image.digest[:16]} ({self.image.size} bytes, {self.image.pack_count} packets)")
+        lines.append(f"Succeeded: {len(self.succeeded())}/{len(self.sessions)}  "
+                     f"Elapsed: {self.elapsed():.1f}s  Boards/hour: {self.boards_per_hour():.1f}")
+        return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Flash one MCU image to several serial ports in parallel")
+    parser.add_argument('image', help="upgrade .bin file")
+    parser.add_argument('ports', nargs='+', help="serial ports, e.g. COM3 /dev/ttyUSB0")
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--handshake-timeout', type=float, default=10.0)
+    parser.add_argument('--packet-timeout', type=float, default=2.0)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--verbose', action='store_true', help="print the protocol log of every port")
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        bin_data = f.read()
+    flasher = MultiFlasher(args.ports, bin_data, baudrate=args.baud,
+                           handshake_timeout=args.handshake_timeout,
+                           packet_timeout=args.packet_timeout, max_retries=args.retries,
+                           log_func=print if args.verbose else None)
+    flasher.start()
+    while not flasher.join(timeout=1.0):
+        if not args.verbose:
+            print(flasher.format_table() + '\n')
+    print(flasher.format_table())
+    return 0 if len(flasher.succeeded()) == len(flasher.sessions) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,6 @@
-import json
 import os
-import sys
+from register_map import load_register_map, group_names
+from register_model import item_address
 
 class ItemManager:
     def __init__(self, json_file='uart_command_set.json', language='EN'):
@@ -8,6 +8,9 @@ class ItemManager:
         self.language = language
         self.items = []
         self.organized_items = {}
+        self.register_map = None
+        # {地址(int): item}；始终是同一个 dict，UARTService 等持有它的引用，重新加载时原地更新
+        self.addr_map = {}
         self.load_items()
 
     def load_items(self):
@@ -17,31 +20,72 @@ class ItemManager:
             
             if not os.path.exists(json_path):
                 raise FileNotFoundError(f"找不到配置文件: {self.json_file}")
-                
-            with open(json_path, 'r', encoding='utf-8') as f:
-                self.items = json.load(f)
+            
+            # 编译好的寄存器表（带缓存，见 register_map.py），两种语言的层级已分好组
+            self.register_map = load_register_map(json_path)
+            self.items = self.register_map.items
+            self.organized_by_language = self.register_map.organized
+            self.organized_items = self.organized_by_language.get(self.language, self.organized_by_language["CN"])
+            self._set_addr_map(self.register_map.addr_map)
+            return
         except Exception as e:
             print(f"Error loading JSON file: {e}")
             # 显示更详细的错误信息
             import traceback
             traceback.print_exc()
             self.items = []
+            self.register_map = None
         self.organize_items()
+        self._set_addr_map({int(item['index'], 16): item for item in self.items})
 
     def organize_items(self):
-        self.organized_items = {}
-        for item in self.items:
-            module = item.get("Module" if self.language == "EN" else "模块", "Uncategorized")
-            submodule = item.get("Submodule" if self.language == "EN" else "子模块", "Others")
-            if module not in self.organized_items:
-                self.organized_items[module] = {}
-            if submodule not in self.organized_items[module]:
-                self.organized_items[module][submodule] = []
-            self.organized_items[module][submodule].append(item)
+        # 两种语言的层级各分组一次，切换语言时只换引用
+        self.organized_by_language = {}
+        for language in ("EN", "CN"):
+            organized = {}
+            for item in self.items:
+                module, submodule = self.group_names(item, language)
+                if module not in organized:
+                    organized[module] = {}
+                if submodule not in organized[module]:
+                    organized[module][submodule] = []
+                organized[module][submodule].append(item)
+            self.organized_by_language[language] = organized
+        self.organized_items = self.organized_by_language.get(self.language, self.organized_by_language["CN"])
+
+    # 寄存器在该语言下所属的 (模块, 子模块)
+    group_names = staticmethod(group_names)
+
+    def _set_addr_map(self, addr_map):
+        self.addr_map.clear()
+        self.addr_map.update(addr_map)
+
+    def apply_register_map(self, register_map, diff):
+        """
+        热加载：换成新的寄存器表，地址表只按 diff 增删改
+        （读命令帧只由地址决定，新表的帧在加载时已预先放入，不需要删除旧的）
+        """
+        self.register_map = register_map
+        self.items = register_map.items
+        self.organized_by_language = register_map.organized
+        self.organized_items = self.organized_by_language.get(self.language, self.organized_by_language["CN"])
+        for item in diff.removed:
+            try:
+                addr = item_address(item)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if addr not in register_map.addr_map:
+                self.addr_map.pop(addr, None)
+        for item in diff.added + [new for _, new in diff.changed]:
+            try:
+                addr = item_address(item)
+            except (KeyError, TypeError, ValueError):
+                continue
+            self.addr_map[addr] = register_map.addr_map.get(addr, item)
 
     def set_language(self, lang):
         self.language = lang
-        self.organize_items()
+        self.organized_items = self.organized_by_language.get(lang, self.organized_by_language["CN"])
 
     def get_organized_items(self):
-        return self.organized_items 
\ No newline at end of file
+        return self.organized_items
@@ -0,0 +1,198 @@
+"""
+链路时间预算
+按串口参数（波特率、数据位、校验位、停止位）计算每帧在线路上的理论传输时间，
+按操作类型统计收发的帧/字节/有效数据，与实际经过的时间和请求往返时间比较，
+得到每个方向的线路利用率、空闲时间和协议效率（有效数据字节 / 总字节）
+
+主机无法直接看到线路何时在传输，这里的“忙”时间是实际收发字节数按串口参数换算的线路时间，
+空闲时间 = 实际经过的时间 - 忙时间
+"""
+import threading
+import time
+from protocol import (
+    PU_FUN_READ, PU_FUN_WRITE, PU_FUN_UPGRADE, PU_FUN_UPGRADE_CRC,
+    PU_FUN_MCU_RESET, PU_FUN_CONNECT,
+    PU_FUN_MCU_WRITE_ALARM, PU_FUN_MCU_WRITE_CONFIG, PU_FUN_MCU_WRITE_DATA,
+    PU_ACK_WITH_DATA, PU_ACK_NO_DATA, bits_per_frame,
+)
+
+FRAME_OVERHEAD = 6      # 包头 + FUN_CODE + LEN(2) + CRC(2)
+
+# 功能码 -> 操作类型；F1 应答按其中被应答的功能码归类
+_FUN_OPS = {
+    PU_FUN_READ: 'read',
+    PU_ACK_WITH_DATA: 'read',
+    PU_FUN_WRITE: 'write',
+    PU_FUN_UPGRADE: 'upgrade',
+    PU_FUN_UPGRADE_CRC: 'upgrade_crc',
+    PU_FUN_CONNECT: 'handshake',
+    PU_FUN_MCU_RESET: 'handshake',
+    PU_FUN_MCU_WRITE_ALARM: 'report',
+    PU_FUN_MCU_WRITE_CONFIG: 'report',
+    PU_FUN_MCU_WRITE_DATA: 'report',
+}
+
+# 每个操作的统计项
+TX_BYTES, TX_PAYLOAD, TX_FRAMES, RX_BYTES, RX_PAYLOAD, RX_FRAMES, REQUESTS, RTT = range(8)
+_FIELDS = 8
+
+def wire_time(nbytes, baudrate=115200, bytesize=8, parity='N', stopbits=1):
+    """nbytes 个字节的理论传输时间（秒）"""
+    return nbytes * bits_per_frame(bytesize, parity, stopbits) / baudrate
+
+def frame_op(frame):
+    """按功能码判断帧属于哪类操作"""
+    if len(frame) < 2:
+        return 'other'
+    fun = frame[1]
+    if fun == PU_ACK_NO_DATA:
+        # 5A F1 00 02 <被应答的功能码> <状态>；对上报的应答算作 report
+        return _FUN_OPS.get(frame[4], 'other') if len(frame) > 4 else 'other'
+    return _FUN_OPS.get(fun, 'other')
+
+class LinkBudget:
+    """
+    按操作类型累计收发字节和请求往返时间，report() 给出利用率和效率
+    snapshot() 保存当前累计值，report(since=...) 只统计之后的部分（一次批量读写）
+    """
+    def __init__(self, params=None, clock=None):
+        self._lock = threading.Lock()
+        # 计算经过时间用的时钟，虚拟时间运行时换成 VirtualClock（见 mcu_simulator.py）
+        self.clock = clock or time.perf_counter
+        self.set_params(params or {})
+        self.reset()
+
+    def set_params(self, params):
+        """params: UARTInterface.params（baudrate/bytesize/parity/stopbits）"""
+        self.baudrate = params.get('baudrate') or 115200
+        self.bytesize = params.get('bytesize') or 8
+        self.parity = params.get('parity') or 'N'
+        self.stopbits = params.get('stopbits') or 1
+        self.byte_time = bits_per_frame(self.bytesize, self.parity, self.stopbits) / self.baudrate
+
+    def reset(self):
+        with self._lock:
+            self.ops = {}
+            self.discarded = 0
+            self.started = self.clock()
+
+    def _row(self, op):
+        row = self.ops.get(op)
+        if row is None:
+            with self._lock:
+                row = self.ops.setdefault(op, [0] * _FIELDS)
+        return row
+
+    def tx(self, frame):
+        row = self._row(frame_op(frame))
+        n = len(frame)
+        row[TX_BYTES] += n
+        row[TX_PAYLOAD] += max(n - FRAME_OVERHEAD, 0)
+        row[TX_FRAMES] += 1
+
+    def rx(self, frame):
+        row = self._row(frame_op(frame))
+        n = len(frame)
+        row[RX_BYTES] += n
+        row[RX_PAYLOAD] += max(n - FRAME_OVERHEAD, 0)
+        row[RX_FRAMES] += 1
+
+    def rx_discarded(self, nbytes):
+        """解析器丢弃的字节同样占用了线路"""
+        self.discarded += nbytes
+
+    def request_done(self, op, rtt):
+        """请求从发送到匹配应答的时间（秒）"""
+        row = self._row(op)
+        row[REQUESTS] += 1
+        row[RTT] += rtt
+
+    def snapshot(self):
+        with self._lock:
+            return {'time': self.clock(), 'discarded': self.discarded,
+                    'ops': {op: list(row) for op, row in self.ops.items()}}
+
+    def report(self, since=None):
+        """
+        返回 {'params', 'elapsed_s', 'tx': {...}, 'rx': {...}, 'efficiency', 'ops': {op: {...}}}
+        since: snapshot() 的返回值，只统计之后的部分
+        """
+        now = self.snapshot()
+        base_ops = since['ops'] if since else {}
+        elapsed = now['time'] - (since['time'] if since else self.started)
+        discarded = now['discarded'] - (since['discarded'] if since else 0)
+        byte_time = self.byte_time
+        ops = {}
+        totals = [0] * _FIELDS
+        for op, row in sorted(now['ops'].items()):
+            base = base_ops.get(op, [0] * _FIELDS)
+            delta = [a - b for a, b in zip(row, base)]
+            if not any(delta[:REQUESTS]):
+                continue
+            for i, v in enumerate(delta):
+                totals[i] += v
+            total_bytes = delta[TX_BYTES] + delta[RX_BYTES]
+            tx_wire = delta[TX_BYTES] * byte_time
+            rx_wire = delta[RX_BYTES] * byte_time
+            entry = {
+                'tx_frames': delta[TX_FRAMES],
+                'rx_frames': delta[RX_FRAMES],
+                'tx_bytes': delta[TX_BYTES],
+                'rx_bytes': delta[RX_BYTES],
+                'payload_bytes': delta[TX_PAYLOAD] + delta[RX_PAYLOAD],
+                'efficiency': _ratio(delta[TX_PAYLOAD] + delta[RX_PAYLOAD], total_bytes),
+                'tx_wire_s': round(tx_wire, 6),
+                'rx_wire_s': round(rx_wire, 6),
+            }
+            if delta[REQUESTS]:
+                # 往返时间中线路传输以外的部分：设备处理 + 主机调度/轮询
+                rtt = delta[RTT]
+                entry['requests'] = delta[REQUESTS]
+                entry['rtt_avg_ms'] = round(rtt / delta[REQUESTS] * 1000, 3)
+                entry['wire_avg_ms'] = round((tx_wire + rx_wire) / delta[REQUESTS] * 1000, 3)
+                entry['wire_share_of_rtt'] = _ratio(min(tx_wire + rx_wire, rtt), rtt)
+            ops[op] = entry
+        tx_busy = totals[TX_BYTES] * byte_time
+        rx_busy = (totals[RX_BYTES] + discarded) * byte_time
+        all_bytes = totals[TX_BYTES] + totals[RX_BYTES] + discarded
+        return {
+            'params': {'baudrate': self.baudrate, 'bytesize': self.bytesize, 'parity': self.parity,
+                       'stopbits': self.stopbits, 'bits_per_byte': bits_per_frame(self.bytesize, self.parity, self.stopbits)},
+            'elapsed_s': round(elapsed, 6),
+            'tx': _direction(totals[TX_BYTES], tx_busy, elapsed),
+            'rx': dict(_direction(totals[RX_BYTES] + discarded, rx_busy, elapsed), discarded_bytes=discarded),
+            'efficiency': _ratio(totals[TX_PAYLOAD] + totals[RX_PAYLOAD], all_bytes),
+            'ops': ops,
+        }
+
+def _ratio(a, b):
+    return round(a / b, 4) if b else None
+
+def _direction(nbytes, busy, elapsed):
+    return {
+        'bytes': nbytes,
+        'busy_s': round(busy, 6),
+        'idle_s': round(max(elapsed - busy, 0.0), 6),
+        'utilisation': _ratio(busy, elapsed),
+    }
+
+def format_report(report, title=None):
+    """把 report() 的结果格式化为几行文本（GUI 日志 / 命令行）"""
+    p = report['params']
+    lines = [f"{title + ': ' if title else ''}{p['baudrate']} baud {p['bytesize']}{p['parity']}{p['stopbits']} "
+             f"({p['bits_per_byte']:g} bits/byte), elapsed {report['elapsed_s']:.3f} s, "
+             f"efficiency {_pct(report['efficiency'])}"]
+    for name in ('tx', 'rx'):
+        d = report[name]
+        lines.append(f"  {name}: {d['bytes']} bytes, busy {d['busy_s'] * 1000:.1f} ms, "
+                     f"idle {d['idle_s'] * 1000:.1f} ms, utilisation {_pct(d['utilisation'])}")
+    for op, e in report['ops'].items():
+        line = (f"  {op:<11} frames {e['tx_frames']}/{e['rx_frames']}  bytes {e['tx_bytes']}/{e['rx_bytes']}  "
+                f"efficiency {_pct(e['efficiency'])}")
+        if 'requests' in e:
+            line += f"  rtt {e['rtt_avg_ms']} ms (wire {_pct(e['wire_share_of_rtt'])})"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def _pct(value):
+    return '-' if value is None else f"{value * 100:.1f}%"
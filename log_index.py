@@ -0,0 +1,312 @@
+"""
+日志文件索引
+对 LogManager 保存的文本日志逐行建立索引（字节偏移、时间戳、方向、功能码、地址、状态码、错误类别），
+列用 array 存储，每个取值另有一份行号列表，过滤时从最短的列表出发逐行检查，结果按页惰性读取。
+文件仍在追加时调用 update() 只索引新增的行
+"""
+import bisect
+import re
+import threading
+import time
+from array import array
+
+DIR_NONE = 0
+DIR_TX = 1
+DIR_RX = 2
+DIRECTION_NAMES = {DIR_TX: 'tx', DIR_RX: 'rx'}
+
+# 错误类别，0 表示无
+ERROR_CLASSES = ('crc', 'discard', 'length', 'addr', 'timeout', 'status', 'error')
+_ERROR_CODES = {name: i + 1 for i, name in enumerate(ERROR_CLASSES)}
+
+NO_FUN = 0xFF
+NO_STATUS = 0xFF
+NO_ADDR = -1
+
+_TS_RE = re.compile(rb'\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\.(\d{1,6})\]? ?')
+_HEX_RE = re.compile(rb'(?:[0-9A-F]{2} )*[0-9A-F]{2}')
+_ADDR_RE = re.compile(rb'(?:addr=)?0x([0-9A-Fa-f]{4})\b')
+_STATUS_RE = re.compile(rb'status(?:_code)?: (?:0x)?([0-9A-Fa-f]{1,3})\b')
+
+# 消息前缀 -> (方向, 错误类别)，按顺序匹配
+_FRAME_PREFIXES = (
+    (b'Send: ', DIR_TX, None),
+    (b'recv packet: ', DIR_RX, None),
+    (b'Send upgrade pack ', DIR_TX, None),
+    (b'Send upgrade CRC command: ', DIR_TX, None),
+    (b'serial_data: CRC error', DIR_RX, 'crc'),
+    (b'serial_data: invalid data_len', DIR_RX, 'length'),
+    (b'discard packet', DIR_RX, 'discard'),
+    (b'Invalid FUN_CODE', DIR_RX, 'discard'),
+)
+
+INDEX_CHUNK = 4 * 1024 * 1024   # 每次从文件读取的字节数
+
+class LogIndex:
+    """
+    columns: offsets/ts/direction/fun/addr/status/error，下标为行号
+    postings: 各字段取值 -> 行号 array('I')
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.offsets = array('Q')
+        self.ts = array('d')
+        self.direction = array('B')
+        self.fun = array('B')
+        self.addr = array('i')
+        self.status = array('B')
+        self.error = array('B')
+        self.postings = {'direction': {}, 'fun': {}, 'addr': {}, 'status': {}, 'error': {}}
+        self.indexed_bytes = 0
+        self.ts_sorted = True
+        self._last_ts = 0.0
+        self._sec_cache = {}
+        self._partial = b''
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    # ---------- 建索引 ----------
+    def update(self, max_bytes=None):
+        """索引文件新增的内容，返回新增行数；max_bytes 限制本次读取量（后台逐步建立索引时使用）"""
+        if not self.path:
+            return 0
+        added = 0
+        with self._lock, open(self.path, 'rb') as f:
+            f.seek(self.indexed_bytes)
+            budget = max_bytes
+            while budget is None or budget > 0:
+                chunk = f.read(INDEX_CHUNK if budget is None else min(INDEX_CHUNK, budget))
+                if not chunk:
+                    break
+                if budget is not None:
+                    budget -= len(chunk)
+                added += self._index_chunk(chunk)
+        return added
+
+    def _index_chunk(self, chunk):
+        data = self._partial + chunk
+        base = self.indexed_bytes - len(self._partial)
+        pos = 0
+        added = 0
+        end = data.rfind(b'\n') + 1
+        while pos < end:
+            nl = data.index(b'\n', pos)
+            self._index_line(base + pos, data[pos:nl])
+            pos = nl + 1
+            added += 1
+        # 行未写完整（文件还在追加），下次再索引
+        self._partial = data[end:]
+        self.indexed_bytes = base + len(data)
+        return added
+
+    def _parse_ts(self, line):
+        m = _TS_RE.match(line)
+        if not m:
+            return self._last_ts, line
+        sec_text = m.group(1)
+        sec = self._sec_cache.get(sec_text)
+        if sec is None:
+            if len(self._sec_cache) > 4096:
+                self._sec_cache.clear()
+            sec = time.mktime(time.strptime(sec_text.decode(), '%Y-%m-%d %H:%M:%S'))
+            self._sec_cache[sec_text] = sec
+        frac = m.group(2)
+        ts = sec + int(frac) / (10 ** len(frac))
+        return ts, line[m.end():]
+
+    def _index_line(self, offset, line):
+        ts, msg = self._parse_ts(line.rstrip(b'\r'))
+        direction, fun, addr, status, error = DIR_NONE, NO_FUN, NO_ADDR, NO_STATUS, None
+        for prefix, d, err in _FRAME_PREFIXES:
+            if msg.startswith(prefix):
+                direction, error = d, err
+                sep = msg.rfind(b': ')
+                m = _HEX_RE.search(msg, sep + 2 if sep >= 0 else len(prefix))
+                if m:
+                    frame = bytes.fromhex(m.group(0)[:36].decode())
+                    fun, addr, status = _frame_fields(frame, error)
+                    if status not in (NO_STATUS, 0) and error is None:
+                        error = 'status'
+                break
+        else:
+            if msg.startswith(b'MCU report: '):
+                direction = DIR_RX
+                m = _ADDR_RE.search(msg)
+                if m:
+                    addr = int(m.group(1), 16)
+                if b'ADDR_ERROR' in msg:
+                    error = 'addr'
+            else:
+                m = _ADDR_RE.search(msg)
+                if m:
+                    addr = int(m.group(1), 16)
+                m = _STATUS_RE.search(msg)
+                if m:
+                    status = int(m.group(1), 16) & 0xFF
+                    if status:
+                        error = 'status'
+                if b'timeout' in msg:
+                    error = 'timeout'
+                elif error is None and (b'rror' in msg or b'failed' in msg):
+                    error = 'error'
+        self._append(offset, ts, direction, fun, addr, status, _ERROR_CODES.get(error, 0))
+
+    def _append(self, offset, ts, direction, fun, addr, status, error):
+        line_no = len(self.offsets)
+        self.offsets.append(offset)
+        if ts < self._last_ts:
+            self.ts_sorted = False
+        self._last_ts = ts
+        self.ts.append(ts)
+        self.direction.append(direction)
+        self.fun.append(fun)
+        self.addr.append(addr)
+        self.status.append(status)
+        self.error.append(error)
+        postings = self.postings
+        if direction:
+            _post(postings['direction'], direction, line_no)
+        if fun != NO_FUN:
+            _post(postings['fun'], fun, line_no)
+        if addr != NO_ADDR:
+            _post(postings['addr'], addr, line_no)
+        if status != NO_STATUS:
+            _post(postings['status'], status, line_no)
+        if error:
+            _post(postings['error'], error, line_no)
+
+    # ---------- 查询 ----------
+    def query(self, direction=None, fun=None, addr=None, status=None, error=None,
+              time_from=None, time_to=None, text=None):
+        """返回 LogQuery；各条件为 None 表示不限制，error 为 ERROR_CLASSES 中的名称"""
+        return LogQuery(self, direction, fun, addr, status,
+                        _ERROR_CODES.get(error, -1) if error is not None else None,
+                        time_from, time_to, text)
+
+    def read_lines(self, line_numbers):
+        """按行号读取原始文本"""
+        lines = []
+        if not line_numbers:
+            return lines
+        with open(self.path, 'rb') as f:
+            for n in line_numbers:
+                f.seek(self.offsets[n])
+                lines.append(f.readline().rstrip(b'\r\n').decode('utf-8', errors='replace'))
+        return lines
+
+def _post(table, key, line_no):
+    lst = table.get(key)
+    if lst is None:
+        lst = table[key] = array('I')
+    lst.append(line_no)
+
+def _frame_fields(frame, error):
+    """从帧的前几个字节取出 (功能码, 地址, 状态码)"""
+    fun, addr, status = NO_FUN, NO_ADDR, NO_STATUS
+    if len(frame) < 2 or frame[0] != 0x5A or error == 'discard':
+        return fun, addr, status
+    fun = frame[1]
+    if fun in (0x10, 0x20, 0x11) and len(frame) >= 6:
+        addr = (frame[4] << 8) | frame[5]
+    elif fun == 0xF1 and len(frame) >= 6:
+        status = frame[5]
+    return fun, addr, status
+
+class LogQuery:
+    """惰性查询：page() 需要多少就匹配多少，已匹配的行号缓存在 matches 中"""
+    PAGE_SIZE = 200
+
+    def __init__(self, index, direction, fun, addr, status, error, time_from, time_to, text):
+        self.index = index
+        self.checks = [(name, value) for name, value in (
+            ('direction', direction), ('fun', fun), ('addr', addr),
+            ('status', status), ('error', error)) if value is not None]
+        self.time_from = time_from
+        self.time_to = time_to
+        self.text = text.encode('utf-8') if text else None
+        self.matches = array('I')
+        self.done = False
+        self._iter = self._candidates()
+
+    def _range(self):
+        """时间窗对应的行号范围，时间戳有序时用二分查找"""
+        index = self.index
+        lo, hi = 0, len(index)
+        if index.ts_sorted:
+            if self.time_from is not None:
+                lo = bisect.bisect_left(index.ts, self.time_from, 0, hi)
+            if self.time_to is not None:
+                hi = bisect.bisect_right(index.ts, self.time_to, lo, hi)
+        return lo, hi
+
+    def _candidates(self):
+        index = self.index
+        lo, hi = self._range()
+        # 选最短的行号列表作为候选，其余条件逐行检查
+        best = None
+        for name, value in self.checks:
+            lst = index.postings[name].get(value, array('I'))
+            if best is None or len(lst) < len(best):
+                best = lst
+        if best is not None:
+            start = bisect.bisect_left(best, lo)
+            stop = bisect.bisect_left(best, hi)
+            candidates = (best[i] for i in range(start, stop))
+        else:
+            candidates = iter(range(lo, hi))
+        checks = [(getattr(index, name), value) for name, value in self.checks]
+        ts = index.ts
+        t_from, t_to = self.time_from, self.time_to
+        for n in candidates:
+            ok = True
+            for col, value in checks:
+                if col[n] != value:
+                    ok = False
+                    break
+            if not ok:
+                continue
+            if not index.ts_sorted and ((t_from is not None and ts[n] < t_from) or
+                                        (t_to is not None and ts[n] > t_to)):
+                continue
+            yield n
+
+    def _fill(self, count):
+        if self.done:
+            return
+        need = count - len(self.matches)
+        if need <= 0:
+            return
+        text = self.text
+        if text is None:
+            for n in self._iter:
+                self.matches.append(n)
+                need -= 1
+                if need <= 0:
+                    return
+        else:
+            # 文本匹配需要读文件，按块读取候选行
+            with open(self.index.path, 'rb') as f:
+                offsets = self.index.offsets
+                for n in self._iter:
+                    f.seek(offsets[n])
+                    if text in f.readline():
+                        self.matches.append(n)
+                        need -= 1
+                        if need <= 0:
+                            return
+        self.done = True
+
+    def page(self, page_no, page_size=None):
+        """返回第 page_no 页的 (行号, 文本) 列表"""
+        page_size = page_size or self.PAGE_SIZE
+        start = page_no * page_size
+        self._fill(start + page_size)
+        numbers = list(self.matches[start:start + page_size])
+        return list(zip(numbers, self.index.read_lines(numbers)))
+
+    def count(self, limit=None):
+        """匹配行数；limit 为 None 时会匹配到底"""
+        self._fill(limit if limit is not None else float('inf'))
+        return len(self.matches)
@@ -1,39 +1,372 @@
-import datetime
+import atexit
+import os
+import queue
+import threading
+import time
+import weakref
+
+# 后台写日志的默认参数
+LOG_QUEUE_SIZE = 20000          # 队列满时丢弃新日志并计数，不阻塞调用线程
+LOG_FLUSH_BYTES = 64 * 1024     # 积累到这么多字节就写一次
+LOG_FLUSH_INTERVAL = 0.5        # 最长多久写一次（秒）
+RECORD_SIZE_ESTIMATE = 80       # 未格式化的LogRecord按这个字节数估算批量大小
+REPEAT_WINDOW = 1.0             # 相同日志在这个时间内重复出现时只计数（秒）
+
+# 日志级别
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+# 日志分类
+CATEGORIES = ('tx', 'rx', 'report', 'upgrade', 'error', 'info')
+
+# 单调时钟 -> 墙钟的偏移，只在格式化时使用
+_WALL_OFFSET = time.time() - time.monotonic()
+_second_cache = (None, '')
+
+def format_hex(data, limit=None):
+    """字节转成 '5A 10 00 02' 形式，limit 限制最多显示的字节数"""
+    if limit is not None and len(data) > limit:
+        return bytes(data[:limit]).hex(' ').upper() + f" ... [{len(data)} bytes]"
+    return bytes(data).hex(' ').upper()
+
+def format_timestamp(ts):
+    """单调时钟时间戳 -> '[2024-01-01 12:00:00.123]'，同一秒内复用格式化结果"""
+    global _second_cache
+    wall = ts + _WALL_OFFSET
+    sec = int(wall)
+    cached_sec, prefix = _second_cache
+    if cached_sec != sec:
+        prefix = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sec))
+        _second_cache = (sec, prefix)
+    return f"[{prefix}.{int((wall - sec) * 1000):03d}]"
+
+class LogRecord:
+    """
+    结构化日志记录：保存级别、分类、单调时钟时间戳、消息模板和原始字节，
+    只有在某个输出端需要时才格式化（msg % args + 十六进制数据）
+    """
+    __slots__ = ('level', 'category', 'msg', 'args', 'data', 'data_limit', 'ts', '_text')
+
+    def __init__(self, level, category, msg, args=(), data=None, data_limit=None, ts=None):
+        self.level = level
+        self.category = category
+        self.msg = msg
+        self.args = args
+        self.data = data
+        self.data_limit = data_limit
+        self.ts = time.monotonic() if ts is None else ts
+        self._text = None
+
+    def get_message(self):
+        if self._text is None:
+            text = self.msg % self.args if self.args else self.msg
+            if self.data is not None:
+                text += format_hex(self.data, self.data_limit)
+            self._text = text
+        return self._text
+
+    def same_as(self, other):
+        """判断是否为重复的同一条日志（不比较时间戳）"""
+        return (self.msg == other.msg and self.category == other.category and self.level == other.level
+                and self.args == other.args and self.data == other.data)
+
+    def __str__(self):
+        return self.get_message()
+
+    def __format__(self, spec):
+        return format(self.get_message(), spec)
+
+def format_record(record):
+    return f"{format_timestamp(record.ts)} {record.get_message()}"
+
+class LogFileWriter:
+    """
+    后台日志写线程：调用线程只把日志行放入有界队列，
+    写线程按大小/时间批量写入，支持按大小滚动和gzip压缩滚动后的文件
+    """
+    _STOP = object()
+
+    def __init__(self, path, queue_size=LOG_QUEUE_SIZE, flush_bytes=LOG_FLUSH_BYTES,
+                 flush_interval=LOG_FLUSH_INTERVAL, max_bytes=None, backup_count=5,
+                 compress=False, error_callback=None, formatter=format_record):
+        self.path = path
+        self.formatter = formatter
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.error_callback = error_callback
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {'lines': 0, 'bytes': 0, 'flushes': 0, 'rotations': 0, 'dropped': 0}
+        self._dropped_unreported = 0
+        self._file = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, line):
+        """放入一行日志（字符串或LogRecord），队列满时丢弃并计数，返回是否成功"""
+        try:
+            self.queue.put_nowait(line)
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            self._dropped_unreported += 1
+            return False
+
+    def reset(self, content):
+        """清空文件并写入content（保存当前日志时使用），与已排队的日志保持顺序"""
+        self.queue.put(('reset', content))
+
+    def flush(self, timeout=5.0):
+        """等待队列中的日志全部写入文件"""
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._thread.is_alive():
+            self.queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def _report_error(self, e):
+        if self.error_callback:
+            try:
+                self.error_callback(f"Failed to write log file: {e}")
+            except Exception:
+                pass
+
+    def _open(self, mode='a'):
+        if self._file is None:
+            self._file = open(self.path, mode, encoding='utf-8', buffering=LOG_FLUSH_BYTES)
+        return self._file
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
+    def _rotate(self):
+        self._close_file()
+        ext = '.gz' if self.compress else ''
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}{ext}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}{ext}")
+        if self.backup_count > 0:
+            target = f"{self.path}.1"
+            if self.compress:
+                import gzip
+                import shutil
+                with open(self.path, 'rb') as src, gzip.open(target + '.gz', 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, target)
+        else:
+            os.remove(self.path)
+        self.stats['rotations'] += 1
+
+    def _is_line(self, item):
+        return item is not None and item is not self._STOP and type(item) is not tuple
+
+    def _write_batch(self, lines):
+        formatter = self.formatter
+        lines = [line if type(line) is str else formatter(line) for line in lines]
+        if self._dropped_unreported:
+            dropped, self._dropped_unreported = self._dropped_unreported, 0
+            lines.append(f"[log] {dropped} log lines dropped (queue full)")
+        data = '\n'.join(lines) + '\n'
+        try:
+            f = self._open()
+            f.write(data)
+            f.flush()
+            self.stats['lines'] += len(lines)
+            self.stats['bytes'] += len(data)
+            self.stats['flushes'] += 1
+            if self.max_bytes and f.tell() >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            self._close_file()
+            self._report_error(e)
+
+    def _run(self):
+        pending = []
+        pending_bytes = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=timeout if pending else None)
+            except queue.Empty:
+                item = None
+            if self._is_line(item):
+                pending.append(item)
+                pending_bytes += len(item) + 1 if type(item) is str else RECORD_SIZE_ESTIMATE
+                # 队列里已有的日志一次取完
+                while pending_bytes < self.flush_bytes:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+                        break
+                    if not self._is_line(item):
+                        break
+                    pending.append(item)
+                    pending_bytes += len(item) + 1 if type(item) is str else RECORD_SIZE_ESTIMATE
+                if self._is_line(item):
+                    item = None
+            if pending and (item is not None or pending_bytes >= self.flush_bytes
+                            or time.monotonic() - last_flush >= self.flush_interval):
+                self._write_batch(pending)
+                pending, pending_bytes = [], 0
+                last_flush = time.monotonic()
+            if item is None:
+                continue
+            if item is self._STOP:
+                self._close_file()
+                return
+            command, arg = item
+            if command == 'reset':
+                try:
+                    self._close_file()
+                    with open(self.path, 'w', encoding='utf-8') as f:
+                        f.write(arg)
+                except Exception as e:
+                    self._report_error(e)
+            elif command == 'flush':
+                arg.set()
+
+# 尚未 close 的 LogManager；退出时由一个 atexit 钩子统一关闭，弱引用不会让已丢弃的实例一直存活
+_open_managers = weakref.WeakSet()
+
+def _close_open_managers():
+    for manager in list(_open_managers):
+        manager.close()
+
+atexit.register(_close_open_managers)
 
 class LogManager:
-    def __init__(self):
+    def __init__(self, max_bytes=None, backup_count=5, compress=False):
         self.log_file_path = None
         self.log_callback = None  # 用于GUI回调显示
+        self.log_callback_records = False
+        self.writer = None
+        # 日志文件滚动设置，max_bytes为None表示不滚动
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        # 过滤：低于 level 或不在 categories 中的记录直接丢弃，不做格式化
+        self.level = DEBUG
+        self.categories = None  # None 表示全部分类
+        self.repeat_window = REPEAT_WINDOW
+        self.counters = {'records': 0, 'filtered': 0, 'suppressed': 0}
+        self._last_record = None
+        self._repeat_count = 0
+        self._repeat_lock = threading.Lock()
+        _open_managers.add(self)
 
-    def set_log_callback(self, callback):
+    def set_log_callback(self, callback, records=False):
+        """records=True 时回调收到未格式化的 LogRecord，由回调方决定何时格式化"""
         self.log_callback = callback
+        self.log_callback_records = records
+
+    def set_rotation(self, max_bytes=None, backup_count=5, compress=False):
+        """设置按大小滚动，下次 set_log_file_path 时生效"""
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
 
     def set_log_file_path(self, path):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
         self.log_file_path = path
+        if path:
+            _open_managers.add(self)
+            self.writer = LogFileWriter(path, max_bytes=self.max_bytes, backup_count=self.backup_count,
+                                        compress=self.compress, error_callback=self.log_callback)
+
+    def set_filter(self, level=DEBUG, categories=None):
+        """只输出 >= level 且分类在 categories 中的日志，categories 为 None 表示全部"""
+        self.level = level
+        self.categories = set(categories) if categories is not None else None
+
+    def wants(self, level, category):
+        return level >= self.level and (self.categories is None or category in self.categories)
 
-    def add_log(self, message):
-        now = datetime.datetime.now()
-        timestamp = now.strftime("[%Y-%m-%d %H:%M:%S.%f]")[:-3]
-        msg = f"{timestamp} {message}"
+    def add_log(self, message, level=INFO, category='info'):
+        """message 可以是字符串或 LogRecord（UARTService 传入的是 LogRecord）"""
+        if isinstance(message, LogRecord):
+            record = message
+        else:
+            record = LogRecord(level, category, message)
+        self.counters['records'] += 1
+        if not self.wants(record.level, record.category):
+            self.counters['filtered'] += 1
+            return
+        # 相同日志在 repeat_window 内重复时只计数，之后输出一条汇总
+        with self._repeat_lock:
+            last = self._last_record
+            if last is not None and record.ts - last.ts < self.repeat_window and record.same_as(last):
+                self._repeat_count += 1
+                self.counters['suppressed'] += 1
+                return
+            repeated, self._repeat_count = self._repeat_count, 0
+            self._last_record = record
+        if repeated:
+            self._emit(LogRecord(last.level, last.category, "(last message repeated %d times)", (repeated,)))
+        self._emit(record)
+
+    def _emit(self, record):
         if self.log_callback:
-            self.log_callback(msg)
-        if self.log_file_path:
-            try:
-                with open(self.log_file_path, "a", encoding="utf-8") as f:
-                    f.write(msg + '\n')
-            except Exception as e:
-                if self.log_callback:
-                    self.log_callback(f"Failed to write log file: {e}")
+            self.log_callback(record if self.log_callback_records else format_record(record))
+        writer = self.writer
+        if writer:
+            writer.put(record)
 
     def clear_log(self):
         if self.log_callback:
             self.log_callback("__CLEAR__")
 
     def save_current_log_to_file(self, log_content):
-        if self.log_file_path:
+        if self.writer:
+            self.writer.reset(log_content)
+        elif self.log_file_path:
             try:
                 with open(self.log_file_path, "w", encoding="utf-8") as f:
                     f.write(log_content)
             except Exception as e:
                 if self.log_callback:
-                    self.log_callback(f"Failed to save log: {e}") 
\ No newline at end of file
+                    self.log_callback(f"Failed to save log: {e}")
+
+    def get_stats(self):
+        stats = dict(self.counters)
+        if self.writer:
+            stats.update(self.writer.stats)
+            stats['queued'] = self.writer.queue_depth()
+        return stats
+
+    def flush(self, timeout=5.0):
+        with self._repeat_lock:
+            repeated, self._repeat_count = self._repeat_count, 0
+            last = self._last_record
+            self._last_record = None
+        if repeated:
+            self._emit(LogRecord(last.level, last.category, "(last message repeated %d times)", (repeated,)))
+        if self.writer:
+            return self.writer.flush(timeout)
+        return True
+
+    def close(self):
+        _open_managers.discard(self)
+        if self.writer:
+            self.writer.close()
+            self.writer = None
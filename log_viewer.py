@@ -0,0 +1,187 @@
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk, filedialog
+import tkinter.messagebox as messagebox
+from log_index import LogIndex, ERROR_CLASSES, DIR_TX, DIR_RX
+
+INDEX_STEP_BYTES = 8 * 1024 * 1024  # 后台每次索引的字节数，期间界面可以查询已索引的部分
+FOLLOW_INTERVAL = 1.0               # 索引完成后检查文件追加的间隔（秒）
+STATUS_INTERVAL_MS = 500
+
+class LogViewer(tk.Toplevel):
+    """
+    日志查看窗口：后台为日志文件建立索引，按地址/功能码/方向/状态码/错误类别/时间窗/文本过滤，
+    结果按页显示
+    """
+    def __init__(self, master, path=None, get_label=None):
+        super().__init__(master)
+        self.get_label = get_label or (lambda key: key)
+        self.title(self.get_label("log_viewer"))
+        self.geometry("900x600")
+        self.index = None
+        self.query = None
+        self.page_no = 0
+        self._closed = False
+        self._worker = None
+        self.create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        if path:
+            self.open_file(path)
+        self.after(STATUS_INTERVAL_MS, self._update_status)
+
+    def create_widgets(self):
+        filter_frame = ttk.Frame(self, padding="5")
+        filter_frame.pack(fill='x')
+        self.filter_vars = {}
+        fields = (
+            ('addr', "filter_addr", 8),
+            ('fun', "filter_fun", 5),
+            ('status', "filter_status", 5),
+            ('time_from', "filter_time_from", 20),
+            ('time_to', "filter_time_to", 20),
+            ('text', "filter_text", 16),
+        )
+        col = 0
+        for key, label_key, width in fields:
+            ttk.Label(filter_frame, text=self.get_label(label_key)).grid(row=0, column=col, sticky='w', padx=(0, 2))
+            var = tk.StringVar()
+            entry = ttk.Entry(filter_frame, textvariable=var, width=width)
+            entry.grid(row=1, column=col, sticky='w', padx=(0, 6))
+            entry.bind('<Return>', lambda e: self.apply_filter())
+            self.filter_vars[key] = var
+            col += 1
+        ttk.Label(filter_frame, text=self.get_label("filter_direction")).grid(row=0, column=col, sticky='w')
+        self.filter_vars['direction'] = tk.StringVar()
+        ttk.Combobox(filter_frame, textvariable=self.filter_vars['direction'], values=('', 'tx', 'rx'),
+                     width=4, state='readonly').grid(row=1, column=col, sticky='w', padx=(0, 6))
+        col += 1
+        ttk.Label(filter_frame, text=self.get_label("filter_error")).grid(row=0, column=col, sticky='w')
+        self.filter_vars['error'] = tk.StringVar()
+        ttk.Combobox(filter_frame, textvariable=self.filter_vars['error'], values=('',) + ERROR_CLASSES,
+                     width=8, state='readonly').grid(row=1, column=col, sticky='w', padx=(0, 6))
+        col += 1
+        ttk.Button(filter_frame, text=self.get_label("apply_filter"), command=self.apply_filter).grid(row=1, column=col, padx=2)
+        ttk.Button(filter_frame, text=self.get_label("open_log"), command=self.on_open).grid(row=1, column=col + 1, padx=2)
+
+        text_frame = ttk.Frame(self)
+        text_frame.pack(fill='both', expand=True, padx=5)
+        self.text = tk.Text(text_frame, wrap=tk.NONE, state='disabled')
+        yscroll = ttk.Scrollbar(text_frame, orient='vertical', command=self.text.yview)
+        xscroll = ttk.Scrollbar(text_frame, orient='horizontal', command=self.text.xview)
+        self.text.configure(yscrollcommand=yscroll.set, xscrollcommand=xscroll.set)
+        self.text.grid(row=0, column=0, sticky='nsew')
+        yscroll.grid(row=0, column=1, sticky='ns')
+        xscroll.grid(row=1, column=0, sticky='ew')
+        text_frame.rowconfigure(0, weight=1)
+        text_frame.columnconfigure(0, weight=1)
+
+        nav_frame = ttk.Frame(self, padding="5")
+        nav_frame.pack(fill='x')
+        ttk.Button(nav_frame, text=self.get_label("prev_page"), command=self.prev_page).pack(side='left')
+        ttk.Button(nav_frame, text=self.get_label("next_page"), command=self.next_page).pack(side='left', padx=5)
+        self.status_label = ttk.Label(nav_frame, text="")
+        self.status_label.pack(side='left', padx=10)
+
+    # ---------- 文件与索引 ----------
+    def on_open(self):
+        path = filedialog.askopenfilename(parent=self, title="Open Log File",
+                                          filetypes=[("Text Files", "*.txt *.log"), ("All Files", "*.*")])
+        if path:
+            self.open_file(path)
+
+    def open_file(self, path):
+        # 之前的索引线程发现 self.index 已更换后自行退出
+        self.index = LogIndex(path)
+        self.query = None
+        self.page_no = 0
+        self.title(f"{self.get_label('log_viewer')} - {path}")
+        self._worker = threading.Thread(target=self._index_loop, args=(self.index,), daemon=True)
+        self._worker.start()
+        # 先索引一小段再显示第一页
+        self.after(200, self.apply_filter)
+
+    def _index_loop(self, index):
+        while not self._closed and index is self.index:
+            try:
+                added = index.update(max_bytes=INDEX_STEP_BYTES)
+            except OSError:
+                added = 0
+            if not added:
+                time.sleep(FOLLOW_INTERVAL)
+
+    # ---------- 过滤与分页 ----------
+    def _parse_int(self, key):
+        text = self.filter_vars[key].get().strip()
+        if not text:
+            return None
+        return int(text, 16)
+
+    def _parse_time(self, key):
+        text = self.filter_vars[key].get().strip()
+        if not text:
+            return None
+        if len(text) <= 12 and self.index is not None and len(self.index):
+            # 只有时间时使用日志第一行的日期
+            date = time.strftime('%Y-%m-%d', time.localtime(self.index.ts[0]))
+            text = f"{date} {text}"
+        sec_text, _, frac = text.partition('.')
+        ts = time.mktime(time.strptime(sec_text, '%Y-%m-%d %H:%M:%S'))
+        return ts + (float(f"0.{frac}") if frac else 0.0)
+
+    def apply_filter(self):
+        if self.index is None:
+            return
+        try:
+            direction = {'tx': DIR_TX, 'rx': DIR_RX}.get(self.filter_vars['direction'].get())
+            self.query = self.index.query(
+                direction=direction,
+                fun=self._parse_int('fun'),
+                addr=self._parse_int('addr'),
+                status=self._parse_int('status'),
+                error=self.filter_vars['error'].get() or None,
+                time_from=self._parse_time('time_from'),
+                time_to=self._parse_time('time_to'),
+                text=self.filter_vars['text'].get() or None,
+            )
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid filter:\n{e}", parent=self)
+            return
+        self.page_no = 0
+        self.show_page()
+
+    def show_page(self):
+        rows = self.query.page(self.page_no) if self.query else []
+        self.text.configure(state='normal')
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, '\n'.join(line for _, line in rows))
+        self.text.configure(state='disabled')
+        self._update_status(reschedule=False)
+
+    def next_page(self):
+        if self.query and len(self.query.page(self.page_no + 1)):
+            self.page_no += 1
+            self.show_page()
+
+    def prev_page(self):
+        if self.page_no > 0:
+            self.page_no -= 1
+            self.show_page()
+
+    def _update_status(self, reschedule=True):
+        if self._closed and reschedule:
+            return
+        parts = []
+        if self.index is not None:
+            parts.append(f"indexed: {len(self.index)} lines")
+        if self.query is not None:
+            matches = len(self.query.matches)
+            parts.append(f"page {self.page_no + 1}")
+            parts.append(f"matches: {matches}{'' if self.query.done else '+'}")
+        self.status_label.configure(text='   '.join(parts))
+        if reschedule:
+            self.after(STATUS_INTERVAL_MS, self._update_status)
+
+    def on_close(self):
+        self._closed = True
+        self.destroy()
@@ -1,10 +1,10 @@
+from startup_profiler import StartupProfiler
+profiler = StartupProfiler()    # 尽早开始计时，导入耗时也计入
 import tkinter as tk
-from tkinter import ttk, messagebox
-import json
+from tkinter import messagebox
 import os
 import sys
 import traceback
-from uart_gui import UARTTestGUI
 from utils import get_resource_path
 
 def check_requirements():
@@ -18,11 +18,11 @@ def check_requirements():
     if not os.path.exists(label_path):
         messagebox.showerror("错误", "找不到语言文件：label.json")
         return False
-    # 检查配置文件格式
+    # 检查配置文件格式：加载编译好的寄存器表（带缓存），之后 ItemManager 直接复用，不再解析第二次
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            json.load(f)
-    except json.JSONDecodeError:
+        from register_map import load_register_map
+        load_register_map(config_path)
+    except ValueError:
         messagebox.showerror("错误", "配置文件格式错误：uart_command_set.json")
         return False
     except Exception as e:
@@ -31,15 +31,29 @@ def check_requirements():
 
     return True
 
+def _log_lines_arg(default):
+    """--log-lines N：日志区最多保留的行数"""
+    if '--log-lines' in sys.argv:
+        try:
+            return max(1, int(sys.argv[sys.argv.index('--log-lines') + 1]))
+        except (IndexError, ValueError):
+            print("--log-lines needs a positive integer, using the default")
+    return default
+
 def main():
     try:
-        # 检查运行环境
-        if not check_requirements():
-            return
-
+        profiler.exit_when_done = '--profile-startup' in sys.argv
+        profiler.mark('imports')
         # 创建主窗口
         root = tk.Tk()
         root.title("UART Test Tool")
+        profiler.mark('tk_root')
+
+        # 检查运行环境
+        if not check_requirements():
+            root.destroy()
+            return
+        profiler.mark('check_requirements')
         
         # 设置窗口大小和位置
         window_width = 1200
@@ -50,9 +64,11 @@ def main():
         y = (screen_height - window_height) // 2
         root.geometry(f"{window_width}x{window_height}+{x}+{y}")
         
-        # 创建应用实例
+        # 创建应用实例；界面模块在根窗口创建后再导入
         try:
-            app = UARTTestGUI(root)
+            from uart_gui import UARTTestGUI, LOG_MAX_LINES
+            profiler.mark('import_gui')
+            app = UARTTestGUI(root, profiler=profiler, log_max_lines=_log_lines_arg(LOG_MAX_LINES))
         except Exception as e:
             error_msg = str(e)
             error_details = traceback.format_exc()
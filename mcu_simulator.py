@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+"""
+BMS MCU 仿真器
+以 uart_command_set.json 作为寄存器表，实现完整的PU协议:
+    E0 握手、F0 复位、0x10 读、0x20 写（权限/类型检查）、0x30/0x31 升级（CRC校验）
+    以及 0x40/0x50/0x60 主动上报
+可配置应答延时、波特率字节时间、上报速率和故障注入，用于在没有硬件时测试吞吐和时延
+
+用法:
+    python mcu_simulator.py --pty                     # 打印 pty:///dev/pts/N，在工具中连接该URL
+    python mcu_simulator.py --tcp 127.0.0.1:5555      # 工具中连接 tcp://127.0.0.1:5555
+    python mcu_simulator.py --pty --baud 115200 --latency 0.002 --report-rate 20 --crc-error 0.01
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from protocol import (
+    PU_FRAME_HEAD, PU_FUN_READ, PU_FUN_WRITE, PU_FUN_UPGRADE, PU_FUN_UPGRADE_CRC,
+    PU_FUN_MCU_RESET, PU_FUN_CONNECT,
+    PU_FUN_MCU_WRITE_ALARM, PU_FUN_MCU_WRITE_CONFIG, PU_FUN_MCU_WRITE_DATA,
+    PU_ACK_WITH_DATA, PU_ACK_NO_DATA,
+    PU_STATUS_OK, PU_STATUS_NO_FUNCODE, PU_STATUS_CRC_ERROR, PU_STATUS_ADDRESS_ERROR,
+    PU_STATUS_NO_PERMISSION, PU_STATUS_DATA_ERROR, PU_STATUS_DATA_LENGTH_ERROR,
+    PU_STATUS_UPGRADE_PACKAGE_CRC_ERROR, UPGRADE_PACKET_SIZE,
+    calculate_crc16, calculate_complete_addr, pack_value_by_type, generate_status_response, bits_per_frame,
+)
+from transport import Transport
+from utils import get_resource_path
+
+REPORT_FUN_CODES = (PU_FUN_MCU_WRITE_ALARM, PU_FUN_MCU_WRITE_CONFIG, PU_FUN_MCU_WRITE_DATA)
+# 单帧最大LEN，超过则认为是错误的包头
+MAX_FRAME_DATA_LEN = UPGRADE_PACKET_SIZE + 2
+
+# 写入值在4字节中允许的最大原始值
+_RAW_LIMITS = {
+    'int8_t': 0xFF, 'uint8_t': 0xFF,
+    'int16_t': 0xFFFF, 'uint16_t': 0xFFFF,
+}
+
+def _frame(fun_code, payload=b''):
+    frame = bytearray([PU_FRAME_HEAD, fun_code, (len(payload) >> 8) & 0xFF, len(payload) & 0xFF])
+    frame += payload
+    crc = calculate_crc16(frame, len(frame))
+    frame.append((crc >> 8) & 0xFF)
+    frame.append(crc & 0xFF)
+    return bytes(frame)
+
+class FaultConfig:
+    """
+    故障注入配置，各项为每帧发生的概率(0~1)
+    crc_error: 回复帧CRC错误
+    drop_byte: 回复帧中随机丢掉一个字节
+    truncate: 回复帧只发送一部分（LEN字段比实际数据长）
+    noise: 在回复帧前插入无包头的垃圾字节
+    delay_ack: 回复额外延时 delay_ack_time 秒
+    """
+    def __init__(self, crc_error=0.0, drop_byte=0.0, truncate=0.0, noise=0.0,
+                 delay_ack=0.0, delay_ack_time=0.5, seed=None):
+        self.crc_error = crc_error
+        self.drop_byte = drop_byte
+        self.truncate = truncate
+        self.noise = noise
+        self.delay_ack = delay_ack
+        self.delay_ack_time = delay_ack_time
+        self.rng = random.Random(seed)
+
+    def any(self):
+        return any((self.crc_error, self.drop_byte, self.truncate, self.noise, self.delay_ack))
+
+class Register:
+    __slots__ = ('addr', 'name', 'type', 'writable', 'raw')
+
+    def __init__(self, addr, name, type_str, writable, raw):
+        self.addr = addr
+        self.name = name
+        self.type = type_str
+        self.writable = writable
+        self.raw = raw
+
+def load_register_file(path=None):
+    """读取寄存器表，返回 {addr: Register}，初始值取自 'write data'"""
+    path = path or get_resource_path('uart_command_set.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    registers = {}
+    for item in items:
+        if 'index' in item:
+            addr = int(item['index'], 16)
+        else:
+            addr = calculate_complete_addr(item)
+        type_str = item.get('type', 'int32_t')
+        try:
+            raw = pack_value_by_type(item.get('write data', '0'), type_str)
+        except (ValueError, struct.error):
+            raw = b'\x00\x00\x00\x00'
+        registers[addr] = Register(addr, item.get('item', ''), type_str,
+                                   'W' in item.get('permission', 'R'), raw)
+    return registers
+
+class SimulatedMCU:
+    def __init__(self, transport, register_file=None, registers=None,
+                 response_latency=0.0, baudrate=None, bytesize=8, parity='N', stopbits=1,
+                 report_rate=0.0, report_functions=(PU_FUN_MCU_WRITE_DATA,), report_batch=8,
+                 handshake_delay=0.0, faults=None, log_func=None, clock=None, slave_fd=None):
+        """
+        :param transport: 设备端传输（transport.py 中的实现）
+        :param response_latency: 收到完整命令到开始回复的处理时间（秒）
+        :param baudrate: 设置后按字节时间模拟收发耗时；None表示不限速
+        :param report_rate: 每秒主动上报帧数，0为不上报
+        :param report_batch: 每个上报帧包含的寄存器个数
+        :param handshake_delay: 启动后多长时间才开始回应E0握手
+        :param clock: 时间函数，默认 time.monotonic；虚拟时间运行时见 VirtualLink
+        :param slave_fd: 伪终端从端的fd（serve_pty），stop() 时与 transport 一起关闭
+        """
+        self.transport = transport
+        self.registers = registers if registers is not None else load_register_file(register_file)
+        self.response_latency = response_latency
+        self.byte_time = bits_per_frame(bytesize, parity, stopbits) / baudrate if baudrate else 0.0
+        self.report_rate = report_rate
+        self.report_functions = tuple(report_functions)
+        self.report_batch = max(1, report_batch)
+        self.handshake_delay = handshake_delay
+        self.faults = faults or FaultConfig()
+        self.log_func = log_func or (lambda msg: None)
+        self.clock = clock or time.monotonic
+
+        self.running = False
+        self.connected = False
+        self.upgrade_chunks = {}
+        self.upgraded_image = None
+        self.stats = {
+            'rx_frames': 0, 'tx_frames': 0, 'rx_bytes': 0, 'tx_bytes': 0,
+            'reads': 0, 'writes': 0, 'handshakes': 0, 'resets_acked': 0,
+            'upgrade_packets': 0, 'upgrades_ok': 0, 'upgrades_failed': 0,
+            'reports_sent': 0, 'reports_acked': 0, 'crc_errors': 0, 'errors_replied': 0,
+            'discarded_bytes': 0, 'faults_injected': 0,
+        }
+        self._addr_cycle = itertools.cycle(sorted(self.registers))
+        self._tx_queue = []
+        self._tx_seq = itertools.count()
+        self._tx_cond = threading.Condition()
+        self._tx_busy_until = 0.0
+        self._threads = []
+        self._start_time = 0.0
+        self._slave_fd = slave_fd
+
+    # 生命周期
+    def start(self):
+        self.running = True
+        self._start_time = self.clock()
+        for target in (self._rx_loop, self._tx_loop, self._report_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self.running = False
+        with self._tx_cond:
+            self._tx_cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=1)
+        self._threads = []
+        if self.transport is not None:
+            try:
+                self.transport.close()
+            except Exception as e:
+                self.log_func(f"sim close error: {e}")
+        if self._slave_fd is not None:
+            try:
+                os.close(self._slave_fd)
+            except OSError:
+                pass
+            self._slave_fd = None
+
+    # 发送
+    def _schedule(self, frame, delay=0.0, is_reply=True):
+        due = self.clock() + delay
+        if is_reply and self.faults.delay_ack and self.faults.rng.random() < self.faults.delay_ack:
+            due += self.faults.delay_ack_time
+            self.stats['faults_injected'] += 1
+        with self._tx_cond:
+            heapq.heappush(self._tx_queue, (due, next(self._tx_seq), frame))
+            self._tx_cond.notify()
+
+    def _apply_faults(self, frame):
+        f = self.faults
+        if not f.any():
+            return frame
+        rng = f.rng
+        out = bytearray(frame)
+        if f.crc_error and rng.random() < f.crc_error:
+            out[-1] ^= 0xFF
+            self.stats['faults_injected'] += 1
+        if f.drop_byte and rng.random() < f.drop_byte:
+            del out[rng.randrange(len(out))]
+            self.stats['faults_injected'] += 1
+        if f.truncate and rng.random() < f.truncate and len(out) > 5:
+            out = out[:rng.randrange(4, len(out) - 1)]
+            self.stats['faults_injected'] += 1
+        if f.noise and rng.random() < f.noise:
+            noise = bytes(rng.choice([b for b in range(256) if b != PU_FRAME_HEAD]) for _ in range(rng.randint(1, 8)))
+            out = bytearray(noise) + out
+            self.stats['faults_injected'] += 1
+        return bytes(out)
+
+    def _tx_loop(self):
+        while self.running:
+            with self._tx_cond:
+                while self.running and (not self._tx_queue or self._tx_queue[0][0] > time.monotonic()):
+                    wait = self._tx_queue[0][0] - time.monotonic() if self._tx_queue else None
+                    self._tx_cond.wait(wait)
+                if not self.running:
+                    return
+                _, _, frame = heapq.heappop(self._tx_queue)
+            data = self._apply_faults(frame)
+            if self.byte_time:
+                # 模拟线上传输时间：数据在发送完成时才全部到达对端
+                now = time.monotonic()
+                start = max(now, self._tx_busy_until)
+                self._tx_busy_until = start + len(data) * self.byte_time
+                time.sleep(max(0.0, self._tx_busy_until - now))
+            try:
+                self.transport.write(data)
+            except Exception as e:
+                self.log_func(f"sim tx error: {e}")
+                continue
+            self.stats['tx_frames'] += 1
+            self.stats['tx_bytes'] += len(data)
+
+    # 接收
+    def _rx_loop(self):
+        buf = bytearray()
+        while self.running:
+            try:
+                # read(n)会等满n字节或超时，先阻塞读1字节再取走已到达的全部数据
+                chunk = self.transport.read(1)
+                waiting = self.transport.in_waiting() if chunk else 0
+                if waiting:
+                    chunk += self.transport.read(waiting)
+            except Exception as e:
+                self.log_func(f"sim rx error: {e}")
+                time.sleep(0.05)
+                continue
+            if not chunk:
+                continue
+            rx_done = time.monotonic()
+            self.stats['rx_bytes'] += len(chunk)
+            buf += chunk
+            while len(buf) >= 6:
+                idx = buf.find(PU_FRAME_HEAD)
+                if idx == -1:
+                    self.stats['discarded_bytes'] += len(buf)
+                    buf.clear()
+                    break
+                if idx > 0:
+                    self.stats['discarded_bytes'] += idx
+                    del buf[:idx]
+                    continue
+                data_len = (buf[2] << 8) | buf[3]
+                if data_len > MAX_FRAME_DATA_LEN:
+                    self.stats['discarded_bytes'] += 1
+                    del buf[:1]
+                    continue
+                total_len = data_len + 6
+                if len(buf) < total_len:
+                    break
+                frame = bytes(buf[:total_len])
+                del buf[:total_len]
+                self.stats['rx_frames'] += 1
+                # 命令在线上的传输时间 + 处理时间之后才开始回复
+                delay = self.response_latency + total_len * self.byte_time - (time.monotonic() - rx_done)
+                try:
+                    self.handle_frame(frame, max(0.0, delay))
+                except Exception as e:
+                    self.log_func(f"sim handle error: {e}")
+
+    def _reply_status(self, fun_code, status_code, delay):
+        if status_code != PU_STATUS_OK:
+            self.stats['errors_replied'] += 1
+        self._schedule(bytes(generate_status_response(fun_code, status_code)), delay)
+
+    def handle_frame(self, frame, delay=0.0):
+        fun_code = frame[1]
+        received_crc = (frame[-2] << 8) | frame[-1]
+        if received_crc != calculate_crc16(frame[:-2], len(frame) - 2):
+            self.stats['crc_errors'] += 1
+            self._reply_status(fun_code, PU_STATUS_CRC_ERROR, delay)
+            return
+        payload = frame[4:-2]
+        if fun_code == PU_FUN_CONNECT:
+            if self.clock() - self._start_time < self.handshake_delay:
+                return
+            self.stats['handshakes'] += 1
+            self.connected = True
+            self._schedule(_frame(PU_FUN_CONNECT), delay)
+        elif fun_code == PU_FUN_MCU_RESET:
+            # 上位机回显F0，表示收到复位通知
+            self.stats['resets_acked'] += 1
+        elif fun_code == PU_FUN_READ:
+            self._handle_read(payload, delay)
+        elif fun_code == PU_FUN_WRITE:
+            self._handle_write(payload, delay)
+        elif fun_code == PU_FUN_UPGRADE:
+            self._handle_upgrade(payload, delay)
+        elif fun_code == PU_FUN_UPGRADE_CRC:
+            self._handle_upgrade_crc(payload, delay)
+        elif fun_code == PU_ACK_NO_DATA and len(payload) == 2 and payload[0] in REPORT_FUN_CODES:
+            # 上位机对主动上报的应答
+            self.stats['reports_acked'] += 1
+        elif fun_code in (PU_ACK_NO_DATA, PU_ACK_WITH_DATA):
+            pass
+        else:
+            self._reply_status(fun_code, PU_STATUS_NO_FUNCODE, delay)
+
+    def _handle_read(self, payload, delay):
+        self.stats['reads'] += 1
+        if len(payload) != 2:
+            self._reply_status(PU_FUN_READ, PU_STATUS_DATA_LENGTH_ERROR, delay)
+            return
+        addr = (payload[0] << 8) | payload[1]
+        reg = self.registers.get(addr)
+        if reg is None:
+            self._reply_status(PU_FUN_READ, PU_STATUS_ADDRESS_ERROR, delay)
+            return
+        self._schedule(_frame(PU_ACK_WITH_DATA, bytes(payload) + reg.raw), delay)
+
+    def _handle_write(self, payload, delay):
+        self.stats['writes'] += 1
+        if len(payload) != 6:
+            self._reply_status(PU_FUN_WRITE, PU_STATUS_DATA_LENGTH_ERROR, delay)
+            return
+        addr = (payload[0] << 8) | payload[1]
+        reg = self.registers.get(addr)
+        if reg is None:
+            self._reply_status(PU_FUN_WRITE, PU_STATUS_ADDRESS_ERROR, delay)
+            return
+        if not reg.writable:
+            self._reply_status(PU_FUN_WRITE, PU_STATUS_NO_PERMISSION, delay)
+            return
+        raw = bytes(payload[2:6])
+        limit = _RAW_LIMITS.get(reg.type)
+        if limit is not None and struct.unpack('>I', raw)[0] > limit:
+            self._reply_status(PU_FUN_WRITE, PU_STATUS_DATA_ERROR, delay)
+            return
+        if reg.type == 'float' and struct.unpack('>f', raw)[0] != struct.unpack('>f', raw)[0]:
+            # NaN
+            self._reply_status(PU_FUN_WRITE, PU_STATUS_DATA_ERROR, delay)
+            return
+        reg.raw = raw
+        self._reply_status(PU_FUN_WRITE, PU_STATUS_OK, delay)
+
+    def _handle_upgrade(self, payload, delay):
+        if len(payload) != UPGRADE_PACKET_SIZE + 2:
+            self._reply_status(PU_FUN_UPGRADE, PU_STATUS_DATA_LENGTH_ERROR, delay)
+            return
+        pack_index = (payload[0] << 8) | payload[1]
+        self.upgrade_chunks[pack_index] = bytes(payload[2:])
+        self.stats['upgrade_packets'] += 1
+        self._reply_status(PU_FUN_UPGRADE, PU_STATUS_OK, delay)
+
+    def _handle_upgrade_crc(self, payload, delay):
+        if len(payload) != 4:
+            self._reply_status(PU_FUN_UPGRADE_CRC, PU_STATUS_DATA_LENGTH_ERROR, delay)
+            return
+        bin_crc = (payload[0] << 8) | payload[1]
+        pack_sum = (payload[2] << 8) | payload[3]
+        chunks = [self.upgrade_chunks.get(i) for i in range(pack_sum)]
+        ok = all(c is not None for c in chunks)
+        if ok:
+            image = b''.join(chunks)
+            ok = calculate_crc16(image, len(image)) == bin_crc
+        self.upgrade_chunks = {}
+        if ok:
+            self.upgraded_image = image
+            self.stats['upgrades_ok'] += 1
+            self._reply_status(PU_FUN_UPGRADE_CRC, PU_STATUS_OK, delay)
+        else:
+            self.stats['upgrades_failed'] += 1
+            self._reply_status(PU_FUN_UPGRADE_CRC, PU_STATUS_UPGRADE_PACKAGE_CRC_ERROR, delay)
+
+    # 主动上报
+    def send_reset(self):
+        """发送F0复位通知"""
+        self._schedule(_frame(PU_FUN_MCU_RESET), is_reply=False)
+
+    def build_report(self, fun_code, count=None):
+        payload = bytearray()
+        for _ in range(count or self.report_batch):
+            reg = self.registers[next(self._addr_cycle)]
+            if not reg.writable:
+                # 只读寄存器模拟变化的采样值
+                limit = _RAW_LIMITS.get(reg.type, 0xFFFF)
+                value = (struct.unpack('>I', reg.raw)[0] + 1) & limit
+                if reg.type != 'float':
+                    reg.raw = struct.pack('>I', value)
+            payload += struct.pack('>H', reg.addr) + reg.raw
+        return _frame(fun_code, bytes(payload))
+
+    def _report_loop(self):
+        fun_cycle = itertools.cycle(self.report_functions)
+        next_time = time.monotonic()
+        while self.running:
+            if self.report_rate <= 0 or not self.connected or not self.registers:
+                time.sleep(0.05)
+                next_time = time.monotonic()
+                continue
+            next_time += 1.0 / self.report_rate
+            self._schedule(self.build_report(next(fun_cycle)), is_reply=False)
+            self.stats['reports_sent'] += 1
+            wait = next_time - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            elif wait < -1.0:
+                # 落后太多时不补发
+                next_time = time.monotonic()
+
+def serve_pty(**kwargs):
+    """创建伪终端并在master端运行仿真器，返回 (sim, url)，url可直接传给 UARTInterface.open"""
+    from transport import create_pty_pair, PtyTransport
+    master_fd, slave_path, slave_fd = create_pty_pair()
+    sim = SimulatedMCU(PtyTransport.from_fd(master_fd, timeout=0.1), slave_fd=slave_fd, **kwargs)
+    sim.start()
+    return sim, f"pty://{slave_path}"
+
+class VirtualClock:
+    """手动推进的时钟，只会向前走"""
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance_to(self, t):
+        if t > self.now:
+            self.now = t
+
+class VirtualLink(Transport):
+    """
+    上位机一侧的传输层，直接连到同一进程内的 SimulatedMCU，不启动仿真器线程也不sleep：
+    write() 把命令交给仿真器，按线路时间和应答延时推进虚拟时钟，再把到期的应答同步送入 UARTService.feed。
+    主动上报按虚拟时间产生，advance() 推进空闲时间。
+    上位机的超时等待仍是真实时间，注入丢字节/延迟应答等故障时会变慢
+    """
+    def __init__(self, sim, clock, baudrate=115200, bytesize=8, parity='N', stopbits=1):
+        self.sim = sim
+        self.clock = clock
+        self.byte_time = bits_per_frame(bytesize, parity, stopbits) / baudrate
+        self.params = {'port': 'virtual', 'baudrate': baudrate, 'bytesize': bytesize,
+                       'parity': parity, 'stopbits': stopbits}
+        self.feed = None    # 接收数据的回调，通常是 UARTService.feed
+        self._open = True
+        self._lock = threading.RLock()
+        self._delivering = False
+        self._fun_cycle = itertools.cycle(sim.report_functions)
+        self._next_report = clock() + (1.0 / sim.report_rate if sim.report_rate > 0 else 0.0)
+
+    def close(self):
+        self._open = False
+
+    def is_open(self):
+        return self._open
+
+    def write(self, data):
+        data = bytes(data)
+        with self._lock:
+            self.clock.advance_to(self.clock() + len(data) * self.byte_time)
+            self.sim.stats['rx_frames'] += 1
+            self.sim.stats['rx_bytes'] += len(data)
+            self.sim.handle_frame(data, self.sim.response_latency)
+            # 正常应答在处理延时后到期；被故障延迟的应答等时钟走到时再送。
+            # 在 feed 中再次写入（如对上报的应答）时由外层的 _deliver 继续送，避免递归
+            if not self._delivering:
+                self._deliver(self.clock() + self.sim.response_latency)
+        return len(data)
+
+    def read(self, size=1):
+        return b''
+
+    def in_waiting(self):
+        return 0
+
+    def advance(self, seconds):
+        """空闲 seconds 虚拟秒：期间到期的应答和主动上报依次送出"""
+        with self._lock:
+            target = self.clock() + seconds
+            if not self._delivering:
+                self._deliver(target)
+            self.clock.advance_to(target)
+
+    def _deliver(self, until):
+        self._delivering = True
+        try:
+            self._deliver_until(until)
+        finally:
+            self._delivering = False
+
+    def _deliver_until(self, until):
+        sim = self.sim
+        queue = sim._tx_queue
+        while True:
+            if sim.report_rate > 0 and sim.connected and self._next_report <= until:
+                # 上报帧在它自己的时刻排队，与应答按时间先后交错
+                due = max(self._next_report, self.clock())
+                with sim._tx_cond:
+                    heapq.heappush(queue, (due, next(sim._tx_seq), sim.build_report(next(self._fun_cycle))))
+                sim.stats['reports_sent'] += 1
+                self._next_report += 1.0 / sim.report_rate
+                continue
+            if not queue or queue[0][0] > until:
+                return
+            with sim._tx_cond:
+                due, _, frame = heapq.heappop(queue)
+            data = sim._apply_faults(frame)
+            self.clock.advance_to(max(due, self.clock()) + len(data) * self.byte_time)
+            sim.stats['tx_frames'] += 1
+            sim.stats['tx_bytes'] += len(data)
+            if self.feed is not None:
+                self.feed(data)
+
+def serve_virtual(baudrate=115200, **kwargs):
+    """创建虚拟时间的仿真器，返回 (sim, link)；link 作为 UARTService 的 uart_interface，并设置 link.feed"""
+    clock = VirtualClock()
+    sim = SimulatedMCU(None, baudrate=baudrate, clock=clock, **kwargs)
+    return sim, VirtualLink(sim, clock, baudrate=baudrate)
+
+def serve_tcp(host='127.0.0.1', port=0, **kwargs):
+    """
+    在TCP端口上等待上位机连接，每个连接运行一个新的仿真器（寄存器表共享）
+    返回 (server, url)，server.sims 为已创建的仿真器列表，server.close() 停止服务
+    """
+    from transport import SocketTransport
+    registers = kwargs.pop('registers', None) or load_register_file(kwargs.pop('register_file', None))
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(4)
+    listener.settimeout(0.2)
+
+    class _Server:
+        def __init__(self):
+            self.sims = []
+            self.running = True
+
+        def close(self):
+            self.running = False
+            for sim in self.sims:
+                sim.stop()
+            listener.close()
+
+    server = _Server()
+
+    def accept_loop():
+        while server.running:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sim = SimulatedMCU(SocketTransport.from_socket(conn, timeout=0.1), registers=registers, **kwargs)
+            sim.start()
+            server.sims.append(sim)
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    bound_host, bound_port = listener.getsockname()
+    return server, f"tcp://{bound_host}:{bound_port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated BMS MCU speaking the PU UART protocol")
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--pty', action='store_true', help="serve on a new pseudo terminal (Linux)")
+    where.add_argument('--tcp', metavar='HOST:PORT', help="serve on a TCP port")
+    parser.add_argument('--registers', help="register map JSON (default uart_command_set.json)")
+    parser.add_argument('--baud', type=int, default=None, help="emulate wire time at this baud rate")
+    parser.add_argument('--latency', type=float, default=0.0, help="response latency in seconds")
+    parser.add_argument('--report-rate', type=float, default=0.0, help="unsolicited report frames per second")
+    parser.add_argument('--report-fun', default='60', help="report function codes, e.g. 40,50,60")
+    parser.add_argument('--report-batch', type=int, default=8, help="registers per report frame")
+    parser.add_argument('--handshake-delay', type=float, default=0.0)
+    parser.add_argument('--reset', action='store_true', help="send an F0 reset once started")
+    parser.add_argument('--crc-error', type=float, default=0.0)
+    parser.add_argument('--drop-byte', type=float, default=0.0)
+    parser.add_argument('--truncate', type=float, default=0.0)
+    parser.add_argument('--noise', type=float, default=0.0)
+    parser.add_argument('--delay-ack', type=float, default=0.0)
+    parser.add_argument('--delay-ack-time', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    kwargs = dict(
+        register_file=args.registers,
+        response_latency=args.latency,
+        baudrate=args.baud,
+        report_rate=args.report_rate,
+        report_functions=[int(x, 16) for x in args.report_fun.split(',')],
+        report_batch=args.report_batch,
+        handshake_delay=args.handshake_delay,
+        faults=FaultConfig(args.crc_error, args.drop_byte, args.truncate, args.noise,
+                           args.delay_ack, args.delay_ack_time, args.seed),
+        log_func=print if args.verbose else None,
+    )
+    if args.pty:
+        sim, url = serve_pty(**kwargs)
+        sims = lambda: [sim]
+        if args.reset:
+            sim.send_reset()
+        stop = sim.stop
+    else:
+        host, _, port = args.tcp.rpartition(':')
+        server, url = serve_tcp(host or '127.0.0.1', int(port), **kwargs)
+        sims = lambda: server.sims
+        stop = server.close
+    print(f"Simulated MCU listening on {url}", flush=True)
+    try:
+        while True:
+            time.sleep(5)
+            for sim in sims():
+                print(json.dumps(sim.stats), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
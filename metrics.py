@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+链路健康指标
+MetricsRegistry 保存计数器和延时直方图，UARTService 在热路径上直接持有指标对象，
+记录一次事件只是几次整数运算（< 1us），快照可导出为 JSON / CSV / Prometheus 文本格式
+
+计数器不加锁：每个指标基本只由一个线程更新（监听线程或发起请求的线程），
+偶尔的并发更新最多丢失一次计数，换来热路径上没有锁
+
+用法:
+    python metrics.py --bench      # 测量记录一次事件的开销
+"""
+import io
+import json
+import os
+import threading
+import time
+
+SUB_BUCKET_BITS = 5     # 每个2的幂区间分 2**(bits-1)=16 个桶，相对误差 < 1/16
+_HALF_BITS = SUB_BUCKET_BITS - 1
+MAX_VALUE_BITS = 48     # 可记录的最大值 2**48（微秒约 9 年），桶数组预先分配
+_BUCKETS = ((MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) << _HALF_BITS) + (1 << SUB_BUCKET_BITS)
+_NO_MIN = 1 << MAX_VALUE_BITS
+
+class Counter:
+    __slots__ = ('name', 'labels', 'help', 'value')
+    kind = 'counter'
+
+    def __init__(self, name, labels=(), help=''):
+        self.name = name
+        self.labels = labels
+        self.help = help
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def reset(self):
+        self.value = 0
+
+    def snapshot(self):
+        return {'value': self.value}
+
+class Gauge(Counter):
+    __slots__ = ()
+    kind = 'gauge'
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    """
+    HDR 风格的对数-线性直方图，记录非负整数（通常是微秒），不超过 2**MAX_VALUE_BITS
+    小于 2**SUB_BUCKET_BITS 的值精确记录，更大的值按2的幂分段、每段再线性细分
+    """
+    __slots__ = ('name', 'labels', 'help', 'unit', 'counts', 'count', 'total', 'min', 'max')
+    kind = 'histogram'
+
+    def __init__(self, name='', labels=(), help='', unit='us'):
+        self.name = name
+        self.labels = labels
+        self.help = help
+        self.unit = unit
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = _NO_MIN
+        self.max = 0
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        if shift <= 0:
+            self.counts[value] += 1
+        else:
+            # 区间 [2**(shift+bits-1), 2**(shift+bits)) 内按尾数线性分桶
+            self.counts[(shift << _HALF_BITS) + (value >> shift)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value < self.min:
+            self.min = value
+
+    # 与 Counter 统一的接口
+    add = record
+
+    @staticmethod
+    def bucket_value(idx):
+        """桶的下界"""
+        if idx < (1 << SUB_BUCKET_BITS):
+            return idx
+        shift = (idx >> _HALF_BITS) - 1
+        return (idx - (shift << _HALF_BITS)) << shift
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        target = self.count * p / 100.0
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            if n:
+                seen += n
+                if seen >= target:
+                    return max(min(self.bucket_value(idx), self.max), self.min)
+        return self.max
+
+    def merge(self, other):
+        counts = self.counts
+        for idx, n in enumerate(other.counts):
+            if n:
+                counts[idx] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.min = min(self.min, other.min)
+
+    def reset(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = _NO_MIN
+        self.max = 0
+
+    def summary(self, scale=1.0):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'min': round(self.min * scale, 3),
+            'mean': round(self.total / self.count * scale, 3),
+            'p50': round(self.percentile(50) * scale, 3),
+            'p90': round(self.percentile(90) * scale, 3),
+            'p99': round(self.percentile(99) * scale, 3),
+            'max': round(self.max * scale, 3),
+        }
+
+    snapshot = summary
+
+def _label_text(labels):
+    return ','.join(f'{k}="{v}"' for k, v in labels)
+
+class MetricsRegistry:
+    """指标按 (名称, 标签) 唯一；创建时加锁，记录时不加锁"""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _get(self, cls, name, help, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = cls(name, key[1], help)
+        return metric
+
+    def counter(self, name, help='', **labels):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help='', **labels):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help='', **labels):
+        return self._get(Histogram, name, help, labels)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def reset(self):
+        for metric in self.metrics():
+            metric.reset()
+        self.started = time.time()
+
+    # ---------- 导出 ----------
+    def snapshot(self):
+        """{'time': ..., 'uptime_s': ..., 'metrics': [{'name', 'labels', 'type', ...}, ...]}"""
+        now = time.time()
+        rows = []
+        for metric in sorted(self.metrics(), key=lambda m: (m.name, m.labels)):
+            row = {'name': metric.name, 'labels': dict(metric.labels), 'type': metric.kind}
+            row.update(metric.snapshot())
+            rows.append(row)
+        return {'time': now, 'uptime_s': round(now - self.started, 3), 'metrics': rows}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def to_csv(self):
+        import csv
+        out = io.StringIO()
+        fields = ['name', 'labels', 'type', 'value', 'count', 'min', 'mean', 'p50', 'p90', 'p99', 'max']
+        writer = csv.DictWriter(out, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for row in self.snapshot()['metrics']:
+            row = dict(row)
+            row['labels'] = ';'.join(f"{k}={v}" for k, v in row['labels'].items())
+            writer.writerow(row)
+        return out.getvalue()
+
+    def to_prometheus(self):
+        """Prometheus 文本格式；直方图按 summary 输出分位数"""
+        lines = []
+        seen = set()
+        for metric in sorted(self.metrics(), key=lambda m: (m.name, m.labels)):
+            if metric.name not in seen:
+                seen.add(metric.name)
+                if metric.help:
+                    lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {'summary' if metric.kind == 'histogram' else metric.kind}")
+            labels = _label_text(metric.labels)
+            if metric.kind == 'histogram':
+                for q in (50, 90, 99):
+                    value = metric.percentile(q) if metric.count else 0
+                    q_labels = ','.join(filter(None, [labels, f'quantile="{q / 100}"']))
+                    lines.append(f"{metric.name}{{{q_labels}}} {value}")
+                suffix = f"{{{labels}}}" if labels else ''
+                lines.append(f"{metric.name}_sum{suffix} {metric.total}")
+                lines.append(f"{metric.name}_count{suffix} {metric.count}")
+            else:
+                lines.append(f"{metric.name}{{{labels}}} {metric.value}" if labels else f"{metric.name} {metric.value}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path, fmt=None):
+        """按扩展名（.json/.csv/.prom/.txt）或 fmt 写入快照"""
+        if fmt is None:
+            ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+            fmt = {'json': 'json', 'csv': 'csv'}.get(ext, 'prometheus')
+        text = {'json': self.to_json, 'csv': self.to_csv, 'prometheus': self.to_prometheus}[fmt]()
+        # 先写临时文件再替换，抓取程序不会读到半个文件
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(tmp, path)
+        return path
+
+def _bench():
+    import timeit
+    registry = MetricsRegistry()
+    counter = registry.counter('bench_total')
+    hist = registry.histogram('bench_latency_us')
+    n = 200000
+    for name, stmt in (('counter.inc()', counter.inc),
+                       ('histogram.record(850)', lambda: hist.record(850)),
+                       ('histogram.record(1234567)', lambda: hist.record(1234567))):
+        best = min(timeit.repeat(stmt, number=n, repeat=5)) / n
+        print(f"{name:<28} {best * 1e9:8.1f} ns")
+
+if __name__ == '__main__':
+    import sys
+    if '--bench' in sys.argv:
+        _bench()
+    else:
+        print(__doc__)
@@ -0,0 +1,97 @@
+import time
+import tkinter as tk
+from tkinter import ttk, filedialog
+import tkinter.messagebox as messagebox
+
+REFRESH_INTERVAL_MS = 1000
+COLUMNS = ('labels', 'value', 'rate', 'p50', 'p90', 'p99', 'max')
+
+class MetricsPanel(tk.Toplevel):
+    """链路指标窗口：每秒刷新一次 MetricsRegistry 快照，可导出 JSON/CSV/Prometheus 文本"""
+    def __init__(self, master, registry, get_label=None):
+        super().__init__(master)
+        self.registry = registry
+        self.get_label = get_label or (lambda key: key)
+        self.title(self.get_label("link_metrics"))
+        self.geometry("820x420")
+        self._last = {}         # 行id -> (时间, 计数)，用于计算速率
+        self._closed = False
+        self.create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.refresh()
+
+    def create_widgets(self):
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill='both', expand=True, padx=5, pady=5)
+        self.tree = ttk.Treeview(tree_frame, columns=COLUMNS, show='tree headings')
+        self.tree.heading('#0', text=self.get_label("metric_name"))
+        self.tree.column('#0', width=220)
+        for col in COLUMNS:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=150 if col == 'labels' else 70, anchor='w' if col == 'labels' else 'e')
+        yscroll = ttk.Scrollbar(tree_frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=yscroll.set)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        yscroll.grid(row=0, column=1, sticky='ns')
+        tree_frame.rowconfigure(0, weight=1)
+        tree_frame.columnconfigure(0, weight=1)
+
+        btn_frame = ttk.Frame(self, padding="5")
+        btn_frame.pack(fill='x')
+        ttk.Button(btn_frame, text=self.get_label("export_metrics"), command=self.on_export).pack(side='left')
+        ttk.Button(btn_frame, text=self.get_label("reset_metrics"), command=self.on_reset).pack(side='left', padx=5)
+        self.status_label = ttk.Label(btn_frame, text="")
+        self.status_label.pack(side='left', padx=10)
+
+    def refresh(self):
+        if self._closed:
+            return
+        now = time.monotonic()
+        snapshot = self.registry.snapshot()
+        for row in snapshot['metrics']:
+            labels = ','.join(f"{k}={v}" for k, v in row['labels'].items())
+            iid = f"{row['name']}{{{labels}}}"
+            if row['type'] == 'histogram':
+                value = row['count']
+                values = (labels, value, self._rate(iid, now, value),
+                          row.get('p50', ''), row.get('p90', ''), row.get('p99', ''), row.get('max', ''))
+            else:
+                value = row['value']
+                rate = self._rate(iid, now, value) if row['type'] == 'counter' else ''
+                values = (labels, value, rate, '', '', '', '')
+            # 已有的行原地更新，不重建
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+            else:
+                self.tree.insert('', tk.END, iid=iid, text=row['name'], values=values)
+        self.status_label.configure(text=f"uptime: {snapshot['uptime_s']:.0f} s")
+        self.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    def _rate(self, iid, now, value):
+        last = self._last.get(iid)
+        self._last[iid] = (now, value)
+        if last is None or now <= last[0]:
+            return ''
+        return f"{(value - last[1]) / (now - last[0]):.1f}/s"
+
+    def on_export(self):
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Export Metrics",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("CSV", "*.csv"), ("Prometheus Text", "*.prom"), ("All Files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            self.registry.export(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export metrics:\n{e}", parent=self)
+
+    def on_reset(self):
+        self.registry.reset()
+        self._last.clear()
+
+    def on_close(self):
+        self._closed = True
+        self.destroy()
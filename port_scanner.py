@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+并行查找连接了MCU的串口
+同时打开所有候选串口，每个串口发送E0握手并在截止时间内等待回复，可选依次尝试多个波特率。
+所有串口并发进行，整次扫描大约只需一个握手超时（每个波特率一个）。
+没有被选中的串口在扫描结束前全部关闭；打开卡住、在扫描结束后才返回的串口由其线程自行关闭
+
+用法:
+    python port_scanner.py                                   # 扫描所有串口
+    python port_scanner.py /dev/ttyUSB0 /dev/ttyUSB1 --baud 115200 9600 --timeout 0.5
+"""
+import argparse
+import threading
+import time
+from protocol import generate_e0_handshake
+from uart_interface import UARTInterface
+
+HANDSHAKE_TIMEOUT = 0.5     # 每个波特率等待E0回复的时间
+RESEND_INTERVAL = 0.1       # MCU上电后可能还没开始回应，截止前重发E0
+READ_TIMEOUT = 0.02
+
+class ScanResult:
+    """单个串口的扫描结果；keep 选中的串口 uart 保持打开，由调用者负责关闭"""
+    def __init__(self, port):
+        self.port = port
+        self.ok = False
+        self.baudrate = None
+        self.latency_ms = None      # 从发出第一个E0到收到回复
+        self.error = ''
+        self.uart = None
+
+    def __repr__(self):
+        if self.ok:
+            return f"ScanResult({self.port!r}, {self.baudrate}, {self.latency_ms:.1f} ms)"
+        return f"ScanResult({self.port!r}, {self.error!r})"
+
+class PortScanner:
+    def __init__(self, ports=None, baudrates=(115200,), timeout=HANDSHAKE_TIMEOUT, log_func=None):
+        """
+        :param ports: 候选串口（也可以是 transport URL），默认为所有串口
+        :param baudrates: 依次尝试的波特率，第一个收到回复的波特率即为结果
+        """
+        self.ports = list(ports) if ports is not None else UARTInterface.list_ports()
+        self.baudrates = list(baudrates)
+        if not self.baudrates:
+            raise ValueError("At least one baud rate is required")
+        self.timeout = timeout
+        self.log_func = log_func or (lambda msg: None)
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def scan(self, keep=0):
+        """
+        :param keep: 保持打开的响应串口个数（按握手延迟从小到大），0 表示全部关闭
+        :return: [ScanResult]，响应的串口在前，按延迟排序
+        """
+        self._finished = False
+        results = [ScanResult(port) for port in self.ports]
+        threads = []
+        for result in results:
+            t = threading.Thread(target=self._probe, args=(result,), name=f"Scan {result.port}", daemon=True)
+            t.start()
+            threads.append(t)
+        deadline = time.monotonic() + self.timeout * len(self.baudrates) + 0.5
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            # 之后才打开成功的线程看到 _finished 会自己关闭串口
+            self._finished = True
+            responding = sorted((r for r in results if r.ok), key=lambda r: r.latency_ms)
+            for i, result in enumerate(responding):
+                if i >= keep and result.uart is not None:
+                    self._close(result)
+            for result in results:
+                if not result.ok and not result.error:
+                    result.error = "Scan deadline exceeded"
+        return responding + [r for r in results if not r.ok]
+
+    def _probe(self, result):
+        uart = UARTInterface()
+        for baudrate in self.baudrates:
+            try:
+                uart.open(port=result.port, baudrate=baudrate, timeout=READ_TIMEOUT)
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+                return
+            with self._lock:
+                if self._finished:
+                    uart.close()
+                    return
+                result.uart = uart
+            try:
+                latency = self._handshake(uart)
+            except Exception as e:
+                latency = None
+                result.error = f"{type(e).__name__}: {e}"
+            with self._lock:
+                if latency is not None and not self._finished:
+                    result.ok, result.baudrate, result.latency_ms = True, baudrate, latency
+                    self.log_func(f"[{result.port}] MCU responded at {baudrate} baud in {latency:.1f} ms")
+                    return
+                self._close(result)
+                if self._finished or result.error:
+                    return
+        result.error = "No handshake reply"
+
+    def _handshake(self, uart):
+        """发送E0直到收到E0回复或超时，返回延迟(ms)或None"""
+        packet = bytes(generate_e0_handshake())
+        buffer = bytearray()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        next_send = start
+        while True:
+            now = time.monotonic()
+            if now >= deadline or self._finished:
+                return None
+            if now >= next_send:
+                uart.write(packet)
+                next_send = now + RESEND_INTERVAL
+            # 有数据就立即返回，否则最多阻塞 READ_TIMEOUT
+            data = uart.read(max(uart.in_waiting(), 1))
+            if data:
+                buffer += data
+                # MCU 的E0回复与握手包相同：5A E0 00 00 CRC
+                if packet in buffer:
+                    return (time.monotonic() - start) * 1000
+                del buffer[:-len(packet)]
+
+    @staticmethod
+    def _close(result):
+        try:
+            result.uart.close()
+        except Exception:
+            pass
+        result.uart = None
+
+def scan_ports(ports=None, baudrates=(115200,), timeout=HANDSHAKE_TIMEOUT, keep=0, log_func=None):
+    return PortScanner(ports, baudrates, timeout, log_func).scan(keep=keep)
+
+def main():
+    parser = argparse.ArgumentParser(description="Find serial ports with a responding MCU")
+    parser.add_argument('ports', nargs='*', help="ports to scan (default: all)")
+    parser.add_argument('--baud', type=int, nargs='+', default=[115200], help="baud rates to try, in order")
+    parser.add_argument('--timeout', type=float, default=HANDSHAKE_TIMEOUT, help="handshake timeout per baud rate (s)")
+    args = parser.parse_args()
+    start = time.monotonic()
+    results = scan_ports(args.ports or None, args.baud, args.timeout)
+    elapsed = time.monotonic() - start
+    print(f"{'Port':<24}{'Result':<10}{'Baud':>8}{'Latency':>12}")
+    for r in results:
+        if r.ok:
+            print(f"{r.port:<24}{'MCU':<10}{r.baudrate:>8}{r.latency_ms:>9.1f} ms")
+        else:
+            print(f"{r.port:<24}{'-':<10}{'':>8}{'':>12}  {r.error}")
+    print(f"Scanned {len(results)} ports in {elapsed:.2f} s")
+    return 0 if any(r.ok for r in results) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+后台串口发现与热插拔检测
+在后台线程中枚举串口（serial.tools.list_ports.comports），缓存结果，只在设备可能变化时重新枚举：
+- Linux：通过 ctypes 调用 inotify 监视 /dev 和 /sys/class/tty 中 tty 设备节点的创建/删除
+  （sysfs 不产生 inotify 事件，实际起作用的是 /dev，/sys/class/tty 在支持时作为补充）
+- 其他平台或 inotify 不可用：定期比较一个廉价的签名（Windows 为注册表 SERIALCOMM，其他为 /dev 下的 tty/cu 节点），
+  签名变化时才调用 comports()
+变化只以差异 (added, removed, ports) 通知订阅者，回调在监视线程中执行
+
+用法:
+    python port_watcher.py      # 打印串口的插拔
+"""
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from uart_interface import UARTInterface
+
+SETTLE_TIME = 0.3           # 收到事件后等待 udev 完成建节点/改权限/建符号链接再枚举
+FALLBACK_INTERVAL = 1.0     # 没有 inotify 时检查签名的周期
+WATCH_DIRS = ('/dev', '/sys/class/tty')
+_TTY_PREFIXES = ('tty', 'cu.', 'rfcomm')
+
+# inotify 常量（linux/inotify.h）
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+class Inotify:
+    """最小的 inotify 封装，只用于知道目录中哪些文件有变化（tty 节点、寄存器表 JSON）"""
+    def __init__(self, paths, mask=IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ATTRIB):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        watched = 0
+        for path in paths:
+            if os.path.isdir(path) and libc.inotify_add_watch(self.fd, os.fsencode(path), mask) >= 0:
+                watched += 1
+        if not watched:
+            os.close(self.fd)
+            raise OSError("no directory could be watched")
+
+    def fileno(self):
+        return self.fd
+
+    def read_names(self):
+        """读出当前所有事件，返回涉及的文件名"""
+        names = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                names.append(data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace'))
+                offset += length
+
+    def close(self):
+        os.close(self.fd)
+
+def _signature():
+    """没有 inotify 时用来判断是否需要重新枚举的廉价签名"""
+    if sys.platform == 'win32':
+        import winreg
+        try:
+            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DEVICEMAP\SERIALCOMM")
+        except OSError:
+            return ()
+        values = []
+        try:
+            i = 0
+            while True:
+                values.append(winreg.EnumValue(key, i)[:2])
+                i += 1
+        except OSError:
+            pass
+        finally:
+            winreg.CloseKey(key)
+        return tuple(sorted(values))
+    try:
+        return tuple(sorted(name for name in os.listdir('/dev') if name.startswith(_TTY_PREFIXES)))
+    except OSError:
+        return ()
+
+class PortWatcher:
+    """
+    ports(): 最近一次枚举的结果（不阻塞）；subscribe(callback): callback(added, removed, ports)；
+    refresh(): 请求后台重新枚举（界面的“刷新”按钮）
+    """
+    def __init__(self, settle_time=SETTLE_TIME, fallback_interval=FALLBACK_INTERVAL, enumerate_ports=UARTInterface.list_ports,
+                 log_func=None):
+        self.settle_time = settle_time
+        self.log_func = log_func or (lambda msg: None)
+        self.fallback_interval = fallback_interval
+        self.enumerate_ports = enumerate_ports
+        self.mode = None        # 'inotify' 或 'signature'
+        self.stats = {'scans': 0, 'events': 0, 'changes': 0, 'last_scan_ms': 0.0}
+        self._ports = []
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._wake_r, self._wake_w = os.pipe() if sys.platform != 'win32' else (None, None)
+        self._refresh = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ports(self):
+        return list(self._ports)
+
+    def subscribe(self, callback):
+        """新订阅者立即收到当前列表（全部作为 added）"""
+        with self._lock:
+            self._subscribers.append(callback)
+            ports = list(self._ports)
+        if ports:
+            callback(ports, [], ports)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="PortWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._refresh.set()
+        self._wake()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def refresh(self):
+        self._refresh.set()
+        self._wake()
+
+    def _wake(self):
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'x')
+            except OSError:
+                pass
+
+    def _scan(self):
+        start = time.perf_counter()
+        try:
+            ports = list(self.enumerate_ports())
+        except Exception as e:
+            self.log_func(f"Port enumeration error: {e}")
+            return
+        self.stats['scans'] += 1
+        self.stats['last_scan_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        with self._lock:
+            old = set(self._ports)
+            added = [p for p in ports if p not in old]
+            removed = sorted(old.difference(ports))
+            self._ports = ports
+            subscribers = list(self._subscribers)
+        if added or removed:
+            self.stats['changes'] += 1
+            for callback in subscribers:
+                try:
+                    callback(added, removed, list(ports))
+                except Exception as e:
+                    self.log_func(f"Port watcher callback error: {e}")
+
+    def _run(self):
+        self._scan()
+        inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                inotify = Inotify(WATCH_DIRS)
+            except (OSError, AttributeError):
+                inotify = None
+        try:
+            if inotify is not None:
+                self.mode = 'inotify'
+                self._run_inotify(inotify)
+            else:
+                self.mode = 'signature'
+                self._run_signature()
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _run_inotify(self, inotify):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([inotify, self._wake_r], [], [])
+            if self._wake_r in readable:
+                os.read(self._wake_r, 4096)
+            changed = False
+            if inotify in readable:
+                names = inotify.read_names()
+                if any(name.startswith(_TTY_PREFIXES) for name in names):
+                    self.stats['events'] += 1
+                    changed = True
+            if changed:
+                # 一次插拔会产生一串事件，等它们结束后只枚举一次
+                while not self._stop.wait(self.settle_time):
+                    if not inotify.read_names():
+                        break
+            if changed or self._refresh.is_set():
+                self._refresh.clear()
+                self._scan()
+
+    def _run_signature(self):
+        signature = _signature()
+        while not self._stop.is_set():
+            # refresh()/stop() 会立即唤醒
+            requested = self._refresh.wait(self.fallback_interval)
+            if self._stop.is_set():
+                break
+            self._refresh.clear()
+            current = _signature()
+            if current != signature or requested:
+                signature = current
+                self.stats['events'] += 1
+                self._scan()
+
+    def __del__(self):
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+def main():
+    watcher = PortWatcher(log_func=print)
+    def on_change(added, removed, ports):
+        stamp = time.strftime('%H:%M:%S')
+        for port in added:
+            print(f"{stamp} + {port}")
+        for port in removed:
+            print(f"{stamp} - {port}")
+    watcher.subscribe(on_change)
+    watcher.start()
+    time.sleep(0.5)
+    print(f"watching ({watcher.mode}), {len(watcher.ports())} ports, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 # protocol.py
 
+import binascii
 import struct
 import math
 
@@ -36,18 +37,40 @@ MIN_PACKET_SIZE = 6
 # 升级包大小
 UPGRADE_PACKET_SIZE = 2048
 
+TYPE_MAP = {
+    'int8_t': {'size': 1, 'format': 'b', 'min': -128, 'max': 127},
+    'uint8_t': {'size': 1, 'format': 'B', 'min': 0, 'max': 255},
+    'int16_t': {'size': 2, 'format': '>h', 'min': -32768, 'max': 32767},
+    'uint16_t': {'size': 2, 'format': '>H', 'min': 0, 'max': 65535},
+    'int32_t': {'size': 4, 'format': '>i', 'min': -2147483648, 'max': 2147483647},
+    'uint32_t': {'size': 4, 'format': '>I', 'min': 0, 'max': 4294967295},
+    'float': {'size': 4, 'format': '>f', 'min': -3.4e38, 'max': 3.4e38}
+}
+
+# 预编译的编解码器，数据区固定为4字节大端
+_U32 = struct.Struct('>I')
+_I32 = struct.Struct('>i')
+_F32 = struct.Struct('>f')
+# 帧头: HEAD + FUNC + LEN(2) + ADDR/PACK_INDEX(2)
+_FRAME_HEAD_ADDR = struct.Struct('>BBHH')
+# 整数类型写入时保留的低位
+_INT_MASKS = {
+    'int8_t': 0xFF, 'uint8_t': 0xFF,
+    'int16_t': 0xFFFF, 'uint16_t': 0xFFFF,
+    'uint32_t': 0xFFFFFFFF,
+}
+# 整数类型读出时从32位无符号值转换
+_INT_UNPACKERS = {
+    'int8_t': lambda v: (v & 0xFF) - 0x100 if v & 0x80 else v & 0xFF,
+    'uint8_t': lambda v: v & 0xFF,
+    'int16_t': lambda v: (v & 0xFFFF) - 0x10000 if v & 0x8000 else v & 0xFFFF,
+    'uint16_t': lambda v: v & 0xFFFF,
+    'uint32_t': lambda v: v,
+}
+
 def get_type_info(type_str):
     """Get size, format string, and value range for a given type"""
-    type_map = {
-        'int8_t': {'size': 1, 'format': 'b', 'min': -128, 'max': 127},
-        'uint8_t': {'size': 1, 'format': 'B', 'min': 0, 'max': 255},
-        'int16_t': {'size': 2, 'format': '>h', 'min': -32768, 'max': 32767},
-        'uint16_t': {'size': 2, 'format': '>H', 'min': 0, 'max': 65535},
-        'int32_t': {'size': 4, 'format': '>i', 'min': -2147483648, 'max': 2147483647},
-        'uint32_t': {'size': 4, 'format': '>I', 'min': 0, 'max': 4294967295},
-        'float': {'size': 4, 'format': '>f', 'min': -3.4e38, 'max': 3.4e38}
-    }
-    return type_map.get(type_str, type_map['int32_t'])  # Default to int32_t
+    return TYPE_MAP.get(type_str, TYPE_MAP['int32_t'])  # Default to int32_t
 
 def validate_value_for_type(value, type_str):
     """Validate and return parsed value if valid, else None"""
@@ -66,101 +89,70 @@ def validate_value_for_type(value, type_str):
 def pack_value_by_type(value, type_str):
     """Pack a value according to its type, always return 4 bytes in big-endian format"""
     if type_str == 'float':
-        # Float: pack as big-endian float, already 4 bytes
-        return struct.pack('>f', float(value))
-    else:
-        # Integer types: pack to 4 bytes big-endian, with proper alignment
-        val = int(value)
-        
-        if type_str in ['int8_t', 'uint8_t']:
-            # 8-bit value: pack as 32-bit big-endian (high 24 bits are 0)
-            if type_str == 'int8_t' and val < 0:
-                # Sign extend for negative int8_t values
-                val = val & 0xFF  # Convert to unsigned byte representation
-                return struct.pack('>I', val)
-            else:
-                return struct.pack('>I', val & 0xFF)
-                
-        elif type_str in ['int16_t', 'uint16_t']:
-            # 16-bit value: pack as 32-bit big-endian (high 16 bits are 0)
-            if type_str == 'int16_t' and val < 0:
-                # Sign extend for negative int16_t values
-                val = val & 0xFFFF  # Convert to unsigned short representation
-                return struct.pack('>I', val)
-            else:
-                return struct.pack('>I', val & 0xFFFF)
-                
-        else:  # int32_t, uint32_t or default
-            if type_str == 'uint32_t':
-                return struct.pack('>I', val & 0xFFFFFFFF)
-            else:
-                return struct.pack('>i', val)
+        return _F32.pack(float(value))
+    # 8/16位值放在32位的低位（高位为0，负数取补码低位），uint32取低32位
+    mask = _INT_MASKS.get(type_str)
+    if mask is None:  # int32_t or default
+        return _I32.pack(int(value))
+    return _U32.pack(int(value) & mask)
 
 def unpack_value_by_type(data, type_str):
     """Unpack 4-byte big-endian data according to its type"""
     if len(data) < 4:
         raise ValueError(f"Need 4 bytes of data, got {len(data)}")
-    
-    # Always work with 4 bytes
-    data_4bytes = data[:4]
-    
     if type_str == 'float':
-        # Float: unpack as big-endian float
-        return struct.unpack('>f', data_4bytes)[0]
-    else:
-        # First unpack as 32-bit unsigned big-endian
-        full_val = struct.unpack('>I', data_4bytes)[0]
-        
-        if type_str in ['int8_t', 'uint8_t']:
-            # Extract the lowest 8 bits
-            val_8 = full_val & 0xFF
-            if type_str == 'int8_t':
-                # Convert to signed 8-bit
-                return val_8 if val_8 < 128 else val_8 - 256
-            else:
-                return val_8
-                
-        elif type_str in ['int16_t', 'uint16_t']:
-            # Extract the lowest 16 bits
-            val_16 = full_val & 0xFFFF
-            if type_str == 'int16_t':
-                # Convert to signed 16-bit
-                return val_16 if val_16 < 32768 else val_16 - 65536
-            else:
-                return val_16
-                
-        else:  # int32_t, uint32_t or default
-            if type_str == 'uint32_t':
-                return full_val
-            else:
-                # Convert to signed 32-bit
-                return struct.unpack('>i', data_4bytes)[0]
+        return _F32.unpack_from(data)[0]
+    convert = _INT_UNPACKERS.get(type_str)
+    if convert is None:  # int32_t or default
+        return _I32.unpack_from(data)[0]
+    return convert(_U32.unpack_from(data)[0])
 
 def calculate_crc16(data, length):
     """
     Calculate CRC-16-CCITT (XMODEM) checksum
+    多项式0x1021、初值0xFFFF、不反转，与 binascii.crc_hqx 的算法相同
     Args:
         data: bytes or bytearray to calculate CRC for
         length: length of the data
     Returns:
         16-bit CRC value
     """
-    POLYNOMIAL = 0x11021
-    crc = 0xFFFF
-    for i in range(length):
-        crc ^= (data[i] << 8) & 0xFFFF
-        for _ in range(8):
-            if crc & 0x8000:
-                crc = ((crc << 1) ^ POLYNOMIAL) & 0xFFFF
-            else:
-                crc = (crc << 1) & 0xFFFF
-    return crc & 0xFFFF
+    try:
+        if length == len(data):
+            return binascii.crc_hqx(data, 0xFFFF)
+        return binascii.crc_hqx(memoryview(data)[:length], 0xFFFF)
+    except TypeError:
+        # list 等非 bytes-like 输入
+        return binascii.crc_hqx(bytes(data[:length]), 0xFFFF)
+
+def _append_crc(frame):
+    crc = binascii.crc_hqx(frame, 0xFFFF)
+    frame.append((crc >> 8) & 0xFF)
+    frame.append(crc & 0xFF)
+    return frame
+
+def bits_per_frame(bytesize=8, parity='N', stopbits=1):
+    """每个字节在线上占用的位数：起始位+数据位+校验位+停止位"""
+    return 1 + int(bytesize) + (0 if parity in ('N', None) else 1) + float(stopbits)
 
 def to_signed(val, bits=32):
     if val & (1 << (bits - 1)):
         return val - (1 << bits)
     return val
 
+_READ_FRAMES = {}   # addr16 -> 读命令帧，最多 65536 项；寄存器表加载时预先填入（见 register_map.py）
+
+def _read_frame(addr16):
+    frame = _READ_FRAMES.get(addr16)
+    if frame is None:
+        frame = _READ_FRAMES[addr16] = bytes(_append_crc(bytearray(
+            _FRAME_HEAD_ADDR.pack(PU_FRAME_HEAD, PU_FUN_READ, 0x0002, addr16))))
+    return frame
+
+def preload_read_frames(frames):
+    """frames: {addr16: 读命令帧}"""
+    _READ_FRAMES.update(frames)
+
 def generate_read_command(addr):
     """
     Generate read command frame with CRC
@@ -169,17 +161,8 @@ def generate_read_command(addr):
     Returns:
         bytearray containing the complete command frame
     """
-    data = bytearray([
-        PU_FRAME_HEAD,
-        PU_FUN_READ,
-        0x00, 0x02,
-        (addr >> 8) & 0xFF,
-        addr & 0xFF
-    ])
-    crc = calculate_crc16(data, len(data))
-    data.append((crc >> 8) & 0xFF)
-    data.append(crc & 0xFF)
-    return data
+    # 读命令只与地址有关，缓存帧内容，每次返回新的bytearray
+    return bytearray(_read_frame(addr & 0xFFFF))
 
 def generate_write_command(addr, value, data_type='int32_t'):
     """
@@ -196,22 +179,10 @@ def generate_write_command(addr, value, data_type='int32_t'):
         packed_data = pack_value_by_type(value, data_type)
     except Exception as e:
         # Fallback to original method if packing fails
-        packed_data = struct.pack('>i', int(value))
-    
-    data = bytearray([
-        PU_FRAME_HEAD,
-        PU_FUN_WRITE,
-        0x00, 0x06,
-        (addr >> 8) & 0xFF,
-        addr & 0xFF,
-    ])
-    
-    data.extend(packed_data)
-    
-    crc = calculate_crc16(data, len(data))
-    data.append((crc >> 8) & 0xFF)
-    data.append(crc & 0xFF)
-    return data
+        packed_data = _I32.pack(int(value))
+    data = bytearray(_FRAME_HEAD_ADDR.pack(PU_FRAME_HEAD, PU_FUN_WRITE, 0x0006, addr & 0xFFFF))
+    data += packed_data
+    return _append_crc(data)
 
 def parse_response(response, is_write=False, expected_addr=None, data_type='int32_t'):
     """
@@ -229,7 +200,7 @@ def parse_response(response, is_write=False, expected_addr=None, data_type='int3
     resp_type = response[1]
     length = (response[2] << 8) | response[3]
     received_crc = (response[-2] << 8) | response[-1]
-    calculated_crc = calculate_crc16(response[:-2], len(response)-2)
+    calculated_crc = calculate_crc16(response, len(response)-2)
     if received_crc != calculated_crc:
         raise ValueError("CRC check failed")
     if resp_type == PU_ACK_WITH_DATA:
@@ -303,24 +274,19 @@ def generate_upgrade_packets(bin_data):
     chunk_size = UPGRADE_PACKET_SIZE
     total_len = len(bin_data)
     num_chunks = (total_len + chunk_size - 1) // chunk_size
+    frame_len = 6 + chunk_size + 2
+    src = memoryview(bin_data)
     packets = []
     for pack_index in range(num_chunks):
         start = pack_index * chunk_size
         end = min(start + chunk_size, total_len)
-        chunk = bin_data[start:end]
-        frame = bytearray()
-        frame.append(0x5A)
-        frame.append(0x30)
-        frame.append(0x08)
-        frame.append(0x02)
-        frame.append((pack_index >> 8) & 0xFF)
-        frame.append(pack_index & 0xFF)
-        frame.extend(chunk)
-        if len(chunk) < chunk_size:
-            frame.extend([0x00] * (chunk_size - len(chunk)))
-        crc = calculate_crc16(frame, len(frame))
-        frame.append((crc >> 8) & 0xFF)
-        frame.append(crc & 0xFF)
+        # 预分配整帧，最后一包不足部分保持为0x00
+        frame = bytearray(frame_len)
+        _FRAME_HEAD_ADDR.pack_into(frame, 0, PU_FRAME_HEAD, PU_FUN_UPGRADE, 0x0802, pack_index & 0xFFFF)
+        frame[6:6 + end - start] = src[start:end]
+        crc = calculate_crc16(frame, frame_len - 2)
+        frame[-2] = (crc >> 8) & 0xFF
+        frame[-1] = crc & 0xFF
         packets.append(frame)
     return packets
 
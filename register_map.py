@@ -0,0 +1,282 @@
+"""
+寄存器表（uart_command_set.json）的编译缓存
+第一次加载时解析 JSON，生成两种语言的模块/子模块层级、地址表、数据类型和读命令帧，用 pickle 存到用户缓存目录；
+之后启动时先比较 JSON 的 mtime/大小，不一致再比较内容的 sha256（PyInstaller 单文件版每次解压 mtime 都会变），
+都一致就直接使用缓存。同一进程中多次加载同一个未改动的文件返回同一个对象。
+RegisterMapWatcher 在后台监视 JSON 的改动，重新加载后按 index 计算新增/删除/变化的寄存器（RegisterDiff），
+由使用者只把差异应用到地址表、帧缓存和界面
+"""
+import contextlib
+import gc
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+import zlib
+from protocol import TYPE_MAP, generate_read_command, preload_read_frames
+from register_model import compact_items
+
+CACHE_VERSION = 3
+LANGUAGES = ("EN", "CN")
+
+_lock = threading.Lock()
+_loaded = {}    # JSON绝对路径 -> (stat, RegisterMap)
+
+def group_names(item, language):
+    """寄存器在该语言下所属的 (模块, 子模块)"""
+    if language == "EN":
+        return item.get("Module", "Uncategorized"), item.get("Submodule", "Others")
+    return item.get("模块", "Uncategorized"), item.get("子模块", "Others")
+
+class RegisterMap:
+    """
+    items: JSON 中的寄存器，转换成紧凑的 register_model.Register（dict 兼容，顺序不变）
+    groups: [RegisterGroup]，下标即层级编号；organized: {语言: {模块: {子模块: [item, ...]}}}，与 items 共用同一批对象
+    addr_map: {地址(int): item}；types: {地址: 数据类型}，未知类型按 int32_t；read_frames: {地址: 读命令帧}
+    """
+    def __init__(self, items, sha256=''):
+        self.items, self.groups = compact_items(items)
+        self.sha256 = sha256
+        self.organized = {}
+        for language in LANGUAGES:
+            # 同一组的寄存器字段相同，组名只取一次
+            names = [group_names(group.registers[0], language) for group in self.groups]
+            organized = {}
+            for item in self.items:
+                module, submodule = names[item.group.id]
+                organized.setdefault(module, {}).setdefault(submodule, []).append(item)
+            self.organized[language] = organized
+        self.addr_map = {}
+        self.types = {}
+        self.read_frames = {}
+        for item in self.items:
+            addr = item.addr
+            if addr is None:
+                continue
+            self.addr_map[addr] = item
+            type_str = item.data_type
+            self.types[addr] = type_str if type_str in TYPE_MAP else 'int32_t'
+            self.read_frames[addr & 0xFFFF] = bytes(generate_read_command(addr))
+        self.source = 'json'    # 'json' 或 'cache'
+        self.load_ms = 0.0
+
+def cache_dir():
+    """用户缓存目录：打包后资源所在的临时目录每次都不同，不能放在 JSON 旁边"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'uart_test')
+
+def cache_path(json_path):
+    """同名文件在不同目录下各有一个缓存"""
+    abspath = os.path.abspath(json_path)
+    tag = f"{zlib.crc32(abspath.encode('utf-8')):08x}"
+    return os.path.join(cache_dir(), f"{os.path.basename(abspath)}.{tag}.pickle")
+
+def _stat_key(st):
+    return (st.st_mtime_ns, st.st_size)
+
+@contextlib.contextmanager
+def _gc_paused():
+    """一次创建几十万个寄存器对象时，分代 GC 会反复扫描这些刚建的对象，占去一大半时间"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def _read_cache(path):
+    try:
+        with open(path, 'rb') as f, _gc_paused():
+            cached = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != (CACHE_VERSION, sys.version_info[:2]):
+        return None
+    return cached
+
+def _write_cache(path, stat_key, register_map):
+    """写缓存失败（只读目录等）不影响使用"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version': (CACHE_VERSION, sys.version_info[:2]), 'stat': stat_key,
+                         'sha256': register_map.sha256, 'map': register_map}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def load_register_map(json_path, use_cache=True):
+    """
+    返回 RegisterMap；JSON 不存在时抛出 OSError，格式错误时抛出 ValueError（json.JSONDecodeError）
+    同时把读命令帧预先放进 protocol 的帧缓存
+    """
+    start = time.perf_counter()
+    abspath = os.path.abspath(json_path)
+    stat_key = _stat_key(os.stat(abspath))
+    with _lock:
+        loaded = _loaded.get(abspath)
+        if loaded and loaded[0] == stat_key:
+            return loaded[1]
+        register_map = None
+        cpath = cache_path(abspath) if use_cache else None
+        cached = _read_cache(cpath) if cpath else None
+        if cached and cached['stat'] == stat_key:
+            register_map = cached['map']
+        else:
+            with open(abspath, 'rb') as f:
+                data = f.read()
+            import hashlib     # 只在 mtime 变化时需要，不拖慢正常启动
+            digest = hashlib.sha256(data).hexdigest()
+            if cached and cached['sha256'] == digest:
+                # 内容没变，只是 mtime 变了：更新缓存中的 stat
+                register_map = cached['map']
+            else:
+                with _gc_paused():
+                    register_map = RegisterMap(json.loads(data.decode('utf-8')), digest)
+            if cpath:
+                _write_cache(cpath, stat_key, register_map)
+        register_map.source = 'cache' if cached and register_map is cached['map'] else 'json'
+        register_map.load_ms = (time.perf_counter() - start) * 1000
+        preload_read_frames(register_map.read_frames)
+        _loaded[abspath] = (stat_key, register_map)
+        return register_map
+
+class RegisterDiff:
+    """
+    两个寄存器表按 index 的差异
+    added/removed: [item]；changed: [(旧item, 新item)]，index 相同但内容不同
+    """
+    def __init__(self, added=(), removed=(), changed=()):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.changed = list(changed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return f"RegisterDiff(+{len(self.added)} -{len(self.removed)} ~{len(self.changed)})"
+
+def diff_register_maps(old, new):
+    """old/new: RegisterMap；index 重复时以最后一个为准（与 addr_map 一致）"""
+    old_items = {item.get('index', ''): item for item in old.items}
+    new_items = {item.get('index', ''): item for item in new.items}
+    added = [item for key, item in new_items.items() if key not in old_items]
+    removed = [item for key, item in old_items.items() if key not in new_items]
+    changed = [(old_items[key], item) for key, item in new_items.items()
+               if key in old_items and old_items[key] != item]
+    return RegisterDiff(added, removed, changed)
+
+class RegisterMapWatcher:
+    """
+    Linux 上用 inotify 监视 JSON 所在目录，只在这个文件被写入/替换后才检查；其他平台（或 inotify 不可用）
+    每 interval 秒比较一次 JSON 的 mtime/大小（mode 为 'inotify' 或 'poll'）。
+    变化停止 interval 秒（编辑器已写完）且 mtime/大小与当前不同时在后台重新加载，
+    有差异时调用 on_reload(new_map, diff)（在监视线程中）。JSON 格式错误时通过 log_func 报告并保留当前的表
+    """
+    def __init__(self, json_path, register_map, on_reload, interval=0.5, log_func=None):
+        self.json_path = os.path.abspath(json_path)
+        self.register_map = register_map
+        self.on_reload = on_reload
+        self.interval = interval
+        self.log_func = log_func or (lambda msg: None)
+        self.reloads = 0
+        self.mode = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        try:
+            return _stat_key(os.stat(self.json_path))
+        except OSError:
+            return None     # 编辑器“删除后重命名”保存的间隙
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="RegisterMapWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def _run(self):
+        inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                from port_watcher import (Inotify, IN_ATTRIB, IN_CLOSE_WRITE, IN_CREATE,
+                                          IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO)
+                inotify = Inotify([os.path.dirname(self.json_path)],
+                                  IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ATTRIB)
+            except (ImportError, OSError, AttributeError):
+                inotify = None
+        try:
+            if inotify is not None:
+                self.mode = 'inotify'
+                self._run_inotify(inotify)
+            else:
+                self.mode = 'poll'
+                self._run_poll()
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _run_inotify(self, inotify):
+        import select
+        name = os.path.basename(self.json_path)
+        current = self._stat()
+        while not self._stop.is_set():
+            # 超时只用来及时响应 stop()
+            readable, _, _ = select.select([inotify], [], [], self.interval)
+            if not readable or name not in inotify.read_names():
+                continue
+            # 保存时往往是一串事件（截断、写入、重命名），等它们停止
+            while not self._stop.wait(self.interval):
+                if name not in inotify.read_names():
+                    break
+            stat_key = self._stat()
+            if stat_key is not None and stat_key != current:
+                current = stat_key
+                self.check()
+
+    def _run_poll(self):
+        current = self._stat()
+        seen = current
+        while not self._stop.wait(self.interval):
+            stat_key = self._stat()
+            if stat_key is None or stat_key == current:
+                seen = stat_key
+                continue
+            if stat_key != seen:
+                # 还在变化，等下一次
+                seen = stat_key
+                continue
+            current = stat_key
+            self.check()
+
+    def check(self):
+        """重新加载并比较；返回 RegisterDiff（没有差异时为 None）"""
+        try:
+            new_map = load_register_map(self.json_path)
+        except (OSError, ValueError) as e:
+            self.log_func(f"Register map reload failed, keeping the current map: {e}")
+            return None
+        if new_map is self.register_map:
+            return None
+        diff = diff_register_maps(self.register_map, new_map)
+        self.register_map = new_map
+        if not diff:
+            return None
+        self.reloads += 1
+        self.on_reload(new_map, diff)
+        return diff
@@ -0,0 +1,299 @@
+"""
+紧凑的寄存器记录
+uart_command_set.json 中每个寄存器是一个约 15 个字符串字段的 dict。编译寄存器表（register_map.RegisterMap）时
+换成 Register：__slots__ 记录，保存整数地址、数据类型编号(codec)、权限位和所属层级(RegisterGroup，同一子模块的寄存器共用)，
+模块/子模块名、基地址字符串、偏移地址由这些字段推导，不再每个寄存器各存一份；读写命令按字节保存（bytes 比十六进制字符串小一半），
+编译时不重新生成命令帧，显示时再格式化成与 JSON 相同的 "5A 10 ..."。
+Register 同时是一个 dict 兼容的只读视图（item['index']、item.get('type')、keys()/items()、== dict），原来读取的调用者不用改；
+推导结果与 JSON 不一致的字段（非标准的地址或命令写法等）原样保存在 extra 中，视图与 JSON 完全一致。
+寄存器表在进程内共享（register_map._loaded），所以视图不能写入：item[key] = v 抛出 TypeError
+"""
+import operator
+import sys
+from collections.abc import Mapping
+from protocol import TYPE_MAP
+
+# JSON 中的字段顺序
+STANDARD_KEYS = ('模块', 'Module', 'base addr', '子模块', 'Submodule', 'base addr.1', 'addr', 'index',
+                 '项目', 'item', 'permission', 'type', 'write command', 'read command', 'write data')
+CODECS = tuple(TYPE_MAP)        # codec 编号 -> 数据类型
+_CODEC_IDS = {name: i for i, name in enumerate(CODECS)}
+DEFAULT_CODEC = _CODEC_IDS['int32_t']
+
+# 权限位
+PERM_READ = 1
+PERM_WRITE = 2
+
+class _Missing:
+    """extra 中表示“JSON 中没有这个字段”；pickle 后仍是同一个对象"""
+    def __reduce__(self):
+        return '_MISSING'
+
+    def __repr__(self):
+        return '<missing>'
+
+_MISSING = _Missing()
+
+def permission_flags(permission):
+    """界面和服务只区分可写（含 W）与只读，读总是允许的"""
+    return PERM_READ | (PERM_WRITE if "W" in permission else 0)
+
+def _frame_bytes(text):
+    """'5A 10 00 02 ...' -> bytes；不是这种标准写法（格式化后不能还原成原字符串）时返回 None"""
+    if type(text) is not str:
+        return None
+    try:
+        frame = bytes.fromhex(text)
+    except ValueError:
+        return None
+    return frame if frame.hex(' ').upper() == text else None
+
+def _hex16(value):
+    return f"0x{value:04X}"
+
+class RegisterGroup:
+    """一个子模块：两种语言的模块/子模块名和基地址，同组的寄存器共用一个对象"""
+    __slots__ = ('id', 'module_en', 'module_cn', 'base_text', 'submodule_en', 'submodule_cn', 'sub_text',
+                 'base', 'sub_base', 'registers', 'missing')
+
+    def __init__(self, group_id, module_en, module_cn, base_text, submodule_en, submodule_cn, sub_text):
+        self.id = group_id
+        self.module_en = module_en
+        self.module_cn = module_cn
+        self.base_text = base_text
+        self.submodule_en = submodule_en
+        self.submodule_cn = submodule_cn
+        self.sub_text = sub_text
+        self.base = _parse_hex(base_text)
+        self.sub_base = _parse_hex(sub_text)
+        self.registers = []
+        self.missing = ()       # JSON 中没有的层级字段
+
+def _parse_hex(text):
+    try:
+        return int(text, 16)
+    except (TypeError, ValueError):
+        return None
+
+class Register(Mapping):
+    """
+    addr: 整数地址；codec: CODECS 中的编号；flags: PERM_READ/PERM_WRITE；group: RegisterGroup（group.id 即层级编号）
+    write_frame/read_frame: JSON 中读写命令的字节；只读，需要修改时用 copy() 得到普通 dict
+    """
+    __slots__ = ('addr', 'index', 'group', 'name_en', 'name_cn', 'codec', 'permission', 'flags', 'write_data',
+                 'write_frame', 'read_frame', 'extra')
+
+    def __init__(self, source, group, missing=()):
+        """missing: JSON 中没有的层级字段（同组共用，由 compact_items 给出）"""
+        extra = dict.fromkeys(missing, _MISSING) if missing else {}
+        index = source.get('index', _MISSING)
+        if isinstance(index, str):
+            self.addr = _parse_hex(index)
+            self.index = index
+        else:
+            self.addr = None
+            self.index = ''
+            extra['index'] = index
+        self.group = group
+        self.name_en = source.get('item', '')
+        self.name_cn = source.get('项目', '')
+        type_text = source.get('type', _MISSING)
+        codec = _CODEC_IDS.get(type_text) if isinstance(type_text, str) else None
+        if codec is None:
+            codec = DEFAULT_CODEC
+            extra['type'] = type_text
+        self.codec = codec
+        permission = source.get('permission', _MISSING)
+        if isinstance(permission, str):
+            permission = sys.intern(permission)
+        else:
+            extra['permission'] = permission
+            permission = 'R'
+        self.permission = permission
+        self.flags = permission_flags(permission)
+        write_data = source.get('write data', _MISSING)
+        if write_data is _MISSING:
+            write_data = None
+            extra['write data'] = _MISSING
+        elif isinstance(write_data, str) and len(write_data) <= 8:
+            write_data = sys.intern(write_data)
+        self.write_data = write_data
+        value = source.get('write command', _MISSING)
+        self.write_frame = frame = _frame_bytes(value)
+        if frame is None:
+            extra['write command'] = value
+        value = source.get('read command', _MISSING)
+        self.read_frame = frame = _frame_bytes(value)
+        if frame is None:
+            extra['read command'] = value
+        # 层级字段就是组的键，只需检查偏移地址；与推导结果不一致或 JSON 中没有时才保存原值
+        if len(source) != len(STANDARD_KEYS) or source.keys() != _STANDARD_SET:
+            for key in ('item', '项目'):
+                if key not in source:
+                    extra[key] = _MISSING
+            for key, value in source.items():
+                if key not in _GETTERS:
+                    extra[key] = value
+        value = source.get('addr', _MISSING)
+        derived = _offset(self) if self.addr is not None else _MISSING
+        if derived is _MISSING or value != derived:
+            extra['addr'] = value
+        self.extra = extra or None
+
+    # ---------- 直接使用的属性 ----------
+    @property
+    def data_type(self):
+        """数据类型（JSON 中的 type，没有时为 int32_t）"""
+        if self.extra is not None and 'type' in self.extra:
+            value = self.extra['type']
+            return 'int32_t' if value is _MISSING else value
+        return CODECS[self.codec]
+
+    @property
+    def writable(self):
+        return bool(self.flags & PERM_WRITE)
+
+    # ---------- dict 兼容视图 ----------
+    def __getitem__(self, key):
+        extra = self.extra
+        if extra is not None and key in extra:
+            value = extra[key]
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        getter = _GETTERS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        extra = self.extra
+        if extra is not None and key in extra:
+            return extra[key] is not _MISSING
+        return key in _GETTERS
+
+    def __iter__(self):
+        extra = self.extra
+        if extra is None:
+            return iter(STANDARD_KEYS)
+        keys = [key for key in STANDARD_KEYS if extra.get(key) is not _MISSING]
+        keys += [key for key, value in extra.items() if key not in _GETTERS and value is not _MISSING]
+        return iter(keys)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __setitem__(self, key, value):
+        # addr/codec、RegisterMap.types 和共享同一张表的其他使用者都不会跟着变
+        raise TypeError("Register is read-only; use copy() for a modifiable dict")
+
+    def __delitem__(self, key):
+        raise TypeError("Register is read-only; use copy() for a modifiable dict")
+
+    def _key(self):
+        group = self.group
+        return (self.addr, self.index, self.name_en, self.name_cn, self.codec, self.permission, self.write_data,
+                self.write_frame, self.read_frame, self.extra, group.module_en, group.module_cn, group.base_text, group.submodule_en,
+                group.submodule_cn, group.sub_text)
+
+    def __eq__(self, other):
+        if type(other) is Register:
+            # 其余字段都由这些推导
+            return self._key() == other._key()
+        if isinstance(other, (Register, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    # 与 dict 一样不可哈希
+    __hash__ = None
+
+    def copy(self):
+        return dict(self.items())
+
+    def __reduce__(self):
+        # 默认的 __slots__ 状态是 dict，按位置保存的元组在读缓存时快得多
+        return _restore, (self.addr, self.index, self.group, self.name_en, self.name_cn, self.codec,
+                          self.permission, self.flags, self.write_data, self.write_frame, self.read_frame, self.extra)
+
+    def __repr__(self):
+        return f"Register({dict(self.items())!r})"
+
+def _restore(*values):
+    register = Register.__new__(Register)
+    (register.addr, register.index, register.group, register.name_en, register.name_cn, register.codec,
+     register.permission, register.flags, register.write_data, register.write_frame, register.read_frame,
+     register.extra) = values
+    return register
+
+def _offset(register):
+    group = register.group
+    if group.base is None or group.sub_base is None:
+        return _MISSING
+    return _hex16(register.addr - group.base - group.sub_base)
+
+_GROUP_KEYS = ('模块', 'Module', 'base addr', '子模块', 'Submodule', 'base addr.1')
+# 由其他字段推导、JSON 与推导结果不同时才存入 extra 的字段
+_DERIVED = {
+    '模块': lambda r: r.group.module_cn,
+    'Module': lambda r: r.group.module_en,
+    'base addr': lambda r: r.group.base_text,
+    '子模块': lambda r: r.group.submodule_cn,
+    'Submodule': lambda r: r.group.submodule_en,
+    'base addr.1': lambda r: r.group.sub_text,
+    'addr': _offset,
+}
+_GETTERS = dict(_DERIVED)
+_GETTERS.update({
+    'write command': lambda r: r.write_frame.hex(' ').upper(),
+    'read command': lambda r: r.read_frame.hex(' ').upper(),
+    'index': lambda r: r.index,
+    '项目': lambda r: r.name_cn,
+    'item': lambda r: r.name_en,
+    'permission': lambda r: r.permission,
+    'type': lambda r: CODECS[r.codec],
+    'write data': lambda r: r.write_data,
+})
+_STANDARD_SET = frozenset(STANDARD_KEYS)
+_group_key = operator.itemgetter(*_GROUP_KEYS)
+
+def compact_items(items):
+    """
+    把 JSON 中的寄存器 dict 转成 Register，返回 (registers, groups)
+    groups: [RegisterGroup]，下标即层级编号，每组的 registers 按原顺序
+    """
+    groups = []
+    group_ids = {}
+    registers = []
+    for source in items:
+        try:
+            key = _group_key(source)
+        except KeyError:
+            key = tuple(source.get(k, _MISSING) for k in _GROUP_KEYS)
+        group = group_ids.get(key)
+        if group is None:
+            values = [None if v is _MISSING else (sys.intern(v) if isinstance(v, str) else v) for v in key]
+            group = RegisterGroup(len(groups), values[1], values[0], values[2], values[4], values[3], values[5])
+            group.missing = tuple(k for k, v in zip(_GROUP_KEYS, key) if v is _MISSING)
+            group_ids[key] = group
+            groups.append(group)
+        register = Register(source, group, group.missing)
+        group.registers.append(register)
+        registers.append(register)
+    return registers, groups
+
+def item_address(item):
+    """寄存器的整数地址：Register 直接取，dict 解析 index"""
+    if type(item) is Register and item.addr is not None:
+        return item.addr
+    return int(item['index'], 16)
+
+def item_type(item):
+    if type(item) is Register:
+        return item.data_type
+    return item.get('type', 'int32_t')
@@ -0,0 +1,149 @@
+"""
+寄存器搜索索引
+由 ItemManager 的寄存器列表一次性建立，检索 EN 名称(item)、CN 名称(项目)、十六进制地址(index) 以及模块/子模块名，不区分大小写：
+- 前缀：所有名称和地址排序后用 bisect 查找
+- 子串：每个寄存器的可检索文本拼成一个大字符串，用 str.find 在 C 层扫描，偏移量用 bisect 换算成寄存器，
+  "limit" 可以找到 CUV_LIMIT，"1a0" 可以找到 0x11A0
+- 模块/子模块名（数量少）逐个比较，命中时该组所有寄存器排在最后
+结果按 完全匹配、前缀、子串、所在组 排序，同一档内保持寄存器表中的顺序
+
+用法:
+    python register_search.py --bench        # 10万寄存器下的建索引和查询耗时
+"""
+import bisect
+import time
+
+_SEP = '\n'     # 各寄存器文本之间的分隔符，查询中不会出现
+_FIELD_SEP = '\t'
+_FIELD_COUNT = 3
+SEARCH_LIMIT = 500     # 界面最多列出/过滤的匹配数
+
+def _normalize(text):
+    return str(text).strip().casefold()
+
+def _item_text(item):
+    """一个寄存器的可检索文本：EN 名称、CN 名称、地址，用 _FIELD_SEP 分隔"""
+    fields = (str(item.get('item', '')).strip(), str(item.get('项目', '')).strip(), str(item.get('index', '')).strip())
+    text = _FIELD_SEP.join(fields)
+    if _SEP in text or text.count(_FIELD_SEP) != _FIELD_COUNT - 1:
+        text = _FIELD_SEP.join(f.replace(_SEP, ' ').replace(_FIELD_SEP, ' ') for f in fields)
+    return text
+
+def item_groups(item):
+    return (item.get('Module', ''), item.get('Submodule', ''), item.get('模块', ''), item.get('子模块', ''))
+
+class RegisterSearchIndex:
+    def __init__(self, items):
+        self.items = list(items)
+        # 整体 casefold 一次再按寄存器切开，比逐个字段处理快得多
+        self._text = _SEP.join(_item_text(item) for item in self.items).casefold()
+        texts = self._text.split(_SEP) if self.items else []
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        self._starts = starts
+        # 前缀词条：每个寄存器正好 _FIELD_COUNT 个字段，词条序号整除 _FIELD_COUNT 即寄存器序号
+        keys = self._text.replace(_SEP, _FIELD_SEP).split(_FIELD_SEP) if self.items else []
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._term_keys = [keys[j] for j in order]
+        self._term_ids = [j // _FIELD_COUNT for j in order]
+        # 相邻寄存器通常属于同一组，按 (Module, Submodule, 模块, 子模块) 先合并
+        by_group = {}
+        last = None
+        members = None
+        for i, item in enumerate(self.items):
+            group = item_groups(item)
+            if group != last:
+                members = by_group.setdefault(group, [])
+                last = group
+            members.append(i)
+        groups = {}     # 组名 -> [寄存器序号]
+        for group, members in by_group.items():
+            for name in group:
+                if name:
+                    groups.setdefault(_normalize(name), []).extend(members)
+        self._groups = groups
+
+    def __len__(self):
+        return len(self.items)
+
+    def search_ids(self, query, limit=None):
+        """返回匹配的寄存器序号（排好序），limit 为 None 时返回全部"""
+        q = _normalize(query)
+        if not q or _SEP in q:
+            return []
+        result = []
+        seen = set()
+        def add(ids):
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    result.append(i)
+                    if limit is not None and len(result) >= limit:
+                        return True
+            return False
+        # 完全匹配、前缀（前缀匹配按名称排序）
+        keys = self._term_keys
+        ids = self._term_ids
+        lo = bisect.bisect_left(keys, q)
+        hi = bisect.bisect_left(keys, q + '\U0010ffff', lo)
+        exact_end = lo
+        while exact_end < hi and keys[exact_end] == q:
+            exact_end += 1
+        if add(sorted(ids[lo:exact_end])) or add(ids[j] for j in range(exact_end, hi)):
+            return result
+        # 子串
+        text, starts = self._text, self._starts
+        substring = []
+        pos = text.find(q)
+        while pos >= 0:
+            i = bisect.bisect_right(starts, pos) - 1
+            if i not in seen:
+                substring.append(i)
+                if limit is not None and len(seen) + len(substring) >= limit:
+                    break
+            # 跳到下一个寄存器，同一寄存器只算一次
+            next_start = starts[i + 1] if i + 1 < len(starts) else len(text)
+            pos = text.find(q, next_start)
+        if add(substring):
+            return result
+        # 模块/子模块名
+        group_ids = set()
+        for name, members in self._groups.items():
+            if q in name:
+                group_ids.update(members)
+        add(sorted(group_ids))
+        return result
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        return [self.items[i] for i in self.search_ids(query, limit)]
+
+def _bench(count=100000, queries=('cuv', 'limit', '0x1', '电压', 'table7', 'e', 'zzzz', 'configuration')):
+    # 把实际的寄存器表复制到 count 个，名称和地址加上序号
+    import json
+    with open('uart_command_set.json', 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    items = []
+    for i in range(count):
+        item = dict(base[i % len(base)])
+        copy = i // len(base)
+        item.update({'index': f"0x{i:05X}", 'item': f"{item.get('item', '')}_{copy}",
+                     '项目': f"{item.get('项目', '')}{copy}"})
+        items.append(item)
+    start = time.perf_counter()
+    index = RegisterSearchIndex(items)
+    print(f"{count} registers: index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    for query in queries:
+        for limit in (SEARCH_LIMIT, None):
+            start = time.perf_counter()
+            n = len(index.search_ids(query, limit))
+            print(f"  {query!r:16} limit={str(limit):5} {n:7} matches  {(time.perf_counter() - start) * 1000:7.2f} ms")
+
+if __name__ == '__main__':
+    import sys
+    if '--bench' in sys.argv:
+        _bench()
+    else:
+        print(__doc__)
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+虚拟化的寄存器表
+原来每个寄存器建一行控件（Frame、Label、2个Button、3个Entry、3个StringVar），全部放在画布里的一个Frame中，
+启动、滚动、改变窗口大小都随寄存器数量变慢，折叠的模块也占着控件。
+这里只为可见的行（加上下各 OVERSCAN 行）创建控件，滚出视口的行控件放回池中复用，
+行的内容来自 RowModel（模块/子模块标题 + 寄存器），每个寄存器的显示值保存在 CellVar 中。
+
+用法:
+    python register_table.py --bench 1000 10000 100000         # 测量不同规模下的建表和滚动帧时间（需要显示器）
+    python register_table.py --bench-model 1000 10000 100000   # 只测行列表和跳转查找（不需要显示器）
+"""
+import time
+import tkinter as tk
+from tkinter import ttk
+from metrics import Histogram
+import utils
+
+ROW_HEIGHT = 30     # 所有行等高，滚动位置可以直接换算为行号
+OVERSCAN = 4        # 视口上下多准备的行数
+
+MODULE, SUBMODULE, ITEM = range(3)
+
+class CellVar:
+    """
+    代替每个寄存器的 StringVar：值保存在这里，所在行可见时同步到行控件。
+    与 StringVar 一样提供 get()/set()，原来使用 result_vars/input_vars/write_status_vars 的代码不变
+    """
+    __slots__ = ('table', 'key', 'field', 'value')
+
+    def __init__(self, table, key, field, value=''):
+        self.table = table
+        self.key = key
+        self.field = field
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = str(value)
+        self.table.cell_changed(self)
+
+def item_tooltip(item):
+    data_type = item.get('type', 'int32_t')
+    try:
+        from protocol import get_type_info
+        type_info = get_type_info(data_type)
+        if data_type == 'float':
+            range_info = f"Range: ±{type_info['max']:.1e}"
+        else:
+            range_info = f"Range: {type_info['min']} to {type_info['max']}"
+    except Exception:
+        range_info = "Range: See documentation"
+    return (f"Address: {item['index']}\n"
+            f"Type: {data_type}\n"
+            f"{range_info}\n"
+            f"Permission: {item.get('permission', 'R')}")
+
+class RowModel:
+    """
+    把 organized_items 按折叠状态展开成一维行列表：(类型, 模块, 子模块, 寄存器)
+    module_states / submodule_states 与 GUI 共用（子模块的键为 f"{module}_{submodule}"）
+    filter_keys 不为 None 时只列出地址在其中的寄存器（忽略折叠状态），没有匹配项的模块/子模块不显示
+    """
+    def __init__(self, organized_items=None, module_states=None, submodule_states=None, filter_keys=None):
+        self.organized_items = organized_items or {}
+        self.module_states = module_states if module_states is not None else {}
+        self.submodule_states = submodule_states if submodule_states is not None else {}
+        self.filter_keys = filter_keys
+        self.rows = []
+        self._positions = None  # 寄存器地址 -> 行号，第一次 find 时建立
+        self.rebuild()
+
+    def rebuild(self):
+        self._positions = None
+        if self.filter_keys is not None:
+            self._rebuild_filtered()
+            return
+        rows = []
+        for module, submodules in self.organized_items.items():
+            rows.append((MODULE, module, None, None))
+            if not self.module_states.get(module, True):
+                continue
+            for submodule, items in submodules.items():
+                rows.append((SUBMODULE, module, submodule, None))
+                if not self.submodule_states.get(f"{module}_{submodule}", True):
+                    continue
+                rows.extend((ITEM, module, submodule, item) for item in items)
+        self.rows = rows
+
+    def _rebuild_filtered(self):
+        keys = self.filter_keys
+        rows = []
+        for module, submodules in self.organized_items.items():
+            module_row = (MODULE, module, None, None)
+            for submodule, items in submodules.items():
+                matched = [item for item in items if item.get('index', '') in keys]
+                if not matched:
+                    continue
+                if module_row:
+                    rows.append(module_row)
+                    module_row = None
+                rows.append((SUBMODULE, module, submodule, None))
+                rows.extend((ITEM, module, submodule, item) for item in matched)
+        self.rows = rows
+
+    def find(self, key):
+        """寄存器所在的行号，不在列表中（被折叠或过滤）时返回 None；行列表重建后第一次调用时建立索引"""
+        if self._positions is None:
+            self._positions = {row[3].get('index'): index for index, row in enumerate(self.rows) if row[0] == ITEM}
+        return self._positions.get(key)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+class _HeaderRow(ttk.Frame):
+    """模块/子模块标题行：展开按钮、名称、Read All、Write All"""
+    def __init__(self, table, kind):
+        super().__init__(table.body, style="ModuleHeader.TFrame" if kind == MODULE else "SubmoduleHeader.TFrame")
+        self.table = table
+        self.kind = kind
+        self.row = None
+        self.columnconfigure(1, weight=1)
+        self.toggle_btn = ttk.Button(self, width=3, command=self._on_toggle)
+        self.toggle_btn.grid(row=0, column=0, padx=5 if kind == MODULE else (20, 5), pady=2)
+        self.name_label = ttk.Label(self)
+        self.name_label.grid(row=0, column=1, sticky='w', padx=5, pady=2)
+        self.read_btn = ttk.Button(self, width=12, command=lambda: self._command('read'))
+        self.read_btn.grid(row=0, column=2, padx=2, pady=2)
+        self.write_btn = ttk.Button(self, width=12, command=lambda: self._command('write'))
+        self.write_btn.grid(row=0, column=3, padx=2, pady=2)
+
+    def bind_row(self, row):
+        self.row = row
+        _, module, submodule, _ = row
+        model = self.table.model
+        if self.kind == MODULE:
+            expanded = model.module_states.get(module, True)
+            name = module
+        else:
+            expanded = model.submodule_states.get(f"{module}_{submodule}", True)
+            name = submodule
+        get_label = self.table.get_label
+        self.toggle_btn.configure(text="[-]" if expanded else "[+]")
+        self.name_label.configure(text=name)
+        self.read_btn.configure(text=get_label("read_all"))
+        self.write_btn.configure(text=get_label("write_all"))
+
+    def _on_toggle(self):
+        _, module, submodule, _ = self.row
+        if self.kind == MODULE:
+            self.table.commands['toggle_module'](module)
+        else:
+            self.table.commands['toggle_submodule'](module, submodule)
+
+    def _command(self, action):
+        _, module, submodule, _ = self.row
+        if self.kind == MODULE:
+            self.table.commands[f'{action}_module'](module)
+        else:
+            self.table.commands[f'{action}_submodule'](module, submodule)
+
+class _ItemRow(ttk.Frame):
+    """寄存器行：名称、Read、读取结果、Write、写入值、写入状态；只读寄存器隐藏写相关控件"""
+    def __init__(self, table):
+        super().__init__(table.body)
+        self.table = table
+        self.item = None
+        self.cells = None
+        self._binding = False
+        self.columnconfigure(2, weight=1)
+        self.columnconfigure(4, weight=1)
+        self.columnconfigure(5, weight=1)
+        self.result_var = tk.StringVar()
+        self.input_var = tk.StringVar()
+        self.status_var = tk.StringVar()
+        self.name_label = ttk.Label(self, width=47, anchor='w')
+        self.name_label.grid(row=0, column=0, padx=(40, 5), sticky='w')
+        utils.create_tooltip(self.name_label, lambda: item_tooltip(self.item) if self.item else '')
+        self.read_btn = ttk.Button(self, width=6, command=lambda: table.commands['read_item'](self.item))
+        self.read_btn.grid(row=0, column=1, padx=2)
+        ttk.Entry(self, textvariable=self.result_var, state='readonly', width=15).grid(row=0, column=2, padx=2, sticky='ew')
+        self.write_widgets = (
+            ttk.Button(self, width=6, command=lambda: table.commands['write_item'](self.item)),
+            ttk.Entry(self, textvariable=self.input_var, width=15),
+            ttk.Entry(self, textvariable=self.status_var, state='readonly', width=15),
+        )
+        for col, widget in enumerate(self.write_widgets, start=3):
+            widget.grid(row=0, column=col, padx=2, sticky='ew' if col > 3 else '')
+        self.writable = True
+        # 用户在写入框中输入的值写回 CellVar
+        self.input_var.trace_add('write', self._on_input)
+
+    def bind_row(self, row):
+        item = row[3]
+        table = self.table
+        self.item = item
+        self.cells = table.cells.get(item['index'])
+        self._binding = True
+        try:
+            self.name_label.configure(text=item.get('item' if table.language == 'EN' else '项目', ''),
+                                      foreground='blue' if item['index'] == table.highlight_key else '')
+            self.read_btn.configure(text=table.get_label("read"))
+            result, write_value, status = self.cells
+            self.result_var.set(result.value)
+            writable = write_value is not None
+            if writable != self.writable:
+                for widget in self.write_widgets:
+                    if writable:
+                        widget.grid()
+                    else:
+                        widget.grid_remove()
+                self.writable = writable
+            if writable:
+                self.write_widgets[0].configure(text=table.get_label("write"))
+                self.input_var.set(write_value.value)
+                self.status_var.set(status.value)
+        finally:
+            self._binding = False
+
+    def _on_input(self, *args):
+        if not self._binding and self.cells and self.cells[1] is not None:
+            self.cells[1].value = self.input_var.get()
+
+    def cell_changed(self, cell):
+        var = (self.result_var, self.input_var, self.status_var)[cell.field]
+        self._binding = True
+        try:
+            var.set(cell.value)
+        finally:
+            self._binding = False
+
+class RegisterTable(ttk.Frame):
+    """
+    只为可见行创建控件的寄存器表，滚动条按行高换算位置。
+    commands: read_item/write_item(item), read_module/write_module/toggle_module(module),
+              read_submodule/write_submodule/toggle_submodule(module, submodule)
+    frame_times 记录每次重新排布可见行的耗时（微秒）
+    """
+    def __init__(self, master, get_label=None, commands=None, language='EN', frame_times=None):
+        super().__init__(master)
+        self.get_label = get_label or (lambda key: key)
+        self.commands = commands or {}
+        self.language = language
+        self.frame_times = frame_times if frame_times is not None else Histogram('register_table_frame_us')
+        self.model = RowModel()
+        self.cells = {}         # 寄存器地址 -> (结果, 写入值, 写入状态) 的 CellVar，只读寄存器后两项为 None
+        self.filter_keys = None     # 搜索过滤：只显示这些地址的寄存器
+        self.highlight_key = None   # 搜索跳转到的寄存器，名称高亮显示
+        self.top = 0            # 视口顶部对应的像素位置
+        self._visible = {}      # 行号 -> 行控件
+        self._bound = {}        # 寄存器地址 -> 正在显示它的行控件
+        self._pools = {MODULE: [], SUBMODULE: [], ITEM: []}
+        self._render_pending = False
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        # 行控件用 place 放在 body 中，超出 body 的部分被裁掉
+        self.body = ttk.Frame(self)
+        self.body.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+        self.body.bind('<Configure>', lambda e: self.schedule_render())
+
+    # ---------- 模型 ----------
+    def set_items(self, organized_items, module_states, submodule_states, old_values=None):
+        """
+        设置寄存器表；old_values 为 (结果, 写入值, 写入状态) 三个 {地址: 值} 字典，重建时保留显示的值。
+        返回 (result_vars, input_vars, write_status_vars)
+        """
+        old_result, old_input, old_status = old_values or ({}, {}, {})
+        cells = {}
+        for submodules in organized_items.values():
+            for items in submodules.values():
+                for item in items:
+                    key = item.get('index', '')
+                    cells[key] = self._new_cells(item, old_result.get(key, ''), old_input.get(key), old_status.get(key, ''))
+        self.cells = cells
+        self.model = RowModel(organized_items, module_states, submodule_states, self.filter_keys)
+        self.refresh()
+        return self._var_dicts()
+
+    def apply_diff(self, organized_items, module_states, submodule_states, diff):
+        """
+        寄存器表热加载：diff 为 register_map.RegisterDiff。只删除/新建变化了的寄存器的 CellVar，
+        其余寄存器的 CellVar 和显示的值不变；内容变化的寄存器在数据类型不变时保留读到的值。
+        返回 (result_vars, input_vars, write_status_vars)
+        """
+        cells = self.cells
+        for item in diff.removed:
+            cells.pop(item.get('index', ''), None)
+        for item in diff.added:
+            cells[item.get('index', '')] = self._new_cells(item)
+        for old_item, item in diff.changed:
+            key = item.get('index', '')
+            old_cells = cells.get(key)
+            result = ''
+            if old_cells is not None and old_item.get('type', 'int32_t') == item.get('type', 'int32_t'):
+                result = old_cells[0].value
+            cells[key] = self._new_cells(item, result)
+        self.model = RowModel(organized_items, module_states, submodule_states, self.filter_keys)
+        self.refresh()
+        return self._var_dicts()
+
+    def _new_cells(self, item, result='', write_value=None, status=''):
+        """一个寄存器的 (结果, 写入值, 写入状态)，只读寄存器后两项为 None"""
+        key = item.get('index', '')
+        result = CellVar(self, key, 0, result)
+        if "W" not in item.get("permission", "R"):
+            return (result, None, None)
+        # 没有旧值时才使用 JSON 中的 write data
+        if write_value is None:
+            write_value = str(item.get('write data', ''))
+        return (result, CellVar(self, key, 1, write_value), CellVar(self, key, 2, status))
+
+    def _var_dicts(self):
+        cells = self.cells
+        return ({k: c[0] for k, c in cells.items()}, {k: c[1] for k, c in cells.items()},
+                {k: c[2] for k, c in cells.items()})
+
+    def set_language(self, language, organized_items, module_states, submodule_states):
+        """
+        切换语言：换成该语言的层级（寄存器对象和 CellVar 不变），只重新绑定可见行的文字，
+        滚动位置、显示的值和进行中的请求回调都不受影响
+        """
+        self.language = language
+        self.model = RowModel(organized_items, module_states, submodule_states, self.filter_keys)
+        self.refresh()
+
+    def set_filter(self, keys):
+        """只显示地址在 keys 中的寄存器，None 取消过滤；只重新展开行列表，寄存器和 CellVar 不变"""
+        self.filter_keys = keys
+        self.model.filter_keys = keys
+        self.top = 0
+        self.rows_changed()
+
+    def show_item(self, key, module_names=None):
+        """
+        滚动到寄存器 key 并高亮；被折叠时展开所在的模块和子模块，module_names 为当前语言下的 (模块, 子模块)
+        返回是否找到
+        """
+        index = self.model.find(key)
+        if index is None and module_names and self.filter_keys is None:
+            module, submodule = module_names
+            self.model.module_states[module] = True
+            self.model.submodule_states[f"{module}_{submodule}"] = True
+            self.model.rebuild()
+            index = self.model.find(key)
+        if index is None:
+            return False
+        self.highlight_key = key
+        # 目标行放在视口上方约三分之一处
+        self.top = max(0, index * ROW_HEIGHT - self.body.winfo_height() // 3)
+        self.refresh()
+        return True
+
+    def rows_changed(self):
+        """折叠/展开后重新展开行列表"""
+        self.model.rebuild()
+        self.refresh()
+
+    def refresh(self):
+        """行内容变化（模型、语言）后重新绑定所有可见行"""
+        for index in list(self._visible):
+            self._release(index)
+        self.schedule_render()
+
+    def cell_changed(self, cell):
+        row = self._bound.get(cell.key)
+        if row is not None:
+            row.cell_changed(cell)
+
+    # ---------- 滚动 ----------
+    def total_height(self):
+        return len(self.model) * ROW_HEIGHT
+
+    def yview(self, *args):
+        """Scrollbar 的 command 协议：moveto f / scroll n units|pages"""
+        height = max(self.body.winfo_height(), 1)
+        if not args:
+            return self._fractions(height)
+        if args[0] == 'moveto':
+            top = float(args[1]) * self.total_height()
+        elif args[0] == 'scroll':
+            step = height if args[2] == 'pages' else ROW_HEIGHT
+            top = self.top + int(args[1]) * step
+        else:
+            return None
+        self.top = int(max(0, min(top, self.total_height() - height)))
+        self.schedule_render()
+
+    def yview_scroll(self, number, what='units'):
+        self.yview('scroll', number, what)
+
+    def yview_moveto(self, fraction):
+        self.yview('moveto', fraction)
+
+    def _fractions(self, height):
+        total = self.total_height()
+        if total <= 0:
+            return 0.0, 1.0
+        return self.top / total, min((self.top + height) / total, 1.0)
+
+    # ---------- 排布 ----------
+    def schedule_render(self):
+        # 连续的滚轮/拖动事件合并为一次排布
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self.render)
+
+    def render(self):
+        self._render_pending = False
+        start = time.perf_counter_ns()
+        height = self.body.winfo_height()
+        total = self.total_height()
+        self.top = max(0, min(self.top, total - height))
+        first = max(self.top // ROW_HEIGHT - OVERSCAN, 0)
+        last = min((self.top + height) // ROW_HEIGHT + OVERSCAN + 1, len(self.model))
+        for index in [i for i in self._visible if i < first or i >= last]:
+            self._release(index)
+        for index in range(first, last):
+            widget = self._visible.get(index)
+            if widget is None:
+                widget = self._acquire(index)
+            widget.place(x=0, y=index * ROW_HEIGHT - self.top, relwidth=1.0, height=ROW_HEIGHT)
+        self.scrollbar.set(*self._fractions(max(height, 1)))
+        self.frame_times.record((time.perf_counter_ns() - start) // 1000)
+
+    def _acquire(self, index):
+        row = self.model[index]
+        kind = row[0]
+        pool = self._pools[kind]
+        if pool:
+            widget = pool.pop()
+        elif kind == ITEM:
+            widget = _ItemRow(self)
+        else:
+            widget = _HeaderRow(self, kind)
+        widget.bind_row(row)
+        if kind == ITEM:
+            self._bound[row[3]['index']] = widget
+        self._visible[index] = widget
+        return widget
+
+    def _release(self, index):
+        widget = self._visible.pop(index)
+        widget.place_forget()
+        if isinstance(widget, _ItemRow):
+            if self._bound.get(widget.item['index']) is widget:
+                del self._bound[widget.item['index']]
+            widget.cells = None
+            self._pools[ITEM].append(widget)
+        else:
+            self._pools[widget.kind].append(widget)
+
+    def widget_count(self):
+        """已创建的行控件数（可见 + 池中），与寄存器数量无关"""
+        return len(self._visible) + sum(len(pool) for pool in self._pools.values())
+
+def _synthetic_items(count, per_submodule=16, per_module=8):
+    organized = {}
+    for i in range(count):
+        submodule_no = i // per_submodule
+        module = f"Module {submodule_no // per_module}"
+        submodule = f"Submodule {submodule_no}"
+        organized.setdefault(module, {}).setdefault(submodule, []).append({
+            'index': f"0x{0x1000 + i:04X}", 'item': f"Register {i}", '项目': f"寄存器 {i}",
+            'type': 'int32_t', 'permission': 'W' if i % 2 else 'R', 'write data': '0'})
+    return organized
+
+def _bench_model(sizes, lookups=1000):
+    """
+    不需要显示器：与寄存器数量有关的部分（展开行列表、折叠后重建、跳转时查找行号）。
+    每帧的排布只处理可见行，控件操作的耗时与寄存器数量无关，见 _bench
+    """
+    import random
+    rng = random.Random(0)
+    for size in sizes:
+        organized = _synthetic_items(size)
+        keys = [item['index'] for submodules in organized.values() for items in submodules.values() for item in items]
+        start = time.perf_counter()
+        model = RowModel(organized, {}, {})
+        build_ms = (time.perf_counter() - start) * 1000
+        first = next(iter(organized))
+        start = time.perf_counter()
+        for state in (False, True):
+            model.module_states[first] = state
+            model.rebuild()
+        toggle_ms = (time.perf_counter() - start) * 1000 / 2
+        start = time.perf_counter()
+        model.find(keys[0])
+        index_ms = (time.perf_counter() - start) * 1000
+        times = []
+        for key in rng.choices(keys, k=lookups):
+            t0 = time.perf_counter_ns()
+            model.find(key)
+            times.append(time.perf_counter_ns() - t0)
+        times.sort()
+        print(f"{size:>7} registers: rows {build_ms:7.1f} ms, collapse/expand {toggle_ms:7.1f} ms, "
+              f"find index {index_ms:6.1f} ms, find p50 {times[len(times) // 2]} ns p99 {times[len(times) * 99 // 100]} ns")
+
+def _bench(sizes, steps=200):
+    """在不同寄存器数量下测量建表时间和滚动帧时间"""
+    root = tk.Tk()
+    root.geometry("1200x700")
+    for size in sizes:
+        organized = _synthetic_items(size)
+        table = RegisterTable(root, frame_times=Histogram())
+        table.pack(fill='both', expand=True)
+        root.update()
+        start = time.perf_counter()
+        table.set_items(organized, {}, {})
+        root.update()
+        build_ms = (time.perf_counter() - start) * 1000
+        table.frame_times.reset()
+        for i in range(steps):
+            table.yview_scroll(3 if (i // 50) % 2 == 0 else -3)
+            root.update()
+        s = table.frame_times.summary()
+        print(f"{size:>7} registers: build {build_ms:8.1f} ms, scroll frame p50 {s['p50']} us "
+              f"p99 {s['p99']} us max {s['max']} us, {table.widget_count()} row widgets")
+        table.destroy()
+    root.destroy()
+
+if __name__ == '__main__':
+    import sys
+    if '--bench' in sys.argv or '--bench-model' in sys.argv:
+        flag = '--bench' if '--bench' in sys.argv else '--bench-model'
+        sizes = [int(a) for a in sys.argv[sys.argv.index(flag) + 1:] if a.isdigit()] or [1000, 10000, 100000]
+        _bench(sizes) if flag == '--bench' else _bench_model(sizes)
+    else:
+        print(__doc__)
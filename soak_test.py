@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+长时间运行（soak）测试
+无界面地对仿真器或真实设备持续运行读写负载，定期采样 RSS、tracemalloc 分配最多的代码行、
+线程数、未完成请求数和各队列长度，结束时检查哪些指标在持续增长（疑似泄漏）
+
+--virtual 时仿真器在本进程内按虚拟时间运行（见 mcu_simulator.VirtualLink），
+--duration 和 --sample-interval 都是虚拟秒，一天的负载几分钟即可跑完
+
+用法:
+    python soak_test.py --virtual --duration 86400 --output soak.json
+    python soak_test.py --duration 3600 --report-rate 20          # 子进程仿真器（pty），真实时间
+    python soak_test.py --url /dev/ttyUSB0 --duration 86400       # 真实设备
+退出码: 0 正常，1 发现持续增长的指标
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from item_manager import ItemManager
+from log_manager import LogManager
+from protocol import validate_value_for_type
+from uart_service import UARTService
+from utils import get_resource_path
+
+LOG_UI_LINES = 5000     # 与GUI日志队列相同的上限
+REQUEST_TIMEOUT = 2.0
+
+# 参与增长检查的指标 -> 忽略的绝对增长量
+GROWTH_CHECKS = {
+    'rss_kb': 2048,
+    'traced_kb': 512,
+    'threads': 2,
+    'pending_requests': 2,
+    'recv_buffer': 256,
+    'log_writer_queue': 1000,
+    'log_ui_queue': LOG_UI_LINES,
+    'sim_tx_queue': 16,
+}
+
+def current_rss_kb():
+    """当前常驻内存；没有 /proc 时返回 None"""
+    from bench_service import current_rss_kb
+    return current_rss_kb()
+
+def detect_growth(values, tolerance=0):
+    """
+    持续增长：前/中/后三段的中位数严格递增，增长量超过 tolerance，且大部分相邻采样不下降
+    返回 None 或 {'first', 'last', 'increase', 'rising_steps'}
+    """
+    n = len(values)
+    if n < 6:
+        return None
+    third = n // 3
+    def median(seq):
+        seq = sorted(seq)
+        return seq[len(seq) // 2]
+    m1, m2, m3 = median(values[:third]), median(values[third:n - third]), median(values[n - third:])
+    rising = sum(1 for a, b in zip(values, values[1:]) if b >= a) / (n - 1)
+    if m1 < m2 < m3 and m3 - m1 > tolerance and rising >= 0.7:
+        return {'first': values[0], 'last': values[-1], 'increase': m3 - m1, 'rising_steps': round(rising, 3)}
+    return None
+
+class ResourceSampler:
+    """采样进程资源和服务内部状态，top 为相对基线增长最多的分配位置"""
+    def __init__(self, service, log_manager, ui_queue, sim=None, top=10, frames=1):
+        self.service = service
+        self.log_manager = log_manager
+        self.ui_queue = ui_queue
+        self.sim = sim
+        self.top = top
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        # 排除采样器自身保存的时间序列，否则它会表现为持续增长
+        self._filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                         tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                         tracemalloc.Filter(False, __file__)]
+        self.baseline = tracemalloc.take_snapshot().filter_traces(self._filters)
+        self.samples = []
+
+    def top_allocators(self, snapshot):
+        stats = snapshot.compare_to(self.baseline, 'lineno')[:self.top]
+        return [{'where': str(s.traceback[0]), 'size_kb': round(s.size_diff / 1024, 1), 'count': s.count_diff}
+                for s in stats if s.size_diff > 0]
+
+    def sample(self, t, wall):
+        service = self.service
+        metrics = service.metrics.metrics()
+        def total(name):
+            return sum(m.value for m in metrics if m.name == name)
+        snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+        row = {
+            't': round(t, 3),
+            'wall_s': round(wall, 3),
+            'rss_kb': current_rss_kb(),
+            'traced_kb': sum(trace.size for trace in snapshot.traces) // 1024,
+            'threads': threading.active_count(),
+            'pending_requests': len(service.pending_requests),
+            'recv_buffer': len(service.recv_buffer),
+            'log_writer_queue': self.log_manager.get_stats().get('queued', 0),
+            'log_ui_queue': len(self.ui_queue),
+            'requests': total('uart_requests_total'),
+            'timeouts': total('uart_timeouts_total'),
+        }
+        if self.sim is not None:
+            row['sim_tx_queue'] = len(self.sim._tx_queue)
+        row['top'] = self.top_allocators(snapshot)
+        self.samples.append(row)
+        return row
+
+    def growth(self, warmup=2):
+        """跳过前 warmup 个采样（导入、缓存预热），返回持续增长的指标"""
+        samples = self.samples[warmup:]
+        flagged = {}
+        for key, tolerance in GROWTH_CHECKS.items():
+            values = [s[key] for s in samples if s.get(key) is not None]
+            result = detect_growth(values, tolerance)
+            if result:
+                flagged[key] = result
+        return flagged
+
+class SoakRunner:
+    def __init__(self, args):
+        self.args = args
+        self.items = ItemManager(json_file=args.config or get_resource_path('uart_command_set.json')).items
+        self.addr_map = {int(item['index'], 16): item for item in self.items}
+        self.sim = None
+        self.link = None
+        self.sim_process = None
+        # 与GUI相同的日志路径：LogManager + 有上限的界面队列（无界面时不消费）
+        self.ui_queue = deque(maxlen=LOG_UI_LINES)
+        self.log_manager = LogManager()
+        self.log_manager.set_log_callback(self.ui_queue.append, records=True)
+        if args.log_file:
+            self.log_manager.set_log_file_path(args.log_file)
+        self.service = self._connect()
+
+    def _connect(self):
+        args = self.args
+        common = dict(log_func=self.log_manager.add_log, addr_map=self.addr_map,
+                      f0_response_getter=lambda: True, response_40_50_getter=lambda: True)
+        if args.virtual:
+            from mcu_simulator import serve_virtual
+            self.sim, self.link = serve_virtual(baudrate=args.baud or 115200, response_latency=args.latency,
+                                                report_rate=args.report_rate, register_file=args.config)
+            service = UARTService(self.link, **common)
+            self.link.feed = service.feed
+            service.link.clock = self.link.clock
+            self.clock = self.link.clock
+        else:
+            url = args.url
+            if url is None:
+                from bench_service import SimulatorProcess
+                sim_args = ['--report-rate', args.report_rate, '--latency', args.latency]
+                if args.baud:
+                    sim_args += ['--baud', args.baud]
+                self.sim_process = SimulatorProcess(*sim_args)
+                url = self.sim_process.url
+            service = UARTService.from_url(url, baudrate=args.baud or 115200, **common)
+            service.start_listener()
+            self.clock = time.monotonic
+        service.start_e0_handshake()
+        if not service.e0_handshake_stop.wait(5.0) or not service.is_mcu_connected():
+            self.close(service)
+            raise RuntimeError("MCU handshake failed")
+        return service
+
+    def close(self, service=None):
+        service = service or self.service
+        service.e0_handshake_stop.set()
+        service.stop_listener()
+        service.uart.close()
+        if self.sim_process is not None:
+            self.sim_process.close()
+        self.log_manager.close()
+
+    def _call(self, fn, *args):
+        """同步调用 read_item/write_item；--thread-per-request 时像GUI那样每个请求起一个线程"""
+        done = threading.Event()
+        def callback(result, error=None):
+            done.set()
+        if self.args.thread_per_request:
+            threading.Thread(target=fn, args=args + (callback,), daemon=True).start()
+            done.wait(REQUEST_TIMEOUT + 1.0)
+        else:
+            fn(*args, callback, timeout=REQUEST_TIMEOUT)
+
+    def _idle(self, seconds):
+        if self.link is not None:
+            self.link.advance(seconds)
+        else:
+            time.sleep(seconds)
+
+    def workload(self):
+        """无限产生工作单元，每次 yield 后检查时间和采样"""
+        service = self.service
+        kind = self.args.workload
+        while True:
+            if kind == 'reports':
+                self._idle(0.1)
+                yield
+                continue
+            for item in self.items:
+                self._call(service.read_item, item)
+                if kind == 'cycle' and item.get('permission') == 'W':
+                    # 与GUI循环发送相同：可写寄存器读后再写
+                    value = validate_value_for_type(item.get('write data', '0'), item.get('type', 'int32_t'))
+                    self._call(service.write_item, item, 0 if value is None else value)
+                yield
+
+    def run(self):
+        args = self.args
+        sampler = ResourceSampler(self.service, self.log_manager, self.ui_queue, sim=self.sim, top=args.top)
+        start = self.clock()
+        wall_start = time.perf_counter()
+        next_sample = start
+        end = start + args.duration
+        print(f"{'t':>10} {'wall':>8} {'rss KB':>9} {'traced KB':>10} {'threads':>8} {'pending':>8} "
+              f"{'log q':>7} {'requests':>9} {'timeouts':>9}", flush=True)
+        for _ in self.workload():
+            now = self.clock()
+            if now >= next_sample:
+                row = sampler.sample(now - start, time.perf_counter() - wall_start)
+                print(f"{row['t']:>10.0f} {row['wall_s']:>8.1f} {'-' if row['rss_kb'] is None else row['rss_kb']:>9} {row['traced_kb']:>10} "
+                      f"{row['threads']:>8} {row['pending_requests']:>8} {row['log_writer_queue']:>7} "
+                      f"{row['requests']:>9} {row['timeouts']:>9}", flush=True)
+                next_sample += args.sample_interval
+            if now >= end:
+                break
+        sampler.sample(self.clock() - start, time.perf_counter() - wall_start)
+        growth = sampler.growth(warmup=args.warmup_samples)
+        return {
+            'config': {k: v for k, v in vars(args).items()},
+            'duration_s': round(self.clock() - start, 3),
+            'wall_s': round(time.perf_counter() - wall_start, 3),
+            'samples': sampler.samples,
+            'growth': growth,
+            'top_allocators': sampler.samples[-1]['top'],
+            'link': self.service.link.report(),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running soak test with resource-leak checks")
+    parser.add_argument('--url', help="device URL or serial port (default: simulator subprocess on a pty)")
+    parser.add_argument('--virtual', action='store_true', help="in-process simulator on a virtual clock")
+    parser.add_argument('--duration', type=float, default=600.0, help="seconds to run (virtual seconds with --virtual)")
+    parser.add_argument('--sample-interval', type=float, default=30.0, help="seconds between samples")
+    parser.add_argument('--warmup-samples', type=int, default=2, help="samples ignored by the growth check")
+    parser.add_argument('--workload', choices=('cycle', 'read', 'reports'), default='cycle',
+                        help="cycle: read every register and write writable ones (GUI cycle send); "
+                             "read: read only; reports: idle while the device reports")
+    parser.add_argument('--thread-per-request', action='store_true', help="start a thread per request like the GUI")
+    parser.add_argument('--report-rate', type=float, default=10.0, help="simulator report frames per second")
+    parser.add_argument('--latency', type=float, default=0.002, help="simulator response latency (s)")
+    parser.add_argument('--baud', type=int, default=None)
+    parser.add_argument('--config', default=None, help="register map JSON (default uart_command_set.json)")
+    parser.add_argument('--log-file', default=None, help="also write the service log to this file")
+    parser.add_argument('--top', type=int, default=10, help="allocation sites to keep per sample")
+    parser.add_argument('--output', help="write the time series and findings as JSON")
+    args = parser.parse_args()
+
+    runner = SoakRunner(args)
+    try:
+        result = runner.run()
+    finally:
+        runner.close()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    print(f"ran {result['duration_s']:.0f} s in {result['wall_s']:.1f} s wall, {len(result['samples'])} samples")
+    print("top allocation growth:")
+    for entry in result['top_allocators'][:5]:
+        print(f"    {entry['size_kb']:>10.1f} KB {entry['count']:>8}  {entry['where']}")
+    if result['growth']:
+        for key, info in result['growth'].items():
+            print(f"GROWTH {key}: {info['first']} -> {info['last']} "
+                  f"(+{info['increase']}, {info['rising_steps']:.0%} rising samples)")
+        return 1
+    print("no monotonic growth detected")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+启动耗时分析
+main.py 最先导入本模块（只依赖 time），在启动的各个阶段调用 mark()，
+窗口显示、寄存器表填充完成后在日志中输出每个阶段的耗时
+
+用法:
+    python main.py --profile-startup    # 打印各阶段耗时后退出
+"""
+import time
+
+class StartupProfiler:
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self._last = self.start
+        self.phases = []    # [(阶段, 耗时秒)]
+        self.exit_when_done = False
+
+    def mark(self, phase):
+        """记录从上一个 mark 到现在的耗时，归入 phase"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.start
+
+    def as_dict(self):
+        return {'phases_ms': {name: round(seconds * 1000, 2) for name, seconds in self.phases},
+                'total_ms': round(self.total() * 1000, 2)}
+
+    def report(self):
+        parts = ', '.join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases)
+        return f"Startup: {parts}; total {self.total() * 1000:.1f} ms"
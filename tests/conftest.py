@@ -0,0 +1,9 @@
+"""
+各模块都在仓库根目录下（没有包结构），测试时把根目录加入 sys.path
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
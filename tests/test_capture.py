@@ -0,0 +1,109 @@
+import os
+import struct
+
+import pytest
+
+from capture import (CAPTURE_MAGIC, DIR_MARK, DIR_RX, DIR_TX, CaptureReader, CaptureTransport,
+                     CaptureWriter, capture_info, replay)
+from transport import create_loopback_pair
+
+def _records(path):
+    with CaptureReader(str(path)) as reader:
+        return reader.meta, [(direction, bytes(data)) for _, direction, data in reader], reader.truncated
+
+def test_write_then_read(tmp_path):
+    path = tmp_path / 'field.cap'
+    writer = CaptureWriter(str(path), meta={'port': 'loop://a', 'baudrate': 115200})
+    writer.record(DIR_TX, b'\x5a\x10\x00\x02')
+    writer.record(DIR_RX, b'\x5a\x11')
+    writer.record(DIR_RX, b'')
+    writer.close()
+    meta, records, truncated = _records(path)
+    assert meta['port'] == 'loop://a' and meta['baudrate'] == 115200
+    assert records == [(DIR_TX, b'\x5a\x10\x00\x02'), (DIR_RX, b'\x5a\x11'), (DIR_RX, b'')]
+    assert not truncated
+    assert (writer.records, writer.bytes) == (3, 6)
+
+def test_timestamps_monotonic(tmp_path):
+    path = tmp_path / 'field.cap'
+    writer = CaptureWriter(str(path))
+    for i in range(100):
+        writer.record(DIR_RX, bytes([i]))
+    writer.close()
+    with CaptureReader(str(path)) as reader:
+        stamps = [ts for ts, _, _, _ in reader.iter_offsets()]
+    assert stamps == sorted(stamps)
+
+def test_append_writes_session_mark(tmp_path):
+    path = tmp_path / 'field.cap'
+    writer = CaptureWriter(str(path), meta={'session': 1})
+    writer.record(DIR_RX, b'a')
+    writer.close()
+    writer = CaptureWriter(str(path), meta={'session': 2})
+    writer.record(DIR_RX, b'b')
+    writer.close()
+    meta, records, _ = _records(path)
+    assert meta['session'] == 1
+    assert [d for d, _ in records] == [DIR_RX, DIR_MARK, DIR_RX]
+    info = capture_info(str(path))
+    assert (info['sessions'], info['rx_chunks'], info['rx_bytes']) == (2, 2, 2)
+
+def test_truncated_tail_ignored(tmp_path):
+    path = tmp_path / 'field.cap'
+    writer = CaptureWriter(str(path))
+    writer.record(DIR_RX, b'complete')
+    writer.record(DIR_RX, b'cut off here')
+    writer.close()
+    with open(path, 'r+b') as f:
+        f.truncate(path.stat().st_size - 4)
+    _, records, truncated = _records(path)
+    assert records == [(DIR_RX, b'complete')]
+    assert truncated
+
+def test_not_a_capture_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a capture')
+    with pytest.raises(ValueError):
+        CaptureReader(str(path))
+    with pytest.raises(ValueError):
+        CaptureWriter(str(path))
+
+@pytest.mark.parametrize('content', [
+    b'',
+    CAPTURE_MAGIC + b'\x01',                                   # 头部长度不完整
+    CAPTURE_MAGIC + struct.pack('<I', 100) + b'{"port": 1}',    # JSON 不完整
+    CAPTURE_MAGIC + struct.pack('<I', 3) + b'\xff\xfe{',         # 不是 UTF-8
+])
+def test_bad_header_raises_value_error_and_closes(tmp_path, content):
+    path = tmp_path / 'bad.cap'
+    path.write_bytes(content)
+    fds = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+    with pytest.raises(ValueError, match='not a capture file'):
+        CaptureReader(str(path))
+    if fds is not None:
+        assert len(os.listdir('/proc/self/fd')) == fds
+
+def test_capture_transport_records_both_directions(tmp_path):
+    path = tmp_path / 'field.cap'
+    host, device = create_loopback_pair()
+    transport = CaptureTransport(host, CaptureWriter(str(path)))
+    transport.write(b'\x5a\xe0')
+    assert device.read(2) == b'\x5a\xe0'
+    device.write(b'\x5a\xe0\x00')
+    assert transport.read(3) == b'\x5a\xe0\x00'
+    transport.close()
+    assert not host.is_open()
+    _, records, _ = _records(path)
+    assert records == [(DIR_TX, b'\x5a\xe0'), (DIR_RX, b'\x5a\xe0\x00')]
+
+def test_replay_feeds_rx_only(tmp_path):
+    path = tmp_path / 'field.cap'
+    writer = CaptureWriter(str(path))
+    writer.record(DIR_TX, b'tx')
+    writer.record(DIR_RX, b'r1')
+    writer.record(DIR_RX, b'r2')
+    writer.close()
+    fed = []
+    stats = replay(str(path), fed.append, speed=0)
+    assert fed == [b'r1', b'r2']
+    assert (stats['chunks'], stats['bytes'], stats['truncated']) == (2, 4, False)
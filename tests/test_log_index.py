@@ -0,0 +1,91 @@
+import time
+
+from log_index import DIR_RX, DIR_TX, LogIndex
+
+LINES = [
+    '[2024-01-01 12:00:00.100] Send: 5A 10 00 02 10 00 91 CF',
+    '[2024-01-01 12:00:00.150] recv packet: 5A 11 00 04 10 00 00 0A 12 34',
+    '[2024-01-01 12:00:01.000] Send: 5A 20 00 06 10 02 00 00 00 01 8F 29',
+    '[2024-01-01 12:00:01.050] recv packet: 5A F1 00 02 20 F3 AB CD',
+    '[2024-01-01 12:00:02.000] serial_data: CRC error, discard 5A 11 00',
+    '[2024-01-01 12:00:03.000] Read 0x1000 timeout',
+    '[2024-01-01 12:00:04.000] Connected to loop://sim',
+]
+
+def _write(path, lines, end='\n'):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + end)
+
+def _ts(text):
+    sec, frac = text.split('.')
+    return time.mktime(time.strptime(sec, '%Y-%m-%d %H:%M:%S')) + float('0.' + frac)
+
+def _lines(query):
+    return [n for n, _ in query.page(0)]
+
+def test_columns(tmp_path):
+    path = tmp_path / 'uart.log'
+    _write(path, LINES)
+    index = LogIndex(str(path))
+    assert index.update() == len(LINES)
+    assert len(index) == len(LINES)
+    assert list(index.direction[:4]) == [DIR_TX, DIR_RX, DIR_TX, DIR_RX]
+    assert list(index.fun[:4]) == [0x10, 0x11, 0x20, 0xF1]
+    assert list(index.addr[:3]) == [0x1000, 0x1000, 0x1002]
+    assert index.status[3] == 0xF3
+    assert index.ts_sorted
+    assert index.ts[0] == _ts('2024-01-01 12:00:00.100')
+
+def test_queries(tmp_path):
+    path = tmp_path / 'uart.log'
+    _write(path, LINES)
+    index = LogIndex(str(path))
+    index.update()
+    assert _lines(index.query(direction=DIR_TX)) == [0, 2]
+    assert _lines(index.query(addr=0x1000)) == [0, 1, 5]
+    assert _lines(index.query(addr=0x1000, direction=DIR_RX)) == [1]
+    assert _lines(index.query(error='status')) == [3]
+    assert _lines(index.query(error='crc')) == [4]
+    assert _lines(index.query(error='timeout')) == [5]
+    assert _lines(index.query(text='loop://')) == [6]
+    assert _lines(index.query(time_from=_ts('2024-01-01 12:00:01.000'),
+                              time_to=_ts('2024-01-01 12:00:02.000'))) == [2, 3, 4]
+    assert index.query(fun=0x30).count() == 0
+    assert index.query(direction=DIR_TX).page(0) == [(0, LINES[0]), (2, LINES[2])]
+
+def test_pages_and_count(tmp_path):
+    path = tmp_path / 'uart.log'
+    _write(path, [f'[2024-01-01 12:00:00.{i:03d}] Send: 5A 10 00 02 10 00 91 CF' for i in range(25)])
+    index = LogIndex(str(path))
+    index.update()
+    query = index.query(fun=0x10)
+    assert [n for n, _ in query.page(1, page_size=10)] == list(range(10, 20))
+    assert [n for n, _ in query.page(2, page_size=10)] == list(range(20, 25))
+    assert query.count() == 25
+    assert index.query(fun=0x10).count(limit=5) == 5
+
+def test_incremental_update_with_partial_line(tmp_path):
+    path = tmp_path / 'uart.log'
+    _write(path, LINES[:2])
+    # 最后一行还没写完
+    _write(path, [LINES[2][:20]], end='')
+    index = LogIndex(str(path))
+    assert index.update() == 2
+    _write(path, [LINES[2][20:]])
+    assert index.update() == 1
+    assert index.update() == 0
+    assert index.read_lines([2]) == [LINES[2]]
+    assert _lines(index.query(fun=0x20)) == [2]
+
+def test_update_budget(tmp_path):
+    path = tmp_path / 'uart.log'
+    _write(path, LINES)
+    index = LogIndex(str(path))
+    total = 0
+    while True:
+        added = index.update(max_bytes=40)
+        if not added and index.indexed_bytes == path.stat().st_size:
+            break
+        total += added
+    assert total == len(LINES)
+    assert index.read_lines(range(len(LINES))) == LINES
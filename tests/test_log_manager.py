@@ -0,0 +1,93 @@
+import gzip
+import os
+import threading
+
+from log_manager import LogFileWriter, LogRecord
+
+def _writer(path, **kwargs):
+    kwargs.setdefault('flush_interval', 0.01)
+    return LogFileWriter(str(path), **kwargs)
+
+def test_lines_and_records_written_in_order(tmp_path):
+    path = tmp_path / 'uart.log'
+    writer = _writer(path)
+    writer.put('first')
+    writer.put(LogRecord('INFO', 'uart', 'Send: ', data=b'\x5a\x10'))
+    writer.put('last')
+    assert writer.flush()
+    writer.close()
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'first'
+    assert lines[1].startswith('[') and lines[1].endswith('] Send: 5A 10')
+    assert lines[2] == 'last'
+    assert writer.stats['lines'] == 3
+
+def test_reset_replaces_content(tmp_path):
+    path = tmp_path / 'uart.log'
+    writer = _writer(path)
+    writer.put('old')
+    writer.reset('saved\n')
+    writer.put('new')
+    writer.flush()
+    writer.close()
+    assert path.read_text(encoding='utf-8') == 'saved\nnew\n'
+
+def test_rotation_keeps_backup_count(tmp_path):
+    path = tmp_path / 'uart.log'
+    writer = _writer(path, max_bytes=100, backup_count=2)
+    for i in range(10):
+        writer.put(f'line {i:02d} ' + 'x' * 100)
+        writer.flush()
+    writer.close()
+    assert writer.stats['rotations'] >= 3
+    assert sorted(os.listdir(tmp_path)) == ['uart.log.1', 'uart.log.2']
+    # 每行单独写入并超过 max_bytes，最新的在 .1
+    assert (tmp_path / 'uart.log.1').read_text(encoding='utf-8').startswith('line 09')
+    assert (tmp_path / 'uart.log.2').read_text(encoding='utf-8').startswith('line 08')
+
+def test_rotation_gzip(tmp_path):
+    path = tmp_path / 'uart.log'
+    writer = _writer(path, max_bytes=100, backup_count=3, compress=True)
+    for i in range(4):
+        writer.put(f'line {i} ' + 'y' * 100)
+        writer.flush()
+    writer.put('tail')
+    writer.flush()
+    writer.close()
+    assert sorted(os.listdir(tmp_path)) == ['uart.log', 'uart.log.1.gz', 'uart.log.2.gz', 'uart.log.3.gz']
+    with gzip.open(tmp_path / 'uart.log.1.gz', 'rt', encoding='utf-8') as f:
+        assert f.read().startswith('line 3 ')
+    assert path.read_text(encoding='utf-8') == 'tail\n'
+
+def test_full_queue_drops_and_reports(tmp_path):
+    path = tmp_path / 'uart.log'
+    writing = threading.Event()
+    release = threading.Event()
+
+    def slow_format(record):
+        writing.set()
+        release.wait(5)
+        return str(record)
+
+    writer = _writer(path, queue_size=2, formatter=slow_format)
+    writer.put(LogRecord('INFO', 'uart', 'blocked'))
+    assert writing.wait(5)
+    # 写线程卡在格式化中，队列只能再放 2 行
+    results = [writer.put(f'line {i}') for i in range(5)]
+    release.set()
+    writer.flush()
+    writer.close()
+    assert results == [True, True, False, False, False]
+    assert writer.stats['dropped'] == 3
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'blocked'
+    assert '[log] 3 log lines dropped (queue full)' in lines
+    assert 'line 0' in lines and 'line 1' in lines
+
+def test_write_error_reported(tmp_path):
+    errors = []
+    writer = _writer(tmp_path / 'missing' / 'uart.log', error_callback=errors.append)
+    writer.put('line')
+    writer.flush()
+    writer.close()
+    assert errors and errors[0].startswith('Failed to write log file')
@@ -0,0 +1,47 @@
+import pytest
+
+from mcu_simulator import SimulatedMCU
+from port_scanner import PortScanner
+from transport import create_loopback_pair
+
+@pytest.fixture
+def mcu():
+    """loop://scan-mcu 上有一个模拟 MCU"""
+    host, device = create_loopback_pair('scan-mcu')
+    sim = SimulatedMCU(device)
+    sim.start()
+    yield sim
+    sim.stop()
+
+def test_scan_finds_mcu(mcu):
+    scanner = PortScanner(['loop://scan-missing', 'loop://scan-mcu'], timeout=0.3)
+    results = scanner.scan()
+    assert [r.port for r in results] == ['loop://scan-mcu', 'loop://scan-missing']
+    found = results[0]
+    assert found.ok and found.baudrate == 115200 and found.latency_ms >= 0
+    assert found.uart is None           # keep=0：全部关闭
+    by_port = {r.port: r for r in results}
+    assert not by_port['loop://scan-missing'].ok
+    assert 'no loopback device' in by_port['loop://scan-missing'].error
+    assert mcu.stats['handshakes'] >= 1
+
+def test_scan_keep_leaves_port_open(mcu):
+    results = PortScanner(['loop://scan-mcu'], baudrates=(9600, 115200), timeout=0.3).scan(keep=1)
+    assert results[0].ok and results[0].baudrate == 9600
+    uart = results[0].uart
+    try:
+        assert uart is not None and uart.is_open()
+    finally:
+        uart.close()
+
+def test_scan_no_mcu():
+    host, device = create_loopback_pair('scan-silent')
+    results = PortScanner(['loop://scan-silent'], baudrates=(115200, 9600), timeout=0.1).scan()
+    assert not results[0].ok
+    assert results[0].error == 'No handshake reply'
+    assert results[0].uart is None
+    assert not host.is_open()
+
+def test_requires_baudrate():
+    with pytest.raises(ValueError):
+        PortScanner(['loop://'], baudrates=())
@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import ROOT
+import register_map
+from register_map import RegisterMap, RegisterMapWatcher, diff_register_maps, load_register_map
+
+@pytest.fixture
+def json_path(tmp_path, monkeypatch):
+    """寄存器表的副本，缓存放在临时目录"""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / 'cache'))
+    path = tmp_path / 'uart_command_set.json'
+    shutil.copy(os.path.join(ROOT, 'uart_command_set.json'), path)
+    return str(path)
+
+def _items(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def _save(path, items):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False)
+    # 同一个 mtime 粒度内改两次时也要让 stat 不同
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+
+def test_diff_add_remove_change(json_path):
+    items = _items(json_path)
+    old = RegisterMap(items)
+    changed = [dict(item) for item in items]
+    removed = changed.pop(1)
+    changed[0]['permission'] = 'R' if changed[0]['permission'] != 'R' else 'W'
+    added = dict(changed[-1], index='0xFFF0', item='NEW_REG')
+    changed.append(added)
+    diff = diff_register_maps(old, RegisterMap(changed))
+    assert bool(diff)
+    assert [item['index'] for item in diff.added] == ['0xFFF0']
+    assert [item['index'] for item in diff.removed] == [removed['index']]
+    assert [(a['index'], b['permission']) for a, b in diff.changed] == [(items[0]['index'], changed[0]['permission'])]
+
+def test_diff_same_map_is_empty(json_path):
+    items = _items(json_path)
+    diff = diff_register_maps(RegisterMap(items), RegisterMap(items))
+    assert not diff
+    assert (diff.added, diff.removed, diff.changed) == ([], [], [])
+
+def test_load_uses_cache(json_path):
+    first = load_register_map(json_path)
+    assert first.source == 'json'
+    register_map._loaded.clear()
+    second = load_register_map(json_path)
+    assert second.source == 'cache'
+    assert [dict(item) for item in second.items] == _items(json_path)
+    assert second.types == first.types
+    assert second.read_frames == first.read_frames
+
+def test_load_rejects_bad_json(json_path):
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write('[{"index": ')
+    with pytest.raises(ValueError):
+        load_register_map(json_path)
+
+def test_watcher_check_reports_diff(json_path):
+    current = load_register_map(json_path)
+    reloads = []
+    watcher = RegisterMapWatcher(json_path, current, lambda new_map, diff: reloads.append((new_map, diff)))
+    assert watcher.check() is None
+    assert reloads == []
+
+    items = _items(json_path)
+    items[0]['item'] = 'RENAMED'
+    _save(json_path, items)
+    diff = watcher.check()
+    assert [(a['item'], b['item']) for a, b in diff.changed] == [(current.items[0]['item'], 'RENAMED')]
+    assert watcher.reloads == 1
+    assert reloads[0][1] is diff
+    assert watcher.register_map is reloads[0][0]
+    assert watcher.register_map.items[0]['item'] == 'RENAMED'
+
+def test_watcher_check_keeps_map_on_bad_json(json_path):
+    current = load_register_map(json_path)
+    messages = []
+    watcher = RegisterMapWatcher(json_path, current, lambda *args: pytest.fail("unexpected reload"),
+                                 log_func=messages.append)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write('not json')
+    assert watcher.check() is None
+    assert watcher.register_map is current
+    assert len(messages) == 1 and 'keeping the current map' in messages[0]
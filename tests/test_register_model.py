@@ -0,0 +1,66 @@
+import json
+import os
+import pickle
+
+import pytest
+
+from conftest import ROOT
+from register_model import compact_items, item_address, item_type
+
+def _load(name):
+    with open(os.path.join(ROOT, name), encoding='utf-8') as f:
+        return json.load(f)
+
+@pytest.mark.parametrize('name', ['uart_command_set.json', 'uart_command_setold.json'])
+def test_view_matches_json(name):
+    source = _load(name)
+    registers, groups = compact_items(source)
+    assert len(registers) == len(source)
+    for register, row in zip(registers, source):
+        assert dict(register) == row
+        assert list(register) == list(row)
+        assert register == row
+    assert sum(len(group.registers) for group in groups) == len(source)
+
+@pytest.mark.parametrize('name', ['uart_command_set.json', 'uart_command_setold.json'])
+def test_pickle_round_trip(name):
+    source = _load(name)
+    registers, _ = compact_items(source)
+    restored = pickle.loads(pickle.dumps(registers, protocol=pickle.HIGHEST_PROTOCOL))
+    assert [dict(register) for register in restored] == source
+    # 同组的寄存器恢复后仍共用一个 RegisterGroup
+    assert len({id(register.group) for register in restored}) == len({id(r.group) for r in registers})
+
+def test_nonstandard_rows_kept_as_is():
+    source = [
+        {'index': '0x10', 'item': 'a', 'foo': 1, 'type': 'weird', 'write command': '5a 10', 'read command': 'zz'},
+        {'Module': 'M', 'index': 5},
+        {},
+        {'index': '0x20', 'base addr': '0x0000', 'base addr.1': 'x'},
+    ]
+    registers, _ = compact_items(source)
+    for register, row in zip(registers, source):
+        assert dict(register) == row
+    assert registers[0].data_type == 'weird'
+    assert 'read data' not in registers[0]
+
+def test_fields():
+    row = _load('uart_command_set.json')[0]
+    register = compact_items([row])[0][0]
+    assert item_address(register) == int(row['index'], 16)
+    assert item_type(register) == row['type']
+    assert register.write_frame == bytes.fromhex(row['write command'])
+    assert register.read_frame == bytes.fromhex(row['read command'])
+    assert register.writable == ('W' in row['permission'])
+
+def test_read_only():
+    row = _load('uart_command_set.json')[0]
+    register = compact_items([row])[0][0]
+    with pytest.raises(TypeError):
+        register['type'] = 'float'
+    with pytest.raises(TypeError):
+        del register['type']
+    copy = register.copy()
+    copy['type'] = 'float'
+    assert copy['type'] == 'float'
+    assert register['type'] == row['type'] and register.data_type == row['type']
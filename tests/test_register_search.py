@@ -0,0 +1,44 @@
+import pytest
+
+from register_search import RegisterSearchIndex
+
+def _item(index, name, name_cn='', module='Config', submodule='Limits'):
+    return {'Module': module, 'Submodule': submodule, '模块': '配置', '子模块': '限值',
+            'index': index, 'item': name, '项目': name_cn}
+
+@pytest.fixture
+def index():
+    return RegisterSearchIndex([
+        _item('0x1000', 'CUV_LIMIT', '电芯欠压保护电压'),
+        _item('0x1002', 'COV_LIMIT', '电芯过压保护电压'),
+        _item('0x11A0', 'CUV', '欠压'),
+        _item('0x2000', 'TEMP', '温度', module='Status', submodule='Sensors'),
+    ])
+
+def _names(items):
+    return [item['item'] for item in items]
+
+def test_exact_then_prefix_then_substring(index):
+    assert _names(index.search('cuv')) == ['CUV', 'CUV_LIMIT']
+    # CUV 只有子模块名 Limits 命中，排在最后
+    assert _names(index.search('limit')) == ['CUV_LIMIT', 'COV_LIMIT', 'CUV']
+
+def test_address_and_chinese_name(index):
+    assert _names(index.search('0x2000')) == ['TEMP']
+    assert _names(index.search('1a0')) == ['CUV']
+    assert _names(index.search('过压')) == ['COV_LIMIT']
+
+def test_group_names_match_last(index):
+    assert _names(index.search('sensors')) == ['TEMP']
+    assert _names(index.search('CONFIG')) == ['CUV_LIMIT', 'COV_LIMIT', 'CUV']
+
+def test_limit_and_empty_query(index):
+    assert len(index.search('0x', limit=2)) == 2
+    assert index.search('') == []
+    assert index.search('   ') == []
+    assert index.search('zzzz') == []
+
+def test_empty_index():
+    index = RegisterSearchIndex([])
+    assert len(index) == 0
+    assert index.search('cuv') == []
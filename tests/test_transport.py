@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+import serial
+
+from transport import LoopbackTransport, create_loopback_pair, is_transport_url, open_transport
+
+def test_single_end_echoes():
+    loop = LoopbackTransport(timeout=0.1)
+    assert loop.write(b'abc') == 3
+    assert loop.in_waiting() == 3
+    assert loop.read(2) == b'ab'
+    assert loop.read(5) == b'c'
+    assert loop.read(1) == b''     # 超时
+
+def test_pair_is_crossed():
+    host, device = create_loopback_pair()
+    host.write(b'to device')
+    device.write(b'to host')
+    assert device.read(100) == b'to device'
+    assert host.read(100) == b'to host'
+    assert host.in_waiting() == device.in_waiting() == 0
+
+def test_baudrate_delays_delivery():
+    host, device = create_loopback_pair(baudrate=9600)
+    device.timeout = 1
+    start = time.monotonic()
+    host.write(b'x' * 96)      # 96 字节 * 10 位 / 9600 = 0.1 s
+    assert device.in_waiting() < 96
+    data = b''
+    while len(data) < 96:
+        data += device.read(96 - len(data))
+    assert data == b'x' * 96
+    assert time.monotonic() - start >= 0.09
+
+def test_close_unblocks_reader():
+    host, device = create_loopback_pair()
+    device.timeout = None
+    result = []
+    reader = threading.Thread(target=lambda: result.append(device.read(1)))
+    reader.start()
+    time.sleep(0.05)
+    host.close()
+    reader.join(1)
+    assert not reader.is_alive()
+    assert result == [b'']
+    assert not host.is_open()
+    with pytest.raises(serial.SerialException):
+        host.write(b'x')
+
+def test_named_pair_reopen():
+    host, device = create_loopback_pair('test-reopen')
+    host.close()
+    again = open_transport('loop://test-reopen', timeout=0.2)
+    assert again is host and again.is_open()
+    assert again.timeout == 0.2
+    again.write(b'ping')
+    assert device.read(4) == b'ping'
+    device.write(b'pong')
+    assert again.read(4) == b'pong'
+
+def test_urls():
+    assert is_transport_url('loop://')
+    assert not is_transport_url('/dev/ttyUSB0')
+    assert isinstance(open_transport('loop://?latency=0.01', timeout=0.1), LoopbackTransport)
+    with pytest.raises(serial.SerialException):
+        open_transport('loop://no-such-device')
+    with pytest.raises(serial.SerialException):
+        open_transport('bogus://x')
@@ -0,0 +1,143 @@
+"""
+请求级追踪
+每个请求经过的阶段（GUI入队、开始发送、发送完成、收到第一个数据块、收到完整帧、回调完成、界面更新）
+记录到预先分配的环形缓冲区，导出为 Chrome trace event JSON，可以用 chrome://tracing 或 Perfetto 打开。
+默认关闭：UARTService.tracer 为 None 时每个记录点只是一次 is None 判断
+"""
+import itertools
+import json
+import threading
+import time
+from array import array
+
+TRACE_CAPACITY = 65536      # 环形缓冲区保留的事件数
+
+# 阶段，按请求中出现的先后排列
+ENQUEUE = 0         # GUI/调用方发起请求
+TX_START = 1        # 开始写串口
+TX_DONE = 2         # write() 返回（数据已交给驱动）
+FIRST_BYTE = 3      # 监听线程在发送后拿到第一块数据
+FRAME_COMPLETE = 4  # 应答帧解析出来并匹配到请求
+CALLBACK = 5        # 请求回调执行完
+UI_APPLIED = 6      # 界面事件循环处理了更新
+TIMEOUT = 7         # 超时未收到应答
+PHASE_NAMES = ('enqueue', 'tx_start', 'tx_done', 'first_byte', 'frame_complete', 'callback', 'ui_applied', 'timeout')
+# 以该阶段结束的区间名称
+SEGMENT_NAMES = {
+    TX_START: 'wait',
+    TX_DONE: 'tx',
+    FIRST_BYTE: 'device',
+    FRAME_COMPLETE: 'rx',
+    CALLBACK: 'callback',
+    UI_APPLIED: 'ui',
+    TIMEOUT: 'timeout',
+}
+
+OPS = ('read', 'write', 'upgrade', 'upgrade_crc')
+_OP_CODES = {name: i for i, name in enumerate(OPS)}
+
+class Tracer:
+    """
+    环形缓冲区按列预先分配（时间戳/请求号/阶段/线程/操作/地址），记录时不分配内存也不加锁：
+    槽位序号来自 itertools.count（CPython 中 next() 是原子的），缓冲区满后覆盖最旧的事件
+    """
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.capacity = capacity
+        self._ts = array('q', bytes(8 * capacity))
+        self._ids = array('Q', bytes(8 * capacity))
+        self._tids = array('Q', bytes(8 * capacity))
+        self._addr = array('i', bytes(4 * capacity))
+        self._phase = bytearray(capacity)
+        self._op = bytearray(capacity)
+        self._seq = itertools.count()
+        self._last = -1
+        self._next_id = itertools.count(1)
+        self._thread_names = {}
+        self._base_ns = time.perf_counter_ns()
+        self._base_wall = time.time()
+
+    def begin(self, op, addr=-1):
+        """开始一个请求，记录 ENQUEUE，返回请求号"""
+        trace_id = next(self._next_id)
+        self._put(trace_id, ENQUEUE, _OP_CODES.get(op, 0), addr)
+        return trace_id
+
+    def mark(self, trace_id, phase):
+        self._put(trace_id, phase, 0, -1)
+
+    def _put(self, trace_id, phase, op, addr):
+        n = next(self._seq)
+        self._last = n
+        i = n % self.capacity
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self._ts[i] = time.perf_counter_ns()
+        self._ids[i] = trace_id
+        self._tids[i] = tid
+        self._phase[i] = phase
+        self._op[i] = op
+        self._addr[i] = addr
+
+    def clear(self):
+        self._seq = itertools.count()
+        self._last = -1
+
+    def events(self):
+        """按时间顺序返回缓冲区中的 (ts_ns, trace_id, phase, thread_id, op, addr)"""
+        total = self._last + 1
+        if total <= self.capacity:
+            order = range(total)
+        else:
+            start = total % self.capacity
+            order = itertools.chain(range(start, self.capacity), range(start))
+        rows = [(self._ts[i], self._ids[i], self._phase[i], self._tids[i], self._op[i], self._addr[i]) for i in order]
+        rows.sort()
+        return rows
+
+    def to_chrome_trace(self):
+        """
+        Chrome trace event 格式：每个请求是一组异步事件（同一 id 下嵌套各阶段区间），
+        每个记录点另有一个即时事件，放在实际执行它的线程上
+        """
+        base = self._base_ns
+        requests = {}
+        trace_events = []
+        for ts, trace_id, phase, tid, op, addr in self.events():
+            us = (ts - base) / 1000.0
+            trace_events.append({'name': PHASE_NAMES[phase], 'ph': 'i', 's': 't', 'ts': us,
+                                 'pid': 1, 'tid': tid, 'args': {'req': trace_id}})
+            req = requests.setdefault(trace_id, {'op': None, 'addr': -1, 'phases': []})
+            if phase == ENQUEUE:
+                req['op'] = OPS[op]
+                req['addr'] = addr
+            req['phases'].append((us, phase))
+        for trace_id, req in requests.items():
+            phases = req['phases']
+            if req['op'] is None:
+                # 开始事件已被覆盖
+                continue
+            name = req['op'] if req['addr'] < 0 else f"{req['op']} 0x{req['addr']:04X}"
+            common = {'cat': 'uart', 'id': trace_id, 'pid': 1}
+            trace_events.append(dict(common, name=name, ph='b', ts=phases[0][0],
+                                     args={'req': trace_id, 'phases': [PHASE_NAMES[p] for _, p in phases]}))
+            for (t0, _), (t1, phase) in zip(phases, phases[1:]):
+                segment = SEGMENT_NAMES.get(phase, PHASE_NAMES[phase])
+                trace_events.append(dict(common, name=segment, ph='b', ts=t0))
+                trace_events.append(dict(common, name=segment, ph='e', ts=t1))
+            trace_events.append(dict(common, name=name, ph='e', ts=phases[-1][0]))
+        for tid, thread_name in list(self._thread_names.items()):
+            trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                                 'args': {'name': thread_name}})
+        return {
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'start_time': self._base_wall, 'capacity': self.capacity},
+        }
+
+    def dump(self, path):
+        """把缓冲区写成 Chrome trace JSON 文件，返回事件数"""
+        trace = self.to_chrome_trace()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        return len(trace['traceEvents'])
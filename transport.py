@@ -0,0 +1,419 @@
+"""
+串口传输层
+UARTInterface 通过 open_transport(url) 选择具体实现:
+    COM3 / /dev/ttyUSB0 / serial://COM3     pyserial 串口
+    pty:///dev/pts/5                        Linux 伪终端 (仿真MCU使用)
+    tcp://192.168.1.20:4001                 TCP 串口服务器 (ser2net 等)
+    unix:///tmp/bms.sock                    Unix socket
+    loop://                                 内存回环，写入的数据原样读回
+    loop://sim1                             与 create_loopback_pair('sim1') 创建的设备端相连
+URL 参数: ?baud=115200&latency=0.002 (仅 loop://，模拟波特率和链路延时)
+"""
+import io
+import os
+import select
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+import serial
+from protocol import bits_per_frame   # 兼容原来从 transport 导入
+
+class Transport:
+    """传输层公共接口，方法与 UARTInterface 保持一致"""
+    def close(self):
+        raise NotImplementedError
+
+    def is_open(self):
+        raise NotImplementedError
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def read(self, size=1):
+        """最多读取size字节，超时返回已读到的数据（可能为空）"""
+        raise NotImplementedError
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        return n
+
+    def in_waiting(self):
+        raise NotImplementedError
+
+    def fileno(self):
+        raise io.UnsupportedOperation(f"{type(self).__name__} has no file descriptor")
+
+    def _check_open(self):
+        if not self.is_open():
+            raise serial.SerialException("Serial port not open")
+
+class SerialTransport(Transport):
+    def __init__(self, port, baudrate=115200, bytesize=8, stopbits=1, parity='N', timeout=1):
+        self.ser = serial.Serial(
+            port=port,
+            baudrate=baudrate,
+            bytesize=bytesize,
+            stopbits=stopbits,
+            parity=parity,
+            timeout=timeout
+        )
+
+    def close(self):
+        if self.ser.is_open:
+            self.ser.close()
+
+    def is_open(self):
+        return self.ser.is_open
+
+    def write(self, data):
+        self._check_open()
+        return self.ser.write(data)
+
+    def read(self, size=1):
+        self._check_open()
+        return self.ser.read(size)
+
+    def readinto(self, buffer):
+        self._check_open()
+        return self.ser.readinto(buffer)
+
+    def in_waiting(self):
+        return self.ser.in_waiting if self.ser.is_open else 0
+
+    def fileno(self):
+        return self.ser.fileno()
+
+def _fionread(fd):
+    import fcntl
+    import termios
+    import struct
+    buf = fcntl.ioctl(fd, termios.FIONREAD, b'\x00\x00\x00\x00')
+    return struct.unpack('i', buf)[0]
+
+def create_pty_pair():
+    """
+    创建一对原始模式的伪终端，返回 (master_fd, slave_path, slave_fd)
+    仿真设备持有master端，被测程序通过 pty://<slave_path> 打开
+    slave_fd 需要由调用方保持打开直到仿真结束，否则被测程序断开时master读会返回EIO
+    """
+    if not sys.platform.startswith('linux'):
+        raise serial.SerialException("pty transport is only available on Linux")
+    import pty
+    import tty
+    master_fd, slave_fd = pty.openpty()
+    tty.setraw(slave_fd)
+    slave_path = os.ttyname(slave_fd)
+    return master_fd, slave_path, slave_fd
+
+class PtyTransport(Transport):
+    """直接用文件描述符读写的伪终端，不经过pyserial"""
+    def __init__(self, path, timeout=1):
+        if not sys.platform.startswith('linux'):
+            raise serial.SerialException("pty transport is only available on Linux")
+        import tty
+        try:
+            self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            raise serial.SerialException(f"could not open pty {path}: {e}")
+        tty.setraw(self.fd)
+        self.path = path
+        self.timeout = timeout
+
+    @classmethod
+    def from_fd(cls, fd, timeout=1):
+        """包装已打开的描述符（例如 create_pty_pair 返回的master端）"""
+        os.set_blocking(fd, False)
+        self = cls.__new__(cls)
+        self.fd = fd
+        self.path = None
+        self.timeout = timeout
+        return self
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def is_open(self):
+        return self.fd is not None
+
+    def write(self, data):
+        self._check_open()
+        view = memoryview(data)
+        total = 0
+        while total < len(view):
+            try:
+                total += os.write(self.fd, view[total:])
+            except BlockingIOError:
+                select.select([], [self.fd], [], self.timeout)
+        return total
+
+    def read(self, size=1):
+        self._check_open()
+        buf = bytearray()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while len(buf) < size:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], wait)
+            if not ready:
+                break
+            try:
+                chunk = os.read(self.fd, size - len(buf))
+            except BlockingIOError:
+                continue
+            if not chunk:
+                break
+            buf += chunk
+        return bytes(buf)
+
+    def in_waiting(self):
+        return _fionread(self.fd) if self.fd is not None else 0
+
+    def fileno(self):
+        self._check_open()
+        return self.fd
+
+class SocketTransport(Transport):
+    """TCP / Unix socket，用于 ser2net 之类的串口服务器"""
+    def __init__(self, address, family=socket.AF_INET, timeout=1, connect_timeout=5.0):
+        try:
+            self.sock = socket.socket(family, socket.SOCK_STREAM)
+            self.sock.settimeout(connect_timeout)
+            self.sock.connect(address)
+        except OSError as e:
+            raise serial.SerialException(f"could not connect to {address}: {e}")
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(timeout)
+        self.address = address
+        # 已从socket取出但还没被read的数据，用于实现跨平台的in_waiting
+        self._rx = bytearray()
+
+    @classmethod
+    def from_socket(cls, sock, timeout=1):
+        """包装已连接的socket（例如服务端accept得到的连接）"""
+        sock.settimeout(timeout)
+        self = cls.__new__(cls)
+        self.sock = sock
+        self.address = None
+        self._rx = bytearray()
+        return self
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    def is_open(self):
+        return self.sock is not None
+
+    def write(self, data):
+        self._check_open()
+        try:
+            self.sock.sendall(data)
+        except OSError as e:
+            raise serial.SerialException(f"socket write failed: {e}")
+        return len(data)
+
+    def _recv_ready(self):
+        # 非阻塞取出socket中已到达的数据
+        while True:
+            ready, _, _ = select.select([self.sock], [], [], 0)
+            if not ready:
+                return
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                self.close()
+                raise serial.SerialException("connection closed by peer")
+            self._rx += chunk
+
+    def read(self, size=1):
+        self._check_open()
+        if not self._rx:
+            try:
+                chunk = self.sock.recv(max(size, 4096))
+            except socket.timeout:
+                return b''
+            if not chunk:
+                self.close()
+                raise serial.SerialException("connection closed by peer")
+            self._rx += chunk
+        data = bytes(self._rx[:size])
+        del self._rx[:size]
+        return data
+
+    def in_waiting(self):
+        if self.sock is None:
+            return 0
+        self._recv_ready()
+        return len(self._rx)
+
+    def fileno(self):
+        self._check_open()
+        return self.sock.fileno()
+
+class _LoopbackChannel:
+    """单向内存通道，数据在发送时刻+传输时间+延时之后才可读"""
+    def __init__(self, baudrate=None, latency=0.0, bits=10):
+        self.byte_time = bits / baudrate if baudrate else 0.0
+        self.latency = latency
+        self.cond = threading.Condition()
+        self.chunks = deque()  # (ready_time, bytes)
+        self.busy_until = 0.0
+        self.closed = False
+
+    def put(self, data):
+        now = time.monotonic()
+        with self.cond:
+            start = max(now, self.busy_until)
+            self.busy_until = start + len(data) * self.byte_time
+            self.chunks.append((self.busy_until + self.latency, bytes(data)))
+            self.cond.notify_all()
+
+    def _ready_bytes(self, now):
+        n = 0
+        for ready, chunk in self.chunks:
+            if ready > now:
+                break
+            n += len(chunk)
+        return n
+
+    def available(self):
+        with self.cond:
+            return self._ready_bytes(time.monotonic())
+
+    def get(self, size, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        out = bytearray()
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                while self.chunks and self.chunks[0][0] <= now and len(out) < size:
+                    ready, chunk = self.chunks.popleft()
+                    take = size - len(out)
+                    out += chunk[:take]
+                    if len(chunk) > take:
+                        self.chunks.appendleft((ready, chunk[take:]))
+                if out or self.closed:
+                    return bytes(out)
+                # 等待下一块数据到达或超时
+                wait = None if deadline is None else deadline - now
+                if wait is not None and wait <= 0:
+                    return b''
+                if self.chunks:
+                    next_ready = self.chunks[0][0] - now
+                    wait = next_ready if wait is None else min(wait, next_ready)
+                self.cond.wait(wait)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def reopen(self):
+        with self.cond:
+            self.closed = False
+
+class LoopbackTransport(Transport):
+    """
+    内存回环传输，可模拟波特率（按字节传输时间）和固定链路延时
+    单独使用时为回环（写入的数据自己读回），用 create_loopback_pair 创建互联的两端
+    """
+    def __init__(self, tx_channel=None, rx_channel=None, baudrate=None, latency=0.0, timeout=1):
+        if tx_channel is None:
+            tx_channel = rx_channel = _LoopbackChannel(baudrate, latency)
+        self.tx = tx_channel
+        self.rx = rx_channel
+        self.timeout = timeout
+        self._open = True
+
+    def close(self):
+        """关闭两个方向：对端的读立即返回，本端阻塞中的读也会返回"""
+        self._open = False
+        self.tx.close()
+        if self.rx is not self.tx:
+            self.rx.close()
+
+    def reopen(self, timeout=None):
+        """重新打开两个方向的通道（同一对回环可以反复断开/连接）"""
+        self.tx.reopen()
+        self.rx.reopen()
+        if timeout is not None:
+            self.timeout = timeout
+        self._open = True
+
+    def is_open(self):
+        return self._open
+
+    def write(self, data):
+        self._check_open()
+        self.tx.put(data)
+        return len(data)
+
+    def read(self, size=1):
+        self._check_open()
+        return self.rx.get(size, self.timeout)
+
+    def in_waiting(self):
+        return self.rx.available() if self._open else 0
+
+_loopback_registry = {}
+_loopback_lock = threading.Lock()
+
+def create_loopback_pair(name=None, baudrate=None, latency=0.0, bytesize=8, parity='N', stopbits=1):
+    """
+    创建互联的一对内存传输，返回 (host_end, device_end)
+    指定name时，host端可以通过 open_transport('loop://<name>') 取得
+    """
+    bits = bits_per_frame(bytesize, parity, stopbits)
+    a_to_b = _LoopbackChannel(baudrate, latency, bits)
+    b_to_a = _LoopbackChannel(baudrate, latency, bits)
+    host = LoopbackTransport(a_to_b, b_to_a)
+    device = LoopbackTransport(b_to_a, a_to_b)
+    if name:
+        with _loopback_lock:
+            _loopback_registry[name] = host
+    return host, device
+
+def is_transport_url(port):
+    return isinstance(port, str) and '://' in port
+
+def open_transport(url, baudrate=115200, bytesize=8, stopbits=1, parity='N', timeout=1):
+    """根据URL（或普通串口名）打开对应的传输实现"""
+    if not is_transport_url(url):
+        return SerialTransport(url, baudrate, bytesize, stopbits, parity, timeout)
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    if scheme == 'serial':
+        return SerialTransport(parts.netloc + parts.path, baudrate, bytesize, stopbits, parity, timeout)
+    if scheme == 'pty':
+        return PtyTransport(parts.netloc + parts.path, timeout=timeout)
+    if scheme == 'tcp':
+        if not parts.hostname or not parts.port:
+            raise serial.SerialException(f"invalid tcp url: {url}")
+        return SocketTransport((parts.hostname, parts.port), socket.AF_INET, timeout=timeout)
+    if scheme == 'unix':
+        if not hasattr(socket, 'AF_UNIX'):
+            raise serial.SerialException("unix sockets are not supported on this platform")
+        return SocketTransport(parts.netloc + parts.path, socket.AF_UNIX, timeout=timeout)
+    if scheme == 'loop':
+        name = parts.netloc
+        if name:
+            with _loopback_lock:
+                host = _loopback_registry.get(name)
+            if host is None:
+                raise serial.SerialException(f"no loopback device named '{name}'")
+            host.reopen(timeout)
+            return host
+        baud = query.get('baud')
+        return LoopbackTransport(baudrate=int(baud) if baud else None,
+                                 latency=float(query.get('latency', 0.0)), timeout=timeout)
+    raise serial.SerialException(f"unsupported transport url: {url}")
@@ -1,17 +1,13 @@
 #!/usr/bin/env python3
 import tkinter as tk
 from tkinter import ttk
-import serial
 import time
-import json
 import tkinter.messagebox as messagebox
 import sys
 import traceback
-import serial.tools.list_ports
 import threading
-from tkinter import filedialog
-import datetime
 import os
+from collections import deque
 from protocol import (
     PU_FRAME_HEAD, PU_FUN_READ, PU_FUN_WRITE, PU_FUN_UPGRADE, PU_FUN_UPGRADE_CRC,
     PU_FUN_MCU_RESET, PU_FUN_CONNECT, PU_FUN_MCU_WRITE_ALARM, PU_FUN_MCU_WRITE_CONFIG, PU_FUN_MCU_WRITE_DATA,
@@ -24,10 +20,18 @@ from protocol import (
     UPGRADE_PACKET_SIZE, validate_value_for_type
 )
 from uart_interface import UARTInterface
-from log_manager import LogManager
+from log_manager import LogManager, LogRecord, format_record
 from label_manager import LabelManager
 from item_manager import ItemManager
 from uart_service import UARTService
+from tracing import UI_APPLIED
+from link_budget import format_report as format_link_report
+from metrics import MetricsRegistry
+from register_table import RegisterTable
+from register_search import RegisterSearchIndex, SEARCH_LIMIT
+from ui_bus import UIUpdateBus, RESULT, STATUS
+from startup_profiler import StartupProfiler
+from port_watcher import PortWatcher
 import utils
 
 
@@ -44,11 +48,16 @@ def get_resource_path(filename):
     return os.path.join(base_path, filename)
 
 RECYCLE_TIME = 0.5
+LOG_UI_INTERVAL_MS = 50     # 日志区刷新周期（ms），每个周期一次性插入队列中的所有日志
+LOG_MAX_LINES = 5000        # 日志区最多保留的行数，超出后从顶部删除
 class UARTTestGUI:
-    def __init__(self, root):
+    def __init__(self, root, profiler=None, log_max_lines=LOG_MAX_LINES):
+        """log_max_lines: 日志区（和待显示队列）最多保留的行数"""
         try:
             #根窗口
             self.root = root
+            # 启动各阶段耗时，窗口显示、寄存器表填充后输出到日志
+            self.profiler = profiler or StartupProfiler()
             
             # 设置窗口图标
             try:
@@ -70,23 +79,17 @@ class UARTTestGUI:
             self.uart = UARTInterface()
             
             # Dictionary to store variables and frames 初始化变量存储结构
+            # 各寄存器的显示值（register_table.CellVar），行控件只为可见行创建
             self.result_vars = {}
             self.input_vars = {}
             self.write_status_vars = {}
-            self.module_frames = {}
-            self.submodule_frames = {}
             self.module_states = {}
             self.submodule_states = {}
             
-            # Store references for language updates 
-            self.module_labels = {}                 #模块标签
-            self.submodule_labels = {}              #子模块标签
-            self.module_read_buttons = {}           #模块读取按钮
-            self.module_write_buttons = {}          #模块写入按钮
-            self.submodule_read_buttons = {}
-            self.submodule_write_buttons = {}
-            self.item_read_buttons = {}
-            self.item_write_buttons = {}
+            # 链路指标，界面的帧时间和切换语言的耗时也记录在这里
+            self.metrics = MetricsRegistry()
+            self.language_switch_times = self.metrics.histogram(
+                'gui_language_switch_us', "Time to switch the interface language in microseconds")
             
             # 管理类实例化 - 使用统一的资源路径
             self.log_manager = LogManager()
@@ -99,9 +102,18 @@ class UARTTestGUI:
                 json_file=json_file_path,
                 language=self.label_manager.current_language
             )
+            self.profiler.mark('register_map')
             
-            # 日志回调绑定
-            self.log_manager.set_log_callback(self._log_callback)
+            # 日志回调绑定：回调只入队，由 _drain_log_queue 按固定周期批量显示
+            # 队列满时挤掉最旧的日志并计数；清空日志不经过队列，不会被挤掉
+            self.log_max_lines = max(1, int(log_max_lines))
+            self.log_queue = deque(maxlen=self.log_max_lines)
+            self.log_queue_lock = threading.Lock()
+            self.log_clear_pending = False
+            self.log_dropped = 0            # 尚未在日志区提示的丢弃行数
+            self.log_dropped_total = self.metrics.counter(
+                'gui_log_dropped_total', "Log lines dropped because the log view queue was full")
+            self.log_manager.set_log_callback(self._log_callback, records=True)
             
             # Load labels
             self.current_language = self.label_manager.current_language
@@ -112,19 +124,16 @@ class UARTTestGUI:
             
             # 创建主界面
             self.create_widgets()
+            self.profiler.mark('widgets')
             
-            # 加载配置文件
-            try:
-                self.create_items()
-            except Exception as e:
-                messagebox.showerror("Error", f"加载配置文件失败：\n{str(e)}")
-                raise
+            # 工作线程的界面更新经由总线，在Tk线程中每帧合并应用
+            self.ui_bus = UIUpdateBus(self.root, self._apply_value, metrics=self.metrics, log_func=self.add_to_log)
+            self.ui_bus.start()
             
-            # 在 __init__ 或 create_items 后
-            self.addr_map = {}
-            for item in self.items:
-                addr = int(item['index'], 16)
-                self.addr_map[addr] = item
+            # 寄存器表在窗口显示后才填充（_finish_startup），这里只取已加载的寄存器列表
+            self.items = self.item_manager.items
+            self.organized_items = self.item_manager.get_organized_items()
+            self.addr_map = self.item_manager.addr_map
             # 初始化串口服务
             self.uart_service = UARTService(
                 self.uart,
@@ -132,9 +141,14 @@ class UARTTestGUI:
                 gui_update_callback=self.update_item_display,
                 addr_map=self.addr_map,
                 f0_response_getter=lambda: self.f0_response_var.get(),  # 新增
-                response_40_50_getter=lambda: self.response_40_50_var.get()  # 新增
+                response_40_50_getter=lambda: self.response_40_50_var.get(),  # 新增
+                metrics=self.metrics
             )
             self.loop_running = False  # <--- 在这里加上
+            self.port_watcher = None
+            self._ports_seen = False
+            self.profiler.mark('service')
+            self.root.after_idle(self._finish_startup)
                 
         except Exception as e:
             error_msg = str(e)
@@ -145,6 +159,49 @@ class UARTTestGUI:
                 f.write(error_details)
             raise
 
+    def _finish_startup(self):
+        """主循环开始、窗口显示之后再填充寄存器表和扫描串口"""
+        self.profiler.mark('event_loop')
+        try:
+            self.create_items()
+        except Exception as e:
+            with open('error_log.txt', 'a', encoding='utf-8') as f:
+                f.write(f"加载配置文件失败: {e}\n")
+                f.write(traceback.format_exc())
+            messagebox.showerror("Error", f"加载配置文件失败：\n{str(e)}")
+            # 没有寄存器表时不再启动文件监视和串口扫描
+            self.add_to_log(f"Startup stopped: failed to load the register map: {e}")
+            if self.profiler.exit_when_done:
+                self.root.after(0, self.root.destroy)
+            return
+        self.profiler.mark('rows')
+        # 监视 uart_command_set.json，改动后在后台重新加载，只应用差异
+        if self.item_manager.register_map is not None:
+            from register_map import RegisterMapWatcher
+            self.register_map_watcher = RegisterMapWatcher(
+                self.item_manager.json_file, self.item_manager.register_map,
+                lambda register_map, diff: self.ui_bus.call(self._on_register_map_reloaded, register_map, diff),
+                log_func=self.add_to_log)
+            self.register_map_watcher.start()
+        # 串口枚举和热插拔检测在后台线程中进行，只把变化通过总线推给界面
+        self.port_watcher = PortWatcher(log_func=self.add_to_log)
+        self.port_watcher.subscribe(lambda added, removed, ports: self.ui_bus.call(self._on_ports_changed, added, removed, ports))
+        self.port_watcher.start()
+        self.profiler.mark('ports')
+        # 寄存器表的第一次排布也在空闲时执行
+        self.root.after_idle(self._report_startup)
+
+    def _report_startup(self):
+        self.profiler.mark('first_render')
+        register_map = self.item_manager.register_map
+        source = f" (register map from {register_map.source}, {register_map.load_ms:.1f} ms)" if register_map else ''
+        report = self.profiler.report() + source
+        self.add_to_log(report)
+        if self.profiler.exit_when_done:
+            # --profile-startup：窗口随即关闭，结果同时输出到终端
+            print(report)
+            self.root.after(0, self.root.destroy)
+
     # 移除原来的 get_resource_path 方法，使用 utils 中的统一函数
 
     # 标签相关
@@ -157,10 +214,33 @@ class UARTTestGUI:
         return self.label_manager.get_label(key)
 
     def toggle_language(self):
+        start = time.perf_counter()
+        old_language = self.current_language
         self.current_language = "CN" if self.current_language == "EN" else "EN"
         self.label_manager.set_language(self.current_language)
+        # 两种语言的层级在加载时已分好组，这里只换引用，不重新读JSON
         self.item_manager.set_language(self.current_language)
+        self.organized_items = self.item_manager.get_organized_items()
+        self._translate_group_states(old_language)
         self.update_interface_language()
+        # 寄存器表的重新排布在 after_idle 中进行，排在它之后记录，耗时包括排布和重绘
+        self.root.after_idle(self._record_language_switch, start)
+
+    def _record_language_switch(self, start):
+        self.root.update_idletasks()
+        self.language_switch_times.record(int((time.perf_counter() - start) * 1e6))
+
+    def _translate_group_states(self, old_language):
+        """折叠状态按模块/子模块名保存，换语言后按组内第一个寄存器找到原来的名称"""
+        module_states = {}
+        submodule_states = {}
+        for module, submodules in self.organized_items.items():
+            for submodule, items in submodules.items():
+                old_module, old_submodule = self.item_manager.group_names(items[0], old_language)
+                module_states[module] = self.module_states.get(old_module, True)
+                submodule_states[f"{module}_{submodule}"] = self.submodule_states.get(f"{old_module}_{old_submodule}", True)
+        self.module_states = module_states
+        self.submodule_states = submodule_states
 
     def update_interface_language(self):
         """Update all interface elements with new language"""
@@ -184,6 +264,9 @@ class UARTTestGUI:
             self.status_label.configure(text=self.get_label("disconnected"))
             
         self.refresh_btn.configure(text=self.get_label("refresh"))
+        self.find_mcu_btn.configure(text=self.get_label("find_mcu"))
+        self.search_label.configure(text=self.get_label("search"))
+        self.search_filter_checkbox.configure(text=self.get_label("search_filter"))
         self.read_all_btn.configure(text=self.get_label("read_all"))
         self.write_all_btn.configure(text=self.get_label("write_all"))
         self.upgrade_btn.configure(text=self.get_label("upgrade_mcu")) # Update upgrade button text
@@ -194,49 +277,31 @@ class UARTTestGUI:
         self.log_frame.configure(text=self.get_label("communication_log"))
         self.clear_log_btn.configure(text=self.get_label("clear_log"))
         self.save_log_checkbox.configure(text=self.get_label("save_log"))
-        # Clear and recreate all items to update their language
-        self.recreate_items()
-
-    def recreate_items(self):
-        """Recreate all items with current language"""
-        # Save the current scroll position
-        current_scroll = self.canvas.yview()
-        
-        # Clear existing items
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
-        #save item tracking dictionaries  
-        old_result_values ={k:v.get() for k,v in self.result_vars.items()}
-        old_input_values ={k:v.get() for k,v in self.input_vars.items()if v is not None}
-        old_write_status_values ={k:v.get() for k,v in self.write_status_vars.items()if v is not None}
-        # Clear item tracking dictionaries
-        self.organized_items = {}
-        self.module_states = {}
-        self.submodule_states = {}
-        self.item_read_buttons = {}
-        self.item_write_buttons = {}
-        self.result_vars = {}
-        self.input_vars = {}
-        self.write_status_vars = {}
-        
-        # Recreate items
-        self.create_items(old_result_values, old_input_values, old_write_status_values)
-        
-        # Restore scroll position
-        self.canvas.yview_moveto(current_scroll[0])
+        self.log_follow_checkbox.configure(text=self.get_label("log_follow"))
+        self.capture_checkbox.configure(text=self.get_label("capture_traffic"))
+        self.log_viewer_btn.configure(text=self.get_label("log_viewer"))
+        self.metrics_btn.configure(text=self.get_label("link_metrics"))
+        self.trace_checkbox.configure(text=self.get_label("trace_requests"))
+        self.dump_trace_btn.configure(text=self.get_label("dump_trace"))
+        # 寄存器表只更新可见行的文字，不重建控件
+        self.register_table.set_language(self.current_language, self.organized_items,
+                                         self.module_states, self.submodule_states)
 
     # 参数项相关
     def create_items(self, old_result_values=None, old_input_values=None, old_write_status_values=None):
-        self.item_manager.load_items()
         self.items = self.item_manager.items
         self.organized_items = self.item_manager.get_organized_items()
+        self._init_group_states()
 
-        # Clear existing frames
-        self.module_frames.clear()
-        self.submodule_frames.clear()
+        # 表格只为可见行创建控件，这里只建立行模型和每个寄存器的值
+        self.register_table.language = self.current_language
+        self.result_vars, self.input_vars, self.write_status_vars = self.register_table.set_items(
+            self.organized_items, self.module_states, self.submodule_states,
+            (old_result_values or {}, old_input_values or {}, old_write_status_values or {})
+        )
 
-        # Initialize module and submodule states for new modules/submodules
+    def _init_group_states(self):
+        """Initialize module and submodule states for new modules/submodules"""
         for module in self.organized_items:
             if module not in self.module_states:
                 self.module_states[module] = True
@@ -246,159 +311,55 @@ class UARTTestGUI:
                 if state_key not in self.submodule_states:
                     self.submodule_states[state_key] = True
 
-        # Create frames for each module
-        current_row = 0
-        for module in self.organized_items:
-            # Create module header
-            module_frame = ttk.Frame(self.scrollable_frame)
-            module_frame.grid(row=current_row, column=0, sticky='ew', pady=2)
-            module_frame.columnconfigure(0, weight=1)
-            current_row += 1
-            
-            # Create module header with expand/collapse button
-            self.create_module_header(module, module_frame)
-            
-            # Create content frame for this module
-            content_frame = ttk.Frame(self.scrollable_frame)
-            content_frame.grid(row=current_row, column=0, sticky='ew')
-            content_frame.columnconfigure(0, weight=1)
-            current_row += 1
-            self.module_frames[module] = content_frame
-            
-            # Create submodules
-            submodule_row = 0
-            for submodule in self.organized_items[module]:
-                # Create submodule header
-                submodule_frame = ttk.Frame(content_frame)
-                submodule_frame.grid(row=submodule_row, column=0, sticky='ew', pady=2)
-                submodule_frame.columnconfigure(0, weight=1)
-                submodule_row += 1
-                
-                # Create submodule header with expand/collapse button
-                self.create_submodule_header(module, submodule, submodule_frame)
-                
-                # Create items for this submodule
-                items_frame = ttk.Frame(content_frame)
-                items_frame.grid(row=submodule_row, column=0, sticky='ew')
-                items_frame.columnconfigure(0, weight=1)
-                submodule_row += 1
-                self.submodule_frames[(module, submodule)] = items_frame
-                
-                # Create individual item frames
-                item_row = 0
-                for item in self.organized_items[module][submodule]:
-                    item_frame = self.create_item_frame(items_frame, item, old_result_values, old_input_values, old_write_status_values)
-                    if item_frame:
-                        item_frame.grid(row=item_row, column=0, sticky='ew', pady=2)
-                        item_row += 1
-
-            # Apply current expansion state
-            if not self.module_states.get(module, True):
-                content_frame.grid_remove()
-
-            # Apply submodule expansion states
-            for submodule in self.organized_items[module]:
-                state_key = f"{module}_{submodule}"
-                if not self.submodule_states.get(state_key, True):
-                    if (module, submodule) in self.submodule_frames:
-                        self.submodule_frames[(module, submodule)].grid_remove()
-
-    def create_item_frame(self, parent, item, old_result_values=None, old_input_values=None, old_write_status_values=None):
-        """Create a frame for displaying and controlling a single item"""
-        try:
-            # Create a frame for this item
-            item_frame = ttk.Frame(parent)
-            item_frame.grid(row=0, column=0, sticky='ew', pady=2)           
-
-            # Configure column weights for better layout
-            item_frame.columnconfigure(0, weight=0)  # Label column - fixed
-            item_frame.columnconfigure(1, weight=0)  # Read button - fixed
-            item_frame.columnconfigure(2, weight=1)  # Result entry - expandable
-            item_frame.columnconfigure(3, weight=0)  # Write button - fixed
-            item_frame.columnconfigure(4, weight=1)  # Write entry - expandable
-            item_frame.columnconfigure(5, weight=1)  # Status entry - expandable
-
-            # Create item label with tooltip
-            display_text = item.get('item' if self.current_language == 'EN' else '项目', '')
-            item_label = ttk.Label(item_frame, text=display_text, width=47, anchor='w')
-            item_label.grid(row=0, column=0, padx=(40, 5), sticky='w')
-            item['label_widget'] = item_label
-            
-            # Create tooltip for the label添加提示框
-            data_type = item.get('type', 'int32_t')
-            try:
-                from protocol import get_type_info
-                type_info = get_type_info(data_type)
-                if data_type == 'float':
-                    range_info = f"Range: ±{type_info['max']:.1e}"
-                else:
-                    range_info = f"Range: {type_info['min']} to {type_info['max']}"
-            except:
-                range_info = "Range: See documentation"
-            
-            self.create_tooltip(item_label, 
-                              f"Address: {item['index']}\n"
-                              f"Type: {data_type}\n"
-                              f"{range_info}\n"
-                              f"Permission: {item.get('permission', 'R')}")
-
-            # Create read button and result display
-            read_btn = ttk.Button(item_frame, text=self.get_label("read"), width=6,
-                                command=lambda: self.read_item(item))
-            read_btn.grid(row=0, column=1, padx=2)
-            #key = item.get('item' if self.current_language == 'EN' else '项目', '')
-            key = item.get('index', '')
-            self.item_read_buttons[key] = read_btn
-
-            result_var = tk.StringVar(value=old_result_values.get(key, '')if old_result_values else '')
-            result_entry = ttk.Entry(item_frame, textvariable=result_var,
-                                   state='readonly', width=15)
-            result_entry.grid(row=0, column=2, padx=2, sticky='ew')
-            self.result_vars[key] = result_var
-
-            # Create write button and input field if item is writable
-            permission = item.get("permission", "R")
-
-            # 只读项不显示写按钮和输入框
-            if "W" in permission:
-                write_btn = ttk.Button(item_frame, text=self.get_label("write"), width=6,
-                                      command=lambda: self.write_item(item))
-                write_btn.grid(row=0, column=3, padx=2)
-                self.item_write_buttons[key] = write_btn
-
-                #only use write data when there is no old value 
-                if old_input_values and key in old_input_values:
-                    write_var = tk.StringVar(value=old_input_values[key])
-                elif 'write data' in item:
-                    write_var = tk.StringVar(value=str(item['write data']))
-                else:
-                    write_var = tk.StringVar(value='')
-                write_entry = ttk.Entry(item_frame, textvariable=write_var, width=15)
-                write_entry.grid(row=0, column=4, padx=2, sticky='ew')
-                self.input_vars[key] = write_var
-
-                # Create write status display
-                write_status_var = tk.StringVar(value=old_write_status_values.get(key, '')if old_write_status_values else '')
-                write_status_entry = ttk.Entry(item_frame, textvariable=write_status_var,
-                                              state='readonly', width=15)
-                write_status_entry.grid(row=0, column=5, padx=2, sticky='ew')
-                self.write_status_vars[key] = write_status_var
+    def _on_register_map_reloaded(self, register_map, diff):
+        """Tk线程中应用热加载的差异：地址表、帧缓存、寄存器表的行，未变化的寄存器保留显示的值"""
+        self.item_manager.apply_register_map(register_map, diff)
+        self.search_index = None
+        self.items = self.item_manager.items
+        self.organized_items = self.item_manager.get_organized_items()
+        self._init_group_states()
+        self.result_vars, self.input_vars, self.write_status_vars = self.register_table.apply_diff(
+            self.organized_items, self.module_states, self.submodule_states, diff)
+        self.add_to_log(f"Register map reloaded: {len(diff.added)} added, {len(diff.removed)} removed, "
+                        f"{len(diff.changed)} changed")
+
+    # 寄存器搜索
+    def on_search(self):
+        """搜索框内容或过滤选项变化时调用"""
+        query = self.search_var.get()
+        if not query.strip():
+            self.search_results = []
+            self.search_count_label.configure(text="")
+            self.register_table.highlight_key = None
+            if self.register_table.filter_keys is not None:
+                self.register_table.set_filter(None)
             else:
-                # 没有写权限时，写相关控件不显示
-                self.item_write_buttons[key] = None
-                self.input_vars[key] = None
-                self.write_status_vars[key] = None
-
-            return item_frame
-            
-        except Exception as e:
-            error_msg = str(e)
-            error_details = traceback.format_exc()
-            with open('error_log.txt', 'a', encoding='utf-8') as f:
-                f.write(f"创建项目框架错误: {error_msg}\n")
-                f.write("详细信息:\n")
-                f.write(error_details)
-            raise
+                self.register_table.refresh()
+            return
+        start = time.perf_counter_ns()
+        if self.search_index is None:
+            # 索引覆盖两种语言，切换语言不需要重建；寄存器表重新加载后才重建
+            self.search_index = RegisterSearchIndex(self.item_manager.items)
+        self.search_results = self.search_index.search(query, SEARCH_LIMIT)
+        self.search_times.record((time.perf_counter_ns() - start) // 1000)
+        count = len(self.search_results)
+        self.search_count_label.configure(text=f"{count}+" if count >= SEARCH_LIMIT else str(count))
+        if self.search_filter_var.get():
+            self.register_table.set_filter({item.get('index', '') for item in self.search_results})
+        elif self.register_table.filter_keys is not None:
+            self.register_table.set_filter(None)
+        self.search_pos = 0
+        if self.search_results:
+            self._show_search_result()
+
+    def search_next(self):
+        if self.search_results:
+            self.search_pos = (self.search_pos + 1) % len(self.search_results)
+            self._show_search_result()
+
+    def _show_search_result(self):
+        item = self.search_results[self.search_pos]
+        self.register_table.show_item(item.get('index', ''), self.item_manager.group_names(item, self.current_language))
 
     # 工具函数替换
     def create_tooltip(self, widget, text):
@@ -407,7 +368,7 @@ class UARTTestGUI:
     def format_bytes(self, data):
         return utils.format_bytes(data)
 
-    def read_item(self, item):
+    def read_item(self, item, run=None):
         """Read value for a single item"""
         if not self.check_connection():
             return
@@ -415,26 +376,33 @@ class UARTTestGUI:
             messagebox.showwarning("Warning", "MCU not connected. Please wait for handshake.")
             return
         addr_hex = item['index']
+        # 打开追踪时从这里（GUI线程）开始记录请求
+        tracer = self.uart_service.tracer
+        trace_id = tracer.begin('read', int(addr_hex, 16)) if tracer is not None else None
         def on_response(result, error=None):
             if error:
                 if error == 'timeout':
-                    self.result_vars[item['index']].set("timeout")
+                    self.ui_bus.post(item['index'], RESULT, "timeout")
                     self.add_to_log(f"read {addr_hex} timeout")
                 else:
-                    self.result_vars[item['index']].set("err")
+                    self.ui_bus.post(item['index'], RESULT, "err")
                     self.add_to_log(f"read {addr_hex} error: {error}")
             else:
                 if result['status'] == 'success':
-                    self.result_vars[item['index']].set(str(result['data']))
+                    self.ui_bus.post(item['index'], RESULT, str(result['data']))
                 elif result['status'] == 'error':
-                    self.result_vars[item['index']].set(f"{result['status_code']:02X}")
+                    self.ui_bus.post(item['index'], RESULT, f"{result['status_code']:02X}")
                     self.add_to_log(f"read {addr_hex} status_code: {result['status_code']:02X}")
                 else:
-                    self.result_vars[item['index']].set("err")
+                    self.ui_bus.post(item['index'], RESULT, "err")
                     self.add_to_log(f"read {addr_hex} unknown result: {result}")
-        threading.Thread(target=lambda: self.uart_service.read_item(item, on_response), daemon=True).start()
+            if trace_id is not None:
+                self.ui_bus.call(tracer.mark, trace_id, UI_APPLIED)
+            self._bulk_run_step(run, -1)
+        self._bulk_run_step(run, 1)
+        threading.Thread(target=lambda: self.uart_service.read_item(item, on_response, trace_id=trace_id), daemon=True).start()
 
-    def write_item(self, item):
+    def write_item(self, item, run=None):
         """Write value for a single item with type validation"""
         if not self.check_connection():
             return
@@ -462,25 +430,31 @@ class UARTTestGUI:
             self.add_to_log(f"[Write] {addr_hex} invalid '{value_str}' for {data_type} (decimal only for ints)")
             return       
         value = check_value;
+        tracer = self.uart_service.tracer
+        trace_id = tracer.begin('write', int(addr_hex, 16)) if tracer is not None else None
         def on_response(result, error=None):
             if error:
                 if error == 'timeout':
-                    self.write_status_vars[item['index']].set("timeout")
+                    self.ui_bus.post(item['index'], STATUS, "timeout")
                     self.add_to_log(f"write {addr_hex} timeout")
                 else:
-                    self.write_status_vars[item['index']].set("err")
+                    self.ui_bus.post(item['index'], STATUS, "err")
                     self.add_to_log(f"write {addr_hex} error: {error}")
             else:
                 if result['status'] == 'success':
-                    self.write_status_vars[item['index']].set("Write OK")
+                    self.ui_bus.post(item['index'], STATUS, "Write OK")
                 elif result['status'] == 'error':
-                    self.write_status_vars[item['index']].set(f"{result['status_code']:02X}")
+                    self.ui_bus.post(item['index'], STATUS, f"{result['status_code']:02X}")
                     self.add_to_log(f"write {addr_hex} status_code: {result['status_code']:02X}")
                 else:
-                    self.write_status_vars[item['index']].set("err")
+                    self.ui_bus.post(item['index'], STATUS, "err")
                     self.add_to_log(f"write {addr_hex} unknown result: {result}")
+            if trace_id is not None:
+                self.ui_bus.call(tracer.mark, trace_id, UI_APPLIED)
+            self._bulk_run_step(run, -1)
         
-        threading.Thread(target=lambda: self.uart_service.write_item(item, value, on_response), daemon=True).start()
+        self._bulk_run_step(run, 1)
+        threading.Thread(target=lambda: self.uart_service.write_item(item, value, on_response, trace_id=trace_id), daemon=True).start()
 
     def create_widgets(self):
         try:
@@ -500,6 +474,28 @@ class UARTTestGUI:
                                          command=self.toggle_language, width=8)
             self.language_btn.grid(row=0, column=0, sticky='ne', pady=(0, 5))
 
+            # 寄存器搜索：输入时即时跳转到第一个匹配项（回车跳到下一个），勾选过滤时只显示匹配的寄存器
+            search_frame = ttk.Frame(self.main_frame)
+            search_frame.grid(row=0, column=0, sticky='nw', pady=(0, 5))
+            self.search_label = ttk.Label(search_frame, text=self.get_label("search"))
+            self.search_label.pack(side=tk.LEFT, padx=(0, 5))
+            self.search_var = tk.StringVar()
+            self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
+            self.search_entry.pack(side=tk.LEFT)
+            self.search_entry.bind('<Return>', lambda e: self.search_next())
+            self.create_tooltip(self.search_entry, "Name (EN/CN), address or module")
+            self.search_filter_var = tk.BooleanVar(value=False)
+            self.search_filter_checkbox = ttk.Checkbutton(search_frame, text=self.get_label("search_filter"),
+                                                          variable=self.search_filter_var, command=self.on_search)
+            self.search_filter_checkbox.pack(side=tk.LEFT, padx=5)
+            self.search_count_label = ttk.Label(search_frame, text="")
+            self.search_count_label.pack(side=tk.LEFT)
+            self.search_index = None
+            self.search_results = []
+            self.search_pos = 0
+            self.search_times = self.metrics.histogram('gui_search_us', "Register search time in microseconds")
+            self.search_var.trace_add('write', lambda *args: self.on_search())
+
             # 串口配置框
             self.serial_frame = ttk.LabelFrame(self.main_frame, text=self.get_label("serial_config"), padding="5")
             self.serial_frame.grid(row=1, column=0, sticky='ew', pady=(0, 5))
@@ -513,6 +509,9 @@ class UARTTestGUI:
             self.port_var = tk.StringVar(value=self.default_port)
             self.port_combo = ttk.Combobox(self.serial_frame, textvariable=self.port_var)
             self.port_combo.grid(row=0, column=1, padx=5, pady=2, sticky='ew')
+            self.create_tooltip(self.port_combo, "COMx, /dev/ttyUSBx\n"
+                                "tcp://host:port, unix:///path\n"
+                                "pty:///dev/pts/N, loop://name")
             
             self.baudrate_label = ttk.Label(self.serial_frame, text=self.get_label("baudrate"))
             self.baudrate_label.grid(row=0, column=2, padx=5, pady=2)
@@ -561,6 +560,11 @@ class UARTTestGUI:
                                         command=self.refresh_ports)
             self.refresh_btn.grid(row=0, column=6, padx=5, pady=2, sticky='ew')
 
+            # 并行在所有串口上尝试E0握手，找到连接了MCU的串口
+            self.find_mcu_btn = ttk.Button(self.serial_frame, text=self.get_label("find_mcu"),
+                                        command=self.find_mcu)
+            self.find_mcu_btn.grid(row=1, column=6, padx=5, pady=2, sticky='ew')
+
             # Create global Read All and Write All buttons frame
             global_btn_frame = ttk.Frame(self.main_frame)
             global_btn_frame.grid(row=2, column=0, sticky='e', pady=(0, 5))
@@ -596,42 +600,24 @@ class UARTTestGUI:
             self.response_40_50_checkbox.pack(side=tk.LEFT, padx=2)
 
 
-            # Create canvas and scrollbar for items
-            canvas_frame = ttk.Frame(self.main_frame)
-            canvas_frame.grid(row=3, column=0, columnspan=2, sticky='nsew')
-            canvas_frame.grid_columnconfigure(0, weight=1)
-            canvas_frame.grid_rowconfigure(0, weight=1)
-
-            self.canvas = tk.Canvas(canvas_frame)
-            scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=self.canvas.yview)
-            self.scrollable_frame = ttk.Frame(self.canvas)
-
-            self.scrollable_frame.bind(
-                "<Configure>",
-                lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            # 寄存器表：虚拟化，只为可见行创建控件（见 register_table.py）
+            self.register_table = RegisterTable(
+                self.main_frame,
+                get_label=self.get_label,
+                commands={
+                    'read_item': self.read_item, 'write_item': self.write_item,
+                    'read_module': self.read_module, 'write_module': self.write_module,
+                    'toggle_module': self.toggle_module,
+                    'read_submodule': self.read_submodule, 'write_submodule': self.write_submodule,
+                    'toggle_submodule': self.toggle_submodule,
+                },
+                language=self.current_language,
+                frame_times=self.metrics.histogram('gui_table_frame_us', "Register table render time in microseconds")
             )
-
-            # 创建画布窗口
-            self.canvas_window = self.canvas.create_window(
-                (0, 0),
-                window=self.scrollable_frame,
-                anchor="nw",
-                width=self.canvas.winfo_width()  # 设置初始宽度
-            )
-
-            # 绑定画布大小变化事件 scrollable_frame
-            self.canvas.bind('<Configure>', self.on_canvas_configure)
-            
-            # 配置画布和滚动条
-            self.canvas.configure(yscrollcommand=scrollbar.set)
-            self.canvas.grid(row=0, column=0, sticky='nsew')
-            scrollbar.grid(row=0, column=1, sticky='ns')
-
-            # 配置画布框架
-            self.scrollable_frame.columnconfigure(0, weight=1)
+            self.register_table.grid(row=3, column=0, columnspan=2, sticky='nsew')
 
             # 添加鼠标滚轮支持
-            self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+            self.root.bind_all("<MouseWheel>", self._on_mousewheel)
 
 
             # Update communication log frame
@@ -665,10 +651,42 @@ class UARTTestGUI:
             )
             self.save_log_checkbox.grid(row=2, column=0, sticky='w', padx=5, pady=(0, 5))
 
+            # Follow checkbox：取消勾选时暂停刷新日志区，方便查看（新日志暂存在队列中）
+            self.log_follow_var = tk.BooleanVar(value=True)
+            self.log_follow_checkbox = ttk.Checkbutton(
+                self.log_frame, text=self.get_label("log_follow"), variable=self.log_follow_var
+            )
+            self.log_follow_checkbox.grid(row=2, column=0, sticky='e', padx=5, pady=(0, 5))
+            self.root.after(LOG_UI_INTERVAL_MS, self._drain_log_queue)
+
+            # Capture checkbox：把收发的原始字节记录到抓包文件（capture.py 可回放）
+            self.capture_var = tk.BooleanVar(value=False)
+            self.capture_checkbox = ttk.Checkbutton(
+                self.log_frame, text=self.get_label("capture_traffic"), variable=self.capture_var, command=self.on_capture_toggle
+            )
+            self.capture_checkbox.grid(row=3, column=0, sticky='w', padx=5, pady=(0, 5))
+            self.capture_path = None
+
+            # 日志查看器：按地址/功能码/状态等过滤大日志文件
+            self.log_viewer_btn = ttk.Button(self.log_frame, text=self.get_label("log_viewer"), command=self.open_log_viewer)
+            self.log_viewer_btn.grid(row=3, column=0, sticky='e', padx=5, pady=(0, 5))
+
+            # 链路指标：计数器和延时直方图，每秒刷新
+            self.metrics_btn = ttk.Button(self.log_frame, text=self.get_label("link_metrics"), command=self.open_metrics_panel)
+            self.metrics_btn.grid(row=4, column=0, sticky='w', padx=5, pady=(0, 5))
+
+            # 请求追踪：记录每个请求各阶段的时间，导出为 Chrome trace JSON
+            self.trace_var = tk.BooleanVar(value=False)
+            self._last_tracer = None
+            self.trace_checkbox = ttk.Checkbutton(
+                self.log_frame, text=self.get_label("trace_requests"), variable=self.trace_var, command=self.on_trace_toggle
+            )
+            self.trace_checkbox.grid(row=4, column=0, padx=5, pady=(0, 5))
+            self.dump_trace_btn = ttk.Button(self.log_frame, text=self.get_label("dump_trace"), command=self.dump_trace)
+            self.dump_trace_btn.grid(row=4, column=0, sticky='e', padx=5, pady=(0, 5))
+
             self.log_file_path = None  # 保存日志文件路径
-            
-            # Initialize port list
-            self.refresh_ports()
+            # 串口列表在窗口显示后再扫描（_finish_startup）
             
         except Exception as e:
             error_msg = str(e)
@@ -682,37 +700,75 @@ class UARTTestGUI:
     def _on_mousewheel(self, event):
         """处理鼠标滚轮事件"""
         try:
-            self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+            # 日志区等其他控件自己处理滚轮
+            if str(event.widget).startswith(str(self.register_table)):
+                self.register_table.yview_scroll(int(-1 * (event.delta / 120)), "units")
         except Exception as e:
             # 忽略滚动错误
             pass
 
-    def on_canvas_configure(self, event):
-        """处理画布大小变化事件"""
-        try:
-            # 更新滚动区域
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-            
-            # 更新画布窗口宽度以匹配画布
-            if hasattr(self, 'canvas_window'):
-                self.canvas.itemconfig(self.canvas_window, width=event.width)
-                
-        except Exception as e:
-            # 记录错误但不抛出以防止崩溃
-            with open('error_log.txt', 'a', encoding='utf-8') as f:
-                f.write(f"\n窗口调整错误: {str(e)}\n")
-                f.write(traceback.format_exc())
-
     def refresh_ports(self):
-        """Refresh the available serial ports list"""
-        ports = UARTInterface.list_ports()
+        """Refresh the available serial ports list (enumerated by the background watcher)"""
+        watcher = self.port_watcher
+        if watcher is None:
+            ports = UARTInterface.list_ports()
+            self._on_ports_changed(ports, [], ports)
+        else:
+            watcher.refresh()
+
+    def _on_ports_changed(self, added, removed, ports):
+        """Tk线程中应用端口变化"""
         self.port_combo['values'] = ports
-        if ports and not self.port_var.get() in ports:
+        if self.uart.is_open():
+            if self.port_var.get() in removed:
+                self.add_to_log(f"Connected port removed: {self.port_var.get()}")
+        elif ports and not self.port_var.get() in ports:
             self.port_var.set(ports[0])
+        # 启动时的第一次枚举不逐个记录
+        if self._ports_seen:
+            for port in added:
+                self.add_to_log(f"Port added: {port}")
+            for port in removed:
+                self.add_to_log(f"Port removed: {port}")
+        self._ports_seen = True
+
+    def find_mcu(self):
+        """在后台并行扫描所有串口（当前波特率优先），选中第一个响应的串口和波特率"""
+        if self.uart.is_open():
+            messagebox.showwarning("Warning", "Disconnect before scanning for the MCU")
+            return
+        ports = self.port_watcher.ports() if self.port_watcher else UARTInterface.list_ports()
+        if not ports:
+            self.add_to_log("No serial ports found")
+            return
+        baudrates = [int(self.baud_var.get())] + [int(b) for b in self.baud_combo['values'] if b != self.baud_var.get()]
+        self.find_mcu_btn.state(['disabled'])
+        self.add_to_log(f"Scanning {len(ports)} ports for an MCU...")
+        def scan():
+            from port_scanner import scan_ports
+            start = time.monotonic()
+            results = scan_ports(ports, baudrates, log_func=self.add_to_log)
+            self.ui_bus.call(self._on_mcu_scan_done, results, time.monotonic() - start)
+        threading.Thread(target=scan, daemon=True).start()
+
+    def _on_mcu_scan_done(self, results, elapsed):
+        self.find_mcu_btn.state(['!disabled'])
+        responding = [r for r in results if r.ok]
+        if not responding:
+            self.add_to_log(f"No MCU found on {len(results)} ports ({elapsed:.1f} s)")
+            return
+        best = responding[0]
+        self.add_to_log(f"MCU found on {', '.join(r.port for r in responding)} ({elapsed:.1f} s); "
+                        f"selected {best.port} at {best.baudrate} baud")
+        if not self.uart.is_open():
+            self.port_var.set(best.port)
+            self.baud_var.set(str(best.baudrate))
 
     def toggle_connection(self):
         """Toggle serial port connection"""
         if not self.uart.is_open():
+            # 串口相关模块在第一次连接时才导入，加快启动
+            from serial import SerialException
             try:
                 # Check if port is selected
                 port = self.port_var.get()
@@ -727,6 +783,8 @@ class UARTTestGUI:
                     parity=self.parity_var.get(),
                     timeout=1
                 )
+                if self.capture_path:
+                    self.uart.start_capture(self.capture_path)
                 self.status_label.config(text="Connected", foreground="green")
                 self.connect_btn.config(text="Disconnect")
                 self.port_combo.state(['disabled'])
@@ -734,7 +792,7 @@ class UARTTestGUI:
                 # Start listener and handshake via uart_service
                 self.uart_service.start_listener()
                 self.uart_service.start_e0_handshake()
-            except serial.SerialException as e:
+            except SerialException as e:
                 error_msg = str(e)
                 if "PermissionError" in error_msg:
                     messagebox.showerror("Error", f"Cannot open port, it may be in use\n{port}")
@@ -755,66 +813,6 @@ class UARTTestGUI:
             except Exception as e:
                 messagebox.showerror("Error", f"Error disconnecting:\n{str(e)}")
 
-    def create_module_header(self, module, content_frame):
-        # Create header frame
-        header_frame = ttk.Frame(content_frame, style="ModuleHeader.TFrame")
-        header_frame.grid(row=0, column=0, sticky='ew')
-        header_frame.columnconfigure(1, weight=1)
-        
-        # Create expand/collapse button
-        button_text = "[-]" if self.module_states.get(module, True) else "[+]"
-        button = ttk.Button(header_frame, text=button_text, width=3,
-                          command=lambda: self.toggle_module(module, button))
-        button.grid(row=0, column=0, padx=5, pady=2)
-        
-        # Create module label (without "Module:" prefix)
-        module_label = ttk.Label(header_frame, text=module)
-        module_label.grid(row=0, column=1, sticky='w', padx=5, pady=2)
-        self.module_labels[module] = module_label
-        
-        # Create module-level Read All and Write All buttons
-        read_btn = ttk.Button(header_frame, text=self.get_label("read_all"),
-                            command=lambda: self.read_module(module), width=12)
-        read_btn.grid(row=0, column=2, padx=2, pady=2)
-        self.module_read_buttons[module] = read_btn
-        
-        write_btn = ttk.Button(header_frame, text=self.get_label("write_all"),
-                             command=lambda: self.write_module(module), width=12)
-        write_btn.grid(row=0, column=3, padx=2, pady=2)
-        self.module_write_buttons[module] = write_btn
-        
-        return header_frame
-
-    def create_submodule_header(self, module, submodule, content_frame):
-        # Create header frame
-        header_frame = ttk.Frame(content_frame, style="SubmoduleHeader.TFrame")
-        header_frame.grid(row=0, column=0, sticky='ew')
-        header_frame.columnconfigure(1, weight=1)
-        
-        # Create expand/collapse button
-        button_text = "[-]" if self.submodule_states.get(f"{module}_{submodule}", True) else "[+]"
-        button = ttk.Button(header_frame, text=button_text, width=3,
-                          command=lambda: self.toggle_submodule(module, submodule, button))
-        button.grid(row=0, column=0, padx=(20, 5), pady=2)
-        
-        # Create submodule label (without "Submodule:" prefix)
-        submodule_label = ttk.Label(header_frame, text=submodule)
-        submodule_label.grid(row=0, column=1, sticky='w', padx=5, pady=2)
-        self.submodule_labels[f"{module}_{submodule}"] = submodule_label
-        
-        # Create submodule-level Read All and Write All buttons
-        read_btn = ttk.Button(header_frame, text=self.get_label("read_all"),
-                            command=lambda: self.read_submodule(module, submodule), width=12)
-        read_btn.grid(row=0, column=2, padx=2, pady=2)
-        self.submodule_read_buttons[f"{module}_{submodule}"] = read_btn
-        
-        write_btn = ttk.Button(header_frame, text=self.get_label("write_all"),
-                             command=lambda: self.write_submodule(module, submodule), width=12)
-        write_btn.grid(row=0, column=3, padx=2, pady=2)
-        self.submodule_write_buttons[f"{module}_{submodule}"] = write_btn
-        
-        return header_frame
-
     def check_connection(self):
         """Check if serial port is connected"""
         if not self.uart.is_open():
@@ -828,10 +826,12 @@ class UARTTestGUI:
             return
             
         print("=== Reading All Items ===")
+        run = self._start_bulk_run("read_all")
         for module in self.organized_items.values():
             for submodule in module.values():
                 for item in submodule:
-                    self.read_item(item)
+                    self.read_item(item, run=run)
+        self._bulk_run_step(run, -1)
     
     def write_all(self):
         """Print write commands for writable items"""
@@ -839,11 +839,13 @@ class UARTTestGUI:
             return
             
         print("=== Writing All Writable Items ===")
+        run = self._start_bulk_run("write_all")
         for module in self.organized_items.values():
             for submodule in module.values():
                 for item in submodule:
                     if "W" in item["permission"]:
-                        self.write_item(item)
+                        self.write_item(item, run=run)
+        self._bulk_run_step(run, -1)
     
     def read_module(self, module):
         """Read all items in a module"""
@@ -851,9 +853,11 @@ class UARTTestGUI:
             return
             
         print(f"=== Reading All Items in Module: {module} ===")
+        run = self._start_bulk_run("read_module")
         for submodule in self.organized_items[module].values():
             for item in submodule:
-                self.read_item(item)
+                self.read_item(item, run=run)
+        self._bulk_run_step(run, -1)
 
     def write_module(self, module):
         """Write all writable items in a module"""
@@ -861,10 +865,12 @@ class UARTTestGUI:
             return
             
         print(f"=== Writing All Items in Module: {module} ===")
+        run = self._start_bulk_run("write_module")
         for submodule in self.organized_items[module].values():
             for item in submodule:
                 if "W" in item["permission"]:
-                    self.write_item(item)
+                    self.write_item(item, run=run)
+        self._bulk_run_step(run, -1)
 
     def read_submodule(self, module, submodule):
         """Read all items in a submodule"""
@@ -872,8 +878,10 @@ class UARTTestGUI:
             return
             
         print(f"=== Reading All Items in Submodule: {submodule} ===")
+        run = self._start_bulk_run("read_submodule")
         for item in self.organized_items[module][submodule]:
-            self.read_item(item)
+            self.read_item(item, run=run)
+        self._bulk_run_step(run, -1)
 
     def write_submodule(self, module, submodule):
         """Write all writable items in a submodule"""
@@ -881,42 +889,38 @@ class UARTTestGUI:
             return
             
         print(f"=== Writing All Items in Submodule: {submodule} ===")
+        run = self._start_bulk_run("write_submodule")
         for item in self.organized_items[module][submodule]:
             if "W" in item["permission"]:
-                self.write_item(item)
+                self.write_item(item, run=run)
+        self._bulk_run_step(run, -1)
     
-    def toggle_module(self, module, button):
+    def _start_bulk_run(self, name):
+        """批量读写开始：记录链路统计快照，所有请求完成后在日志中输出线路利用率（见 link_budget.py）"""
+        # remaining 从1开始，发起请求的循环结束后再减掉，避免请求还没发完就提前结束
+        return {'name': name, 'since': self.uart_service.link.snapshot(), 'remaining': 1, 'lock': threading.Lock()}
+
+    def _bulk_run_step(self, run, delta):
+        if run is None:
+            return
+        with run['lock']:
+            run['remaining'] += delta
+            done = run['remaining'] == 0
+        if done:
+            report = self.uart_service.link.report(run['since'])
+            self.add_to_log(format_link_report(report, run['name']))
+
+    def toggle_module(self, module):
         """Toggle module expansion state"""
-        try:
-            if self.module_states[module]:  # Currently expanded
-                button.configure(text="[+]")
-                self.module_states[module] = False
-                if module in self.module_frames:
-                    self.module_frames[module].grid_remove()
-            else:  # Currently collapsed
-                button.configure(text="[-]")
-                self.module_states[module] = True
-                if module in self.module_frames:
-                    self.module_frames[module].grid()
-        except Exception as e:
-            print(f"Error in toggle_module: {e}")
+        self.module_states[module] = not self.module_states.get(module, True)
+        self.register_table.rows_changed()
 
-    def toggle_submodule(self, module, submodule, button):
+    def toggle_submodule(self, module, submodule):
         """Toggle submodule expansion state"""
-        try:
-            state_key = f"{module}_{submodule}"
-            if self.submodule_states.get(state_key, True):  # Currently expanded
-                button.configure(text="[+]")
-                self.submodule_states[state_key] = False
-                if (module, submodule) in self.submodule_frames:
-                    self.submodule_frames[(module, submodule)].grid_remove()
-            else:  # Currently collapsed
-                button.configure(text="[-]")
-                self.submodule_states[state_key] = True
-                if (module, submodule) in self.submodule_frames:
-                    self.submodule_frames[(module, submodule)].grid()
-        except Exception as e:
-            print(f"Error in toggle_submodule: {e}")
+        state_key = f"{module}_{submodule}"
+        self.submodule_states[state_key] = not self.submodule_states.get(state_key, True)
+        self.register_table.rows_changed()
+
     def toggle_loop_send(self):
         if not self.loop_running:
             # 检查串口连接
@@ -938,12 +942,12 @@ class UARTTestGUI:
             if not self.check_connection():
                 self.add_to_log("串口未连接，循环发送已停止。")
                 self.loop_running = False
-                self.loop_button.config(text="cycle send")
+                self.ui_bus.call(self.loop_button.config, {"text": "cycle send"})
                 break
             if not self.uart_service.is_mcu_connected():
                 self.add_to_log("MCU not connected. Please wait for handshake.")
                 self.loop_running = False
-                self.loop_button.config(text="cycle send")
+                self.ui_bus.call(self.loop_button.config, {"text": "cycle send"})
                 break
             for item in self.items:
                 if not self.loop_running:
@@ -953,7 +957,7 @@ class UARTTestGUI:
                 event = threading.Event()
                 def read_cb(result, error=None):
                     if error:
-                        self.result_vars[item['index']].set("timeout")
+                        self.ui_bus.post(item['index'], RESULT, "timeout")
                         self.add_to_log(f"Read {item.get('name', item.get('index'))} timeout")
                     event.set()
                 self.uart_service.read_item(item, callback=read_cb)
@@ -970,7 +974,7 @@ class UARTTestGUI:
                     event2 = threading.Event()
                     def write_cb(result, error=None):
                         if error:
-                            self.write_status_vars[item['index']].set("timeout")
+                            self.ui_bus.post(item['index'], STATUS, "timeout")
                             self.add_to_log(f"Write {item.get('name', item.get('index'))} timeout")
                         event2.set()
                     self.uart_service.write_item(item, value, callback=write_cb)
@@ -979,6 +983,7 @@ class UARTTestGUI:
             time.sleep(RECYCLE_TIME)
     def __del__(self):
         self.uart.close()
+        self.log_manager.close()
 
     def clear_log(self):
         """Clear the communication log"""
@@ -993,6 +998,7 @@ class UARTTestGUI:
     def on_save_log_toggle(self):
         if self.save_log_var.get():
             # 勾选时弹出文件保存对话框
+            from tkinter import filedialog
             file_path = filedialog.asksaveasfilename(
                 title="Select Log File",
                 defaultextension=".txt",
@@ -1010,6 +1016,69 @@ class UARTTestGUI:
             # 取消勾选时，清除路径
             self.log_manager.set_log_file_path(None)
 
+    def open_log_viewer(self):
+        from log_viewer import LogViewer
+        # 正在保存日志时直接打开当前日志文件，否则在查看器中选择文件
+        self.log_manager.flush(timeout=1.0)
+        LogViewer(self.root, path=self.log_manager.log_file_path, get_label=self.get_label)
+
+    def open_metrics_panel(self):
+        from metrics_panel import MetricsPanel
+        MetricsPanel(self.root, self.uart_service.metrics, get_label=self.get_label)
+
+    def on_trace_toggle(self):
+        if self.trace_var.get():
+            self.uart_service.enable_tracing()
+        else:
+            # 关闭后保留缓冲区，仍可导出
+            self._last_tracer = self.uart_service.tracer
+            self.uart_service.disable_tracing()
+
+    def dump_trace(self):
+        tracer = self.uart_service.tracer or self._last_tracer
+        if tracer is None:
+            messagebox.showwarning("Warning", "Tracing is not enabled.")
+            return
+        from tkinter import filedialog
+        file_path = filedialog.asksaveasfilename(
+            title="Save Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome Trace", "*.json"), ("All Files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            count = tracer.dump(file_path)
+            self.add_to_log(f"Trace saved: {file_path} ({count} events)")
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save trace:\n{e}")
+
+    def on_capture_toggle(self):
+        if self.capture_var.get():
+            from tkinter import filedialog
+            file_path = filedialog.asksaveasfilename(
+                title="Select Capture File",
+                defaultextension=".cap",
+                filetypes=[("Capture Files", "*.cap"), ("All Files", "*.*")]
+            )
+            if not file_path:
+                self.capture_var.set(False)
+                return
+            self.capture_path = file_path
+            # 已连接则立即开始，否则在下次连接时开始
+            if self.uart.is_open():
+                try:
+                    self.uart.start_capture(file_path)
+                except Exception as e:
+                    messagebox.showerror("Error", f"Failed to start capture:\n{str(e)}")
+                    self.capture_var.set(False)
+                    self.capture_path = None
+                    return
+            self.add_to_log(f"Capture traffic to {file_path}")
+        else:
+            self.capture_path = None
+            self.uart.stop_capture()
+
     def save_current_log_to_file(self):
         log_content = self.log_text.get("1.0", tk.END)
         self.log_manager.save_current_log_to_file(log_content)
@@ -1020,6 +1089,7 @@ class UARTTestGUI:
         if not self.uart_service.is_mcu_connected():
             messagebox.showwarning("Warning", "MCU not connected. Please wait for handshake.")
             return
+        from tkinter import filedialog
         file_path = filedialog.askopenfilename(
             title="Select MCU Upgrade .bin File",
             filetypes=[("BIN Files", "*.bin"), ("All Files", "*.*")]
@@ -1035,36 +1105,75 @@ class UARTTestGUI:
         def on_progress(current, total):
             self.add_to_log(f"Upgrade progress: {current}/{total}")
         def do_upgrade():
+            since = self.uart_service.link.snapshot()
             success, msg = self.uart_service.upgrade_mcu(bin_data, progress_callback=on_progress)
+            self.add_to_log(format_link_report(self.uart_service.link.report(since), "upgrade"))
             if success:
-                messagebox.showinfo("Upgrade", msg)
+                self.ui_bus.call(messagebox.showinfo, "Upgrade", msg)
             else:
-                messagebox.showerror("Upgrade Error", msg)
+                self.ui_bus.call(messagebox.showerror, "Upgrade Error", msg)
         threading.Thread(target=do_upgrade, daemon=True).start()
 
     def _log_callback(self, message):
-        def append_log():
-            try:
-                if message == "__CLEAR__":
-                    self.log_text.configure(state='normal')
-                    self.log_text.delete(1.0, tk.END)
-                    self.log_text.configure(state='disabled')
+        # 可能在任意线程调用，只入队；队列满时最旧的日志被挤掉并计数
+        with self.log_queue_lock:
+            if message == "__CLEAR__":
+                # 清空之前排队的日志不再需要显示，也不算丢弃
+                self.log_queue.clear()
+                self.log_dropped = 0
+                self.log_clear_pending = True
+                return
+            if len(self.log_queue) == self.log_max_lines:
+                self.log_dropped += 1
+                self.log_dropped_total.inc()
+            self.log_queue.append(message)
+
+    def _drain_log_queue(self):
+        """按固定周期把队列中的日志一次性插入日志区；暂停跟随时只处理清空"""
+        try:
+            follow = self.log_follow_var.get()
+            with self.log_queue_lock:
+                cleared, self.log_clear_pending = self.log_clear_pending, False
+                if follow:
+                    messages = list(self.log_queue)
+                    self.log_queue.clear()
+                    dropped, self.log_dropped = self.log_dropped, 0
                 else:
-                    self.log_text.configure(state='normal')
-                    self.log_text.insert(tk.END, message + '\n')
+                    messages, dropped = [], 0
+            if cleared or messages or dropped:
+                # 只格式化最终会显示的那部分，丢弃提示占一行
+                keep = self.log_max_lines - 1 if dropped else self.log_max_lines
+                lines = [format_record(m) if isinstance(m, LogRecord) else m
+                         for m in messages[-keep:]] if keep > 0 else []
+                if dropped:
+                    lines.insert(0, f"[log] {dropped} log lines dropped (log view queue full)")
+                self.log_text.configure(state='normal')
+                if cleared:
+                    self.log_text.delete(1.0, tk.END)
+                if lines:
+                    self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
+                    line_count = int(self.log_text.index('end-1c').split('.')[0]) - 1
+                    if line_count > self.log_max_lines:
+                        self.log_text.delete(1.0, f"{line_count - self.log_max_lines + 1}.0")
+                if follow:
                     self.log_text.see(tk.END)
-                    self.log_text.configure(state='disabled')
-                #self.root.update_idletasks()  # 强制刷新
-            except Exception as e:
-                print("Log append error:", e)
-        self.root.after(0, append_log)
+                self.log_text.configure(state='disabled')
+        except Exception as e:
+            print("Log append error:", e)
+        self.root.after(LOG_UI_INTERVAL_MS, self._drain_log_queue)
+
+    def _apply_value(self, key, field, value):
+        """UIUpdateBus 在Tk线程中调用：更新寄存器表中的一个值"""
+        cells = self.register_table.cells.get(key)
+        if cells is not None and cells[field] is not None:
+            cells[field].set(value)
 
     def update_item_display(self, addr, value):
         # addr 是 int 类型，转成 0xXXXX 格式字符串
         addr_hex = f"0x{addr:04X}"
         signed_value = to_signed(value, bits=32)
         if addr_hex in self.result_vars:
-            self.result_vars[addr_hex].set(str(signed_value))
+            self.ui_bus.post(addr_hex, RESULT, str(signed_value))
             #self.add_to_log(f"MCU report: {addr_hex} = {signed_value}")
         else:
             #self.add_to_log(f"MCU report: Unknown address {addr_hex} = {signed_value}")
@@ -1,47 +1,82 @@
 import serial
-import serial.tools.list_ports
 
 class UARTInterface:
     def __init__(self):
-        self.ser = None
+        self.transport = None
+        self.params = {}  # 最近一次 open 的参数
 
     def open(self, port, baudrate=115200, bytesize=8, stopbits=1, parity='N', timeout=1):
-        if self.ser and self.ser.is_open:
-            self.ser.close()
-        self.ser = serial.Serial(
-            port=port,
+        # port 可以是普通串口名，也可以是 tcp:// pty:// loop:// 等URL，见 transport.py
+        if self.transport and self.transport.is_open():
+            self.transport.close()
+        from transport import open_transport
+        self.transport = open_transport(
+            port,
             baudrate=baudrate,
             bytesize=bytesize,
             stopbits=stopbits,
             parity=parity,
             timeout=timeout
         )
+        self.params = {'port': port, 'baudrate': baudrate, 'bytesize': bytesize,
+                       'stopbits': stopbits, 'parity': parity}
+
+    def start_capture(self, path):
+        """开始把收发的原始数据记录到抓包文件，见 capture.py"""
+        from capture import CaptureTransport, CaptureWriter
+        if not self.is_open():
+            raise serial.SerialException("Serial port not open")
+        self.stop_capture()
+        self.transport = CaptureTransport(self.transport, CaptureWriter(path, meta=self.params))
+
+    def stop_capture(self):
+        from capture import CaptureTransport
+        if isinstance(self.transport, CaptureTransport):
+            self.transport.writer.close()
+            self.transport = self.transport.inner
+
+    def is_capturing(self):
+        from capture import CaptureTransport
+        return isinstance(self.transport, CaptureTransport)
 
     def close(self):
-        if self.ser and self.ser.is_open:
-            self.ser.close()
-            self.ser = None
+        if self.transport and self.transport.is_open():
+            self.transport.close()
+            self.transport = None
 
     def write(self, data):
-        if self.ser and self.ser.is_open:
-            return self.ser.write(data)
+        if self.transport and self.transport.is_open():
+            return self.transport.write(data)
         else:
             raise serial.SerialException("Serial port not open")
 
     def read(self, size=1):
-        if self.ser and self.ser.is_open:
-            return self.ser.read(size)
+        if self.transport and self.transport.is_open():
+            return self.transport.read(size)
+        else:
+            raise serial.SerialException("Serial port not open")
+
+    def readinto(self, buffer):
+        if self.transport and self.transport.is_open():
+            return self.transport.readinto(buffer)
+        else:
+            raise serial.SerialException("Serial port not open")
+
+    def fileno(self):
+        if self.transport and self.transport.is_open():
+            return self.transport.fileno()
         else:
             raise serial.SerialException("Serial port not open")
 
     def is_open(self):
-        return self.ser is not None and self.ser.is_open
+        return self.transport is not None and self.transport.is_open()
 
     def in_waiting(self):
-        if self.ser and self.ser.is_open:
-            return self.ser.in_waiting
+        if self.transport and self.transport.is_open():
+            return self.transport.in_waiting()
         return 0
 
     @staticmethod
     def list_ports():
-        return [port.device for port in serial.tools.list_ports.comports()] 
\ No newline at end of file
+        import serial.tools.list_ports
+        return [port.device for port in serial.tools.list_ports.comports()]
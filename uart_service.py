@@ -1,3 +1,4 @@
+import itertools
 import time
 import threading
 from protocol import generate_read_command, generate_write_command, parse_response, generate_upgrade_packets, generate_upgrade_crc_command, calculate_crc16, generate_status_response, validate_value_for_type, to_signed
@@ -21,6 +22,11 @@ from protocol import (
     PU_STATUS_DATA_LENGTH_ERROR,
     PU_STATUS_UPGRADE_PACKAGE_CRC_ERROR
 )
+from log_manager import LogRecord, DEBUG, INFO, WARNING, ERROR
+from metrics import MetricsRegistry
+from link_budget import LinkBudget
+from tracing import Tracer, TX_START, TX_DONE, FIRST_BYTE, FRAME_COMPLETE, CALLBACK, TIMEOUT
+from register_model import item_address, item_type
 
 ALLOWED_FUN_CODES = {
     PU_FUN_READ, PU_FUN_WRITE, PU_FUN_UPGRADE, PU_FUN_UPGRADE_CRC,
@@ -30,10 +36,20 @@ ALLOWED_FUN_CODES = {
 
 } 
 
+# 请求类型 -> 功能码，延时直方图按两者标注
+REQUEST_FUN_CODES = {
+    'read': PU_FUN_READ,
+    'write': PU_FUN_WRITE,
+    'upgrade': PU_FUN_UPGRADE,
+    'upgrade_crc': PU_FUN_UPGRADE_CRC,
+}
+
 class UARTService:
-    def __init__(self, uart_interface, log_func=None, gui_update_callback=None, addr_map=None, f0_response_getter=None, response_40_50_getter=None):
+    def __init__(self, uart_interface, log_func=None, gui_update_callback=None, addr_map=None, f0_response_getter=None, response_40_50_getter=None, metrics=None):
         self.uart = uart_interface
+        # log_func 收到的是 LogRecord，str()/f-string 时才格式化，见 log_manager.py
         self.log_func = log_func or (lambda msg: None)
+        self._log_enabled = log_func is not None
         self.gui_update_callback = gui_update_callback  # 新增
         self.pending_requests = {}
         self.pending_lock = threading.Lock()
@@ -45,10 +61,101 @@ class UARTService:
         self.addr_map = addr_map or {}  # 新增
         self.f0_response_getter = f0_response_getter or (lambda: False)
         self.response_40_50_getter = response_40_50_getter or (lambda: False)
+        self.recv_buffer = bytearray()  # 接收缓冲，见 feed()
+        self._request_seq = itertools.count()
+        # 链路指标（见 metrics.py），多个服务可以共用一个 MetricsRegistry
+        self.metrics = metrics or MetricsRegistry()
+        self._init_metrics()
+        # 请求追踪（见 tracing.py），默认关闭
+        self.tracer = None
+        # 线路时间预算（见 link_budget.py），串口参数在 start_listener 时更新
+        self.link = LinkBudget(getattr(uart_interface, 'params', None))
+    @classmethod
+    def from_url(cls, url, baudrate=115200, bytesize=8, stopbits=1, parity='N', timeout=1, capture=None, **kwargs):
+        """按URL打开传输层并创建服务，例如 tcp://10.0.0.5:4001、pty:///dev/pts/3、loop://sim1
+        capture: 抓包文件路径，记录所有收发数据（见 capture.py）"""
+        from uart_interface import UARTInterface
+        uart = UARTInterface()
+        uart.open(url, baudrate=baudrate, bytesize=bytesize, stopbits=stopbits, parity=parity, timeout=timeout)
+        if capture:
+            uart.start_capture(capture)
+        return cls(uart, **kwargs)
+
+    def _init_metrics(self):
+        # 热路径上直接持有指标对象，记录一次只是一次属性加法
+        m = self.metrics
+        self._m_rx_bytes = m.counter('uart_rx_bytes_total', "Bytes received")
+        self._m_tx_bytes = m.counter('uart_tx_bytes_total', "Bytes sent")
+        self._m_rx_frames = {}  # 功能码 -> Counter，第一次收到时创建
+        self._m_crc_errors = m.counter('uart_crc_errors_total', "Received frames with a bad CRC")
+        self._m_length_errors = m.counter('uart_length_errors_total', "Report frames with an invalid data length")
+        self._m_invalid_fun = m.counter('uart_invalid_fun_codes_total', "Frames with an unknown function code")
+        self._m_discard_no_head = m.counter('uart_discarded_bytes_total', "Bytes dropped by the frame parser", reason='no_head')
+        self._m_discard_invalid_fun = m.counter('uart_discarded_bytes_total', "Bytes dropped by the frame parser", reason='invalid_fun')
+        self._m_addr_errors = m.counter('uart_report_addr_errors_total', "Reported addresses missing from the register map")
+        self._m_requests = {op: m.counter('uart_requests_total', "Requests sent", op=op) for op in REQUEST_FUN_CODES}
+        self._m_timeouts = {op: m.counter('uart_timeouts_total', "Requests without a reply in time", op=op)
+                            for op in REQUEST_FUN_CODES}
+        self._m_latency = {op: m.histogram('uart_request_latency_us', "Request to reply latency in microseconds",
+                                           op=op, fun=f"0x{fun:02X}")
+                           for op, fun in REQUEST_FUN_CODES.items()}
+
+    def _send(self, data, op=None, trace_id=None):
+        tracer = self.tracer
+        if trace_id is not None and tracer is not None:
+            tracer.mark(trace_id, TX_START)
+            self.uart.write(data)
+            tracer.mark(trace_id, TX_DONE)
+        else:
+            self.uart.write(data)
+        self._m_tx_bytes.value += len(data)
+        self.link.tx(data)
+        if op is not None:
+            self._m_requests[op].value += 1
+
+    def enable_tracing(self, capacity=None):
+        """打开请求追踪，返回 Tracer（GUI 用同一个 Tracer 记录入队和界面更新）"""
+        if self.tracer is None:
+            self.tracer = Tracer(capacity) if capacity else Tracer()
+        return self.tracer
+
+    def disable_tracing(self):
+        self.tracer = None
+
+    def dump_trace(self, path):
+        """把追踪缓冲区写成 Chrome trace JSON，返回事件数"""
+        if self.tracer is None:
+            raise ValueError("tracing is not enabled")
+        return self.tracer.dump(path)
+
+    def _trace_begin(self, trace_id, op, addr=-1):
+        # 调用方（GUI）已经开始追踪时沿用它的请求号
+        tracer = self.tracer
+        if tracer is None:
+            return None
+        return trace_id if trace_id is not None else tracer.begin(op, addr)
+
+    def _trace_first_byte(self):
+        # 发送后第一次收到数据：标记所有还没收到数据的请求
+        tracer = self.tracer
+        if tracer is None:
+            return
+        with self.pending_lock:
+            for req in self.pending_requests.values():
+                trace_id = req.get('trace')
+                if trace_id is not None and not req.get('rx_seen'):
+                    req['rx_seen'] = True
+                    tracer.mark(trace_id, FIRST_BYTE)
+
+    def _log(self, level, category, msg, *args, data=None, data_limit=None):
+        if self._log_enabled:
+            self.log_func(LogRecord(level, category, msg, args, data, data_limit))
+
     def start_listener(self):
         if self.listener_thread and self.listener_thread.is_alive():
             return
         self.running = True
+        self.link.set_params(getattr(self.uart, 'params', None) or {})
         t = threading.Thread(target=self._listen, daemon=True)
         t.start()
         self.listener_thread = t
@@ -60,102 +167,121 @@ class UARTService:
             self.listener_thread = None
 
     def _listen(self):
-        recv_buffer = bytearray()
+        self.recv_buffer = bytearray()
         while self.running and self.uart.is_open():
             try:
-                if self.uart.in_waiting() > 0:
-                    recv_buffer += self.uart.read(self.uart.in_waiting())
-                # 粘包处理循环
-                while len(recv_buffer) >= MIN_PACKET_SIZE:
-                    #在log中打印recv_buffer
-                    #self.log_func(f"Recv buffer: {' '.join(f'{b:02X}' for b in recv_buffer)}")
-                    # 1. 找包头
-                    idx = recv_buffer.find(PU_FRAME_HEAD)
-                    if idx == -1:
-                        # 没有包头，全部丢弃
-                        #在log中打印无效包
-                        self.log_func(f"discard packet: NO HEAD{' '.join(f'{b:02X}' for b in recv_buffer)}")
-                        recv_buffer.clear()
-                        break
-                    if idx > 0:
-                        # 丢弃包头前的无效数据
-                        recv_buffer = recv_buffer[idx:]
-                    # 2. 检查最小长度
-                    if len(recv_buffer) < MIN_PACKET_SIZE:
-                        break  # 等待更多数据
-                    # 3. 检查FUN_CODE
-                    fun_code = recv_buffer[1]
-                    if fun_code not in ALLOWED_FUN_CODES:
-                        # FUN_CODE非法，丢弃当前包头到下一个包头之间的所有数据
-                        next_head = recv_buffer[1:].find(PU_FRAME_HEAD)
-                        if next_head == -1:
-                            # 后面没有包头，全部丢弃
-                            invalid_packet = recv_buffer[:]
-                            self.log_func(
-                                f"discard packet: INVALID FUN_CODE: 0x{fun_code:02X}, discard packet: " +
-                                ' '.join(f'{b:02X}' for b in invalid_packet)
-                            )
-                            recv_buffer.clear()
-                            break
-                        else:
-                            # 丢弃到下一个包头
-                            invalid_packet = recv_buffer[:next_head+1]
-                            self.log_func(
-                                f"Invalid FUN_CODE: 0x{fun_code:02X}, discard packet: " +
-                                ' '.join(f'{b:02X}' for b in invalid_packet)
-                            )
-                            recv_buffer = recv_buffer[next_head + 1:]
-                        continue
-                    # 4. 读取LEN字段
-                    data_len = (recv_buffer[2] << 8) | recv_buffer[3]
-                    total_len = 1 + 1 + 2 + data_len + 2  # 包头+FUN_CODE+LEN+DATA+CRC
-                    if len(recv_buffer) < total_len:
-                        break  # 数据还不够，等待下次
-                    # 5. 取出完整包
-                    packet = recv_buffer[:total_len]
-                    #在log中打印packet
-                    self.log_func(f"recv packet: {' '.join(f'{b:02X}' for b in packet)}")
-                    fun_code = packet[1]
-                    # 6. 处理包
-                    if fun_code in (PU_FUN_CONNECT, PU_FUN_MCU_RESET):  # 只对E0/F0做握手处理
-                        if self.handle_handshake(packet):
-                            recv_buffer = recv_buffer[total_len:]
-                            continue
-                    self.handle_serial_data(packet)
-                    recv_buffer = recv_buffer[total_len:]
+                n = self.uart.in_waiting()
+                if n > 0:
+                    self.feed(self.uart.read(n))
                 time.sleep(0.01)
             except Exception as e:
-                self.log_func(f"Listener error: {e}")
+                self._log(ERROR, 'error', "Listener error: %s", e)
                 break
 
+    def feed(self, data):
+        """把收到的字节交给解析器并处理其中所有完整的包（监听线程和抓包回放共用）"""
+        recv_buffer = self.recv_buffer
+        recv_buffer += data
+        self._m_rx_bytes.value += len(data)
+        if self.tracer is not None:
+            self._trace_first_byte()
+        # 粘包处理循环
+        while len(recv_buffer) >= MIN_PACKET_SIZE:
+            # 1. 找包头
+            idx = recv_buffer.find(PU_FRAME_HEAD)
+            if idx == -1:
+                # 没有包头，全部丢弃
+                #在log中打印无效包
+                self._log(WARNING, 'rx', "discard packet: NO HEAD", data=bytes(recv_buffer))
+                self._m_discard_no_head.value += len(recv_buffer)
+                self.link.rx_discarded(len(recv_buffer))
+                recv_buffer.clear()
+                break
+            if idx > 0:
+                # 丢弃包头前的无效数据
+                self._m_discard_no_head.value += idx
+                self.link.rx_discarded(idx)
+                del recv_buffer[:idx]
+            # 2. 检查最小长度
+            if len(recv_buffer) < MIN_PACKET_SIZE:
+                break  # 等待更多数据
+            # 3. 检查FUN_CODE
+            fun_code = recv_buffer[1]
+            if fun_code not in ALLOWED_FUN_CODES:
+                # FUN_CODE非法，丢弃当前包头到下一个包头之间的所有数据
+                self._m_invalid_fun.value += 1
+                next_head = recv_buffer.find(PU_FRAME_HEAD, 1)
+                if next_head == -1:
+                    # 后面没有包头，全部丢弃
+                    invalid_packet = bytes(recv_buffer)
+                    self._log(WARNING, 'rx', "discard packet: INVALID FUN_CODE: 0x%02X, discard packet: ",
+                              fun_code, data=invalid_packet)
+                    self._m_discard_invalid_fun.value += len(invalid_packet)
+                    self.link.rx_discarded(len(invalid_packet))
+                    recv_buffer.clear()
+                    break
+                else:
+                    # 丢弃到下一个包头
+                    invalid_packet = bytes(recv_buffer[:next_head])
+                    self._log(WARNING, 'rx', "Invalid FUN_CODE: 0x%02X, discard packet: ",
+                              fun_code, data=invalid_packet)
+                    self._m_discard_invalid_fun.value += next_head
+                    self.link.rx_discarded(next_head)
+                    del recv_buffer[:next_head]
+                continue
+            # 4. 读取LEN字段
+            data_len = (recv_buffer[2] << 8) | recv_buffer[3]
+            total_len = 1 + 1 + 2 + data_len + 2  # 包头+FUN_CODE+LEN+DATA+CRC
+            if len(recv_buffer) < total_len:
+                break  # 数据还不够，等待下次
+            # 5. 取出完整包
+            packet = recv_buffer[:total_len]
+            del recv_buffer[:total_len]
+            #在log中打印packet
+            self._log(DEBUG, 'rx', "recv packet: ", data=packet)
+            fun_code = packet[1]
+            counter = self._m_rx_frames.get(fun_code)
+            if counter is None:
+                counter = self._m_rx_frames[fun_code] = self.metrics.counter(
+                    'uart_rx_frames_total', "Complete frames received", fun=f"0x{fun_code:02X}")
+            counter.value += 1
+            self.link.rx(packet)
+            # 6. 处理包
+            if fun_code in (PU_FUN_CONNECT, PU_FUN_MCU_RESET):  # 只对E0/F0做握手处理
+                if self.handle_handshake(packet):
+                    continue
+            self.handle_serial_data(packet)
+
     def handle_handshake(self, data):
         # 检查是否为握手帧，如果是则自动回复
         # 握手帧格式: 5A F0 00 00 + CRC(2字节)
         if len(data) == 6 and data[0] == PU_FRAME_HEAD and data[1] == PU_FUN_MCU_RESET and data[2] == 0x00 and data[3] == 0x00:
             received_crc = (data[4] << 8) | data[5]
-            calculated_crc = calculate_crc16(data[:4], 4)
+            calculated_crc = calculate_crc16(data, 4)
             if received_crc == calculated_crc:
                 try:
-                    self.log_func("MCU RESET")
+                    self._log(INFO, 'info', "MCU RESET")
                     if self.f0_response_getter():
-                        self.uart.write(data)
-                        self.log_func("Recv handshake, sent handshake reply.")
+                        self._send(data)
+                        self._log(INFO, 'info', "Recv handshake, sent handshake reply.")
                 except Exception as e:
-                    self.log_func(f"Handshake reply failed: {e}")
+                    self._log(ERROR, 'error', "Handshake reply failed: %s", e)
                 return True
             else:
+                self._m_crc_errors.value += 1
                 if self.f0_response_getter():
                     self.send_status_response(PU_FUN_MCU_RESET, PU_STATUS_CRC_ERROR)
                     return False
         # 检查E0握手回复
         if len(data) == 6 and data[0] == PU_FRAME_HEAD and data[1] == PU_FUN_CONNECT and data[2] == 0x00 and data[3] == 0x00:
             received_crc = (data[4] << 8) | data[5]
-            calculated_crc = calculate_crc16(data[:4], 4)
+            calculated_crc = calculate_crc16(data, 4)
             if received_crc == calculated_crc:
                 self.mcu_connected = True
-                self.log_func("MCU connected")
+                self._log(INFO, 'info', "MCU connected")
                 self.e0_handshake_stop.set()
                 return True
+            self._m_crc_errors.value += 1
         return False
 
     def start_e0_handshake(self):
@@ -168,10 +294,10 @@ class UARTService:
                     # 发送E0握手包
                     from protocol import generate_e0_handshake
                     e0_packet = generate_e0_handshake()
-                    self.uart.write(e0_packet)
-                    self.log_func("Send: " + ' '.join(f'{b:02X}' for b in e0_packet))
+                    self._send(e0_packet)
+                    self._log(DEBUG, 'tx', "Send: ", data=e0_packet)
                     if not not_connected_logged:
-                        self.log_func("MCU not connected")
+                        self._log(INFO, 'info', "MCU not connected")
                         not_connected_logged = True
                     time.sleep(0.5)
                 except Exception as e:
@@ -185,27 +311,29 @@ class UARTService:
         if fun_code == PU_FUN_MCU_WRITE_DATA:
             return
         resp = generate_status_response(fun_code, status_code)
-        self.uart.write(resp)
-        self.log_func(f"Send: {' '.join(f'{b:02X}' for b in resp)}")
+        self._send(resp)
+        self._log(DEBUG, 'tx', "Send: ", data=resp)
 
     def handle_serial_data(self, data):
         try:
             # 1. CRC校验
             received_crc = (data[-2] << 8) | data[-1]
-            calculated_crc = calculate_crc16(data[:-2], len(data)-2)
+            calculated_crc = calculate_crc16(data, len(data)-2)
             fun_code = data[1]
             data_len = (data[2] << 8) | data[3]
             # 2. 处理MCU主动上报包
             if fun_code in (0x40, 0x50, 0x60):
                 if received_crc != calculated_crc:
+                    self._m_crc_errors.value += 1
                     if self.response_40_50_getter():
                         self.send_status_response(fun_code, PU_STATUS_CRC_ERROR)
-                        self.log_func("serial_data: CRC error, discard: " + ' '.join(f'{b:02X}' for b in data))
+                        self._log(WARNING, 'rx', "serial_data: CRC error, discard: ", data=data)
                         return
                 if data_len % 6 != 0:
+                    self._m_length_errors.value += 1
                     if self.response_40_50_getter():
                         self.send_status_response(fun_code, PU_STATUS_DATA_LENGTH_ERROR)
-                        self.log_func(f"serial_data: invalid data_len for report, discard: " + ' '.join(f'{b:02X}' for b in data))
+                        self._log(WARNING, 'rx', "serial_data: invalid data_len for report, discard: ", data=data)
                         return
                 status_code = PU_STATUS_OK
                 for i in range(0, data_len, 6):
@@ -214,22 +342,23 @@ class UARTService:
                     item = self.addr_map.get(addr)
                     if item is None:
                         status_code = PU_STATUS_ADDRESS_ERROR
-                        self.log_func(f"MCU report: addr=0x{addr:04X}, value={raw_value}, status=ADDR_ERROR")
+                        self._m_addr_errors.value += 1
+                        self._log(WARNING, 'report', "MCU report: addr=0x%04X, value=%s, status=ADDR_ERROR", addr, raw_value)
                         break
                     else:
                         # Parse value according to item type
                         try:
-                            data_type = item.get('type', 'int32_t')
+                            data_type = item_type(item)
                             raw_data = data[6+i:10+i]  # 4 bytes
                             from protocol import unpack_value_by_type
                             parsed_value = unpack_value_by_type(raw_data, data_type)
-                            self.log_func(f"MCU report: addr=0x{addr:04X}, value={parsed_value} ({data_type}), status=OK")
+                            self._log(DEBUG, 'report', "MCU report: addr=0x%04X, value=%s (%s), status=OK", addr, parsed_value, data_type)
                             if self.gui_update_callback:
                                 self.gui_update_callback(addr, parsed_value)
                         except Exception as e:
                             # Fallback to original parsing
                             signed_value = to_signed(raw_value, bits=32)
-                            self.log_func(f"MCU report: addr=0x{addr:04X}, value={signed_value} (fallback), status=OK")
+                            self._log(DEBUG, 'report', "MCU report: addr=0x%04X, value=%s (fallback), status=OK", addr, signed_value)
                             if self.gui_update_callback:
                                 self.gui_update_callback(addr, signed_value)
                 if self.response_40_50_getter():
@@ -246,12 +375,12 @@ class UARTService:
                             if req['type'] == 'read' and resp_type == 0x11 and req['addr'] == addr:
                                 data_type = req.get('data_type', 'int32_t')
                                 result = parse_response(data, is_write=False, expected_addr=addr, data_type=data_type)
-                                req['callback'](result)
+                                self._complete(req, result)
                                 del self.pending_requests[req_id]
                                 return
                             elif req['type'] == 'write' and resp_type == 0xF1:
                                 result = parse_response(data, is_write=True)
-                                req['callback'](result)
+                                self._complete(req, result)
                                 del self.pending_requests[req_id]
                                 return
                             # === 新增升级包应答处理 ===
@@ -259,25 +388,48 @@ class UARTService:
                                 # 针对升级数据包
                                 if 'pack_index' in req and isinstance(req['pack_index'], int) and data[4] == PU_FUN_UPGRADE:
                                     result = parse_response(data, is_write=True)
-                                    req['callback'](result)
+                                    self._complete(req, result)
                                     del self.pending_requests[req_id]
                                     return
                                 # 针对升级CRC校验包
                                 elif req.get('pack_index') == 'crc' and data[4] == PU_FUN_UPGRADE_CRC:
                                     result = parse_response(data, is_write=True)
-                                    req['callback'](result)
+                                    self._complete(req, result)
                                     del self.pending_requests[req_id]
                                     return
         except Exception as e:
-            self.log_func(f"Error parsing serial data: {e}")
+            self._log(ERROR, 'error', "Error parsing serial data: %s", e)
 
-    def read_item(self, item, callback, timeout=2.0):
-        addr = int(item['index'], 16)
-        data_type = item.get('type', 'int32_t')
+    def _complete(self, req, result):
+        """应答已匹配到请求：记录延时/追踪并执行回调"""
+        sent = req.get('sent')
+        if sent is not None:
+            op = req['type']
+            if op == 'upgrade' and req.get('pack_index') == 'crc':
+                op = 'upgrade_crc'
+            rtt = time.perf_counter() - sent
+            self._m_latency[op].record(int(rtt * 1e6))
+            self.link.request_done(op, rtt)
+        trace_id = req.get('trace')
+        tracer = self.tracer
+        if trace_id is not None and tracer is not None:
+            tracer.mark(trace_id, FRAME_COMPLETE)
+            req['callback'](result)
+            tracer.mark(trace_id, CALLBACK)
+        else:
+            req['callback'](result)
+
+    def read_item(self, item, callback, timeout=2.0, trace_id=None):
+        addr = item_address(item)
+        data_type = item_type(item)
         cmd = generate_read_command(addr)
-        request_id = f"read_{addr}_{int(time.time()*1000)}"
-        def on_response(result, error=None):
+        trace_id = self._trace_begin(trace_id, 'read', addr)
+        request_id = f"read_{addr}_{next(self._request_seq)}"
+        # 应答可能在 write 返回前就被处理，回调要在登记请求时就绪
+        event = threading.Event()
+        def cb_wrap(result, error=None):
             callback(result, error)
+            event.set()
         with self.pending_lock:
             self.pending_requests[request_id] = {
                 'item': item,
@@ -285,29 +437,33 @@ class UARTService:
                 'addr': addr,
                 'data_type': data_type,
                 'time': time.time(),
-                'callback': on_response
+                'sent': time.perf_counter(),
+                'trace': trace_id,
+                'callback': cb_wrap
             }
-        self.uart.write(cmd)
-        self.log_func(f"Send: {' '.join(f'{b:02X}' for b in cmd)}")
+        self._send(cmd, 'read', trace_id)
+        self._log(DEBUG, 'tx', "Send: ", data=cmd)
         # 等待应答
-        event = threading.Event()
-        def cb_wrap(result, error=None):
-            callback(result, error)
-            event.set()
-        self.pending_requests[request_id]['callback'] = cb_wrap
         if not event.wait(timeout=timeout):
+            self._m_timeouts['read'].value += 1
+            if trace_id is not None and self.tracer is not None:
+                self.tracer.mark(trace_id, TIMEOUT)
             callback(None, error='timeout')
             with self.pending_lock:
                 if request_id in self.pending_requests:
                     del self.pending_requests[request_id]
 
-    def write_item(self, item, value, callback, timeout=2.0):
-        addr = int(item['index'], 16)
-        data_type = item.get('type', 'int32_t')
+    def write_item(self, item, value, callback, timeout=2.0, trace_id=None):
+        addr = item_address(item)
+        data_type = item_type(item)
         cmd = generate_write_command(addr, value, data_type)
-        request_id = f"write_{addr}_{int(time.time()*1000)}"
-        def on_response(result, error=None):
+        trace_id = self._trace_begin(trace_id, 'write', addr)
+        request_id = f"write_{addr}_{next(self._request_seq)}"
+        # 应答可能在 write 返回前就被处理，回调要在登记请求时就绪
+        event = threading.Event()
+        def cb_wrap(result, error=None):
             callback(result, error)
+            event.set()
         with self.pending_lock:
             self.pending_requests[request_id] = {
                 'item': item,
@@ -315,29 +471,37 @@ class UARTService:
                 'addr': addr,
                 'data_type': data_type,
                 'time': time.time(),
-                'callback': on_response
+                'sent': time.perf_counter(),
+                'trace': trace_id,
+                'callback': cb_wrap
             }
-        self.uart.write(cmd)
-        self.log_func(f"Send: {' '.join(f'{b:02X}' for b in cmd)}")
+        self._send(cmd, 'write', trace_id)
+        self._log(DEBUG, 'tx', "Send: ", data=cmd)
         # 等待应答
-        event = threading.Event()
-        def cb_wrap(result, error=None):
-            callback(result, error)
-            event.set()
-        self.pending_requests[request_id]['callback'] = cb_wrap
         if not event.wait(timeout=timeout):
+            self._m_timeouts['write'].value += 1
+            if trace_id is not None and self.tracer is not None:
+                self.tracer.mark(trace_id, TIMEOUT)
             callback(None, error='timeout')
             with self.pending_lock:
                 if request_id in self.pending_requests:
                     del self.pending_requests[request_id]
 
-    def upgrade_mcu(self, bin_data, progress_callback=None, timeout=2.0, max_retries=3):
-        if len(bin_data) % UPGRADE_PACKET_SIZE != 0:
-            self.log_func("upgrade failed bin size error")
-            return False, "upgrade failed bin size error"
-        packets = generate_upgrade_packets(bin_data)
+    def upgrade_mcu(self, bin_data=None, progress_callback=None, timeout=2.0, max_retries=3, image=None):
+        # image: upgrade_image.UpgradeImage，多个串口同时升级时共享同一个预计算镜像
+        if image is None:
+            if bin_data is None:
+                self._log(ERROR, 'upgrade', "No upgrade image: pass bin_data or image")
+                return False, "no upgrade image"
+            try:
+                from upgrade_image import get_upgrade_image
+                image = get_upgrade_image(bin_data)
+            except ValueError as e:
+                self._log(ERROR, 'upgrade', "%s", e)
+                return False, str(e)
+        packets = image.packets
         for upgrade_attempt in range(max_retries):
-            self.log_func(f"Upgrade attempt {upgrade_attempt+1}/{max_retries}")
+            self._log(INFO, 'upgrade', "Upgrade attempt %d/%d", upgrade_attempt + 1, max_retries)
             # 1. 发送所有数据包
             for i, frame in enumerate(packets):
                 retry_count = 0
@@ -354,31 +518,42 @@ class UARTService:
                                 ack_result['ok'] = False
                             ack_result['status_code'] = result.get('status_code', None)
                         ack_event.set()
+                    trace_id = self._trace_begin(None, 'upgrade', i)
+                    request_id = f'upgrade_{i}_{next(self._request_seq)}'
                     with self.pending_lock:
-                        self.pending_requests[f'upgrade_{i}_{int(time.time()*1000)}'] = {
+                        self.pending_requests[request_id] = {
                             'type': 'upgrade',
                             'pack_index': i,
                             'time': time.time(),
+                            'sent': time.perf_counter(),
+                            'trace': trace_id,
                             'callback': ack_callback
                         }
-                    self.uart.write(frame)
-                    self.log_func(f"Send upgrade pack {i+1}/{len(packets)} (try {retry_count+1}): {' '.join(f'{b:02X}' for b in frame[:16])} ... [{len(frame)} bytes]")
+                    self._send(frame, 'upgrade', trace_id)
+                    self._log(DEBUG, 'upgrade', "Send upgrade pack %d/%d (try %d): ", i + 1, len(packets), retry_count + 1,
+                              data=frame, data_limit=16)
                     if ack_event.wait(timeout=timeout):
                         if ack_result['ok']:
+                            if progress_callback:
+                                progress_callback(i+1, len(packets))
                             break
                         else:
-                            self.log_func(f"Upgrade pack {i+1} failed, status: {ack_result['status_code']}")
+                            self._log(ERROR, 'upgrade', "Upgrade pack %d failed, status: %s", i + 1, ack_result['status_code'])
                             return False, f"Upgrade pack {i+1} failed, status: {ack_result['status_code']}"
                     else:
                         retry_count += 1
-                        self.log_func(f"Upgrade pack {i+1} timeout, retry {retry_count}")
+                        self._drop_request(request_id)
+                        self._m_timeouts['upgrade'].value += 1
+                        if trace_id is not None and self.tracer is not None:
+                            self.tracer.mark(trace_id, TIMEOUT)
+                        self._log(WARNING, 'upgrade', "Upgrade pack %d timeout, retry %d", i + 1, retry_count)
                         if retry_count >= max_retries:
                             return False, f"Upgrade pack {i+1} timeout after {max_retries} retries"
                     if progress_callback:
                         progress_callback(i+1, len(packets))
                     time.sleep(0.05)
             # 2. 发送升级CRC校验命令
-            crc_cmd = generate_upgrade_crc_command(bin_data, len(packets))
+            crc_cmd = image.crc_command
             crc_ack_event = threading.Event()
             crc_ack_result = {'ok': False, 'status_code': None}
             def crc_ack_callback(result, error=None):
@@ -391,32 +566,46 @@ class UARTService:
                         crc_ack_result['ok'] = False
                     crc_ack_result['status_code'] = result.get('status_code', None)
                 crc_ack_event.set()
+            trace_id = self._trace_begin(None, 'upgrade_crc')
+            request_id = f'upgrade_crc_{next(self._request_seq)}'
             with self.pending_lock:
-                self.pending_requests[f'upgrade_crc_{int(time.time()*1000)}'] = {
+                self.pending_requests[request_id] = {
                     'type': 'upgrade',
                     'pack_index': 'crc',
                     'time': time.time(),
+                    'sent': time.perf_counter(),
+                    'trace': trace_id,
                     'callback': crc_ack_callback
                 }
             try:
-                self.uart.write(crc_cmd)
-                self.log_func(f"Send upgrade CRC command: {' '.join(f'{b:02X}' for b in crc_cmd)}")
+                self._send(crc_cmd, 'upgrade_crc', trace_id)
+                self._log(DEBUG, 'upgrade', "Send upgrade CRC command: ", data=crc_cmd)
             except Exception as e:
-                self.log_func(f"Error sending upgrade CRC command: {e}")
+                self._log(ERROR, 'upgrade', "Error sending upgrade CRC command: %s", e)
+                self._drop_request(request_id)
                 return False, f"Failed to send upgrade CRC command: {e}"
             # 3. 等待CRC回复
             if crc_ack_event.wait(timeout=10.0):
                 if crc_ack_result['ok']:
-                    self.log_func("Upgrade success")
+                    self._log(INFO, 'upgrade', "Upgrade success")
                     return True, f"Upgrade file sent, total {len(packets)} packets."
                 else:
-                    self.log_func(f"Upgrade CRC check failed, status: {crc_ack_result['status_code']}, retrying whole upgrade...")
+                    self._log(WARNING, 'upgrade', "Upgrade CRC check failed, status: %s, retrying whole upgrade...", crc_ack_result['status_code'])
                     continue  # 整个升级流程重试
             else:
-                self.log_func("Upgrade CRC check timeout, retrying whole upgrade...")
+                self._drop_request(request_id)
+                self._m_timeouts['upgrade_crc'].value += 1
+                if trace_id is not None and self.tracer is not None:
+                    self.tracer.mark(trace_id, TIMEOUT)
+                self._log(WARNING, 'upgrade', "Upgrade CRC check timeout, retrying whole upgrade...")
                 continue  # 整个升级流程重试
         return False, f"Upgrade failed after {max_retries} attempts."
 
+    def _drop_request(self, request_id):
+        # 超时的请求要从表中删除，否则长时间运行时 pending_requests 会一直增长
+        with self.pending_lock:
+            self.pending_requests.pop(request_id, None)
+
     def is_mcu_connected(self):
         return self.mcu_connected 
 
@@ -22,6 +22,23 @@ a = Analysis(
         'uart_service',
         'protocol',
         'utils',
+        'upgrade_image',
+        'transport',
+        'capture',
+        'log_index',
+        'log_viewer',
+        'metrics',
+        'metrics_panel',
+        'tracing',
+        'link_budget',
+        'register_table',
+        'ui_bus',
+        'register_map',
+        'startup_profiler',
+        'port_watcher',
+        'port_scanner',
+        'register_search',
+        'register_model',
     ],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,99 @@
+"""
+界面更新总线
+工作线程（请求回调、监听线程的上报、循环发送）不直接调用 Tk 控件或 StringVar，
+而是 post(地址, 字段, 值) 到一个“只保留最新值”的表中；Tk 线程每帧（after 定时）取走整张表，
+只应用有变化的项。上报洪泛时同一寄存器在一帧内的多次更新合并为一次。
+同时记录事件循环延迟（定时回调比预期晚了多少）和被合并掉的更新数
+"""
+import threading
+import time
+from metrics import MetricsRegistry
+
+UI_UPDATE_INTERVAL_MS = 16      # 约 60 帧/秒
+
+# 字段，与 register_table.CellVar.field 一致
+RESULT = 0
+INPUT = 1
+STATUS = 2
+
+class UIUpdateBus:
+    """
+    apply(key, field, value) 在 Tk 线程中应用一项更新；
+    call(fn, *args) 投递其他界面操作（按钮文字、追踪标记等），在同一帧的值更新之后按顺序执行
+    """
+    def __init__(self, root, apply, interval_ms=UI_UPDATE_INTERVAL_MS, metrics=None, log_func=None):
+        self.root = root
+        self.apply = apply
+        self.log_func = log_func or (lambda msg: None)
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._pending = {}      # (key, field) -> value，后到的覆盖先到的
+        self._calls = []
+        self._running = False
+        self._due = 0.0
+        metrics = metrics or MetricsRegistry()
+        self._m_posted = metrics.counter('gui_updates_posted_total', "Value updates posted to the UI bus")
+        self._m_applied = metrics.counter('gui_updates_applied_total', "Value updates applied by the UI thread")
+        self._m_coalesced = metrics.counter('gui_updates_coalesced_total',
+                                            "Value updates overwritten by a newer value before being applied")
+        self._m_lag = metrics.histogram('gui_event_loop_lag_us', "How late the UI update tick ran, in microseconds")
+        self._m_frame = metrics.histogram('gui_update_frame_us', "Time to apply one batch of UI updates, in microseconds")
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._schedule()
+
+    def stop(self):
+        self._running = False
+
+    def post(self, key, field, value):
+        """任意线程调用；同一 (key, field) 在应用前再次 post 时只保留最新值"""
+        entry = (key, field)
+        with self._lock:
+            if entry in self._pending:
+                self._m_coalesced.value += 1
+            self._pending[entry] = value
+            self._m_posted.value += 1
+
+    def call(self, fn, *args):
+        """任意线程调用，fn(*args) 在下一帧由 Tk 线程执行"""
+        with self._lock:
+            self._calls.append((fn, args))
+
+    def _schedule(self):
+        self._due = time.perf_counter() + self.interval_ms / 1000.0
+        self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        if not self._running:
+            return
+        start = time.perf_counter()
+        self._m_lag.record(max(int((start - self._due) * 1e6), 0))
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            calls, self._calls = self._calls, []
+        if pending or calls:
+            apply = self.apply
+            for (key, field), value in pending.items():
+                try:
+                    apply(key, field, value)
+                except Exception as e:
+                    self.log_func(f"UI update error: {e}")
+            for fn, args in calls:
+                try:
+                    fn(*args)
+                except Exception as e:
+                    self.log_func(f"UI call error: {e}")
+            self._m_applied.value += len(pending)
+            self._m_frame.record(int((time.perf_counter() - start) * 1e6))
+        self._schedule()
+
+    def stats(self):
+        return {
+            'posted': self._m_posted.value,
+            'applied': self._m_applied.value,
+            'coalesced': self._m_coalesced.value,
+            'pending': len(self._pending),
+            'lag_us': self._m_lag.summary(),
+        }
@@ -0,0 +1,62 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from protocol import generate_upgrade_packets, generate_upgrade_crc_command, UPGRADE_PACKET_SIZE
+
+# 进程内最多缓存的镜像个数（每个镜像约等于bin文件大小）
+MAX_CACHED_IMAGES = 4
+
+class UpgradeImage:
+    """
+    预计算好的升级镜像：所有升级包帧和最后的0x31 CRC校验帧
+    创建后不可修改，可以在多个串口/线程之间共享
+    """
+    __slots__ = ('digest', 'size', 'packets', 'crc_command')
+
+    def __init__(self, bin_data, digest=None):
+        object.__setattr__(self, 'digest', digest or hashlib.sha256(bin_data).hexdigest())
+        object.__setattr__(self, 'size', len(bin_data))
+        packets = generate_upgrade_packets(bin_data)
+        object.__setattr__(self, 'packets', tuple(bytes(p) for p in packets))
+        object.__setattr__(self, 'crc_command', bytes(generate_upgrade_crc_command(bin_data, len(packets))))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UpgradeImage is immutable")
+
+    @property
+    def pack_count(self):
+        return len(self.packets)
+
+    def __repr__(self):
+        return f"UpgradeImage({self.digest[:12]}, {self.size} bytes, {len(self.packets)} packets)"
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_upgrade_image(bin_data):
+    """
+    按bin内容的sha256取预计算镜像，没有则生成并缓存
+    bin大小不是UPGRADE_PACKET_SIZE整数倍时抛出ValueError
+    """
+    if len(bin_data) % UPGRADE_PACKET_SIZE != 0:
+        raise ValueError("upgrade failed bin size error")
+    digest = hashlib.sha256(bin_data).hexdigest()
+    with _cache_lock:
+        image = _cache.get(digest)
+        if image is not None:
+            _cache.move_to_end(digest)
+            return image
+    # 生成过程在锁外进行，多个线程同时生成同一个镜像时以先写入的为准
+    image = UpgradeImage(bin_data, digest)
+    with _cache_lock:
+        existing = _cache.get(image.digest)
+        if existing is not None:
+            return existing
+        _cache[image.digest] = image
+        while len(_cache) > MAX_CACHED_IMAGES:
+            _cache.popitem(last=False)
+    return image
+
+def clear_image_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -16,16 +16,15 @@ def get_resource_path(filename):
     return os.path.join(base_path, filename)
 
 def format_bytes(data):
-    if isinstance(data, (bytes, bytearray)):
-        return ' '.join([f"{b:02X}" for b in data])
-    return ' '.join([f"{b:02X}" for b in data])
+    return bytes(data).hex(' ').upper()
 
 def create_tooltip(widget, text):
+    """text 可以是函数，显示时再取文本（复用的控件绑定的内容会变）"""
     def show_tooltip(event):
         tooltip = tk.Toplevel()
         tooltip.wm_overrideredirect(True)
         tooltip.wm_geometry(f"+{event.x_root+10}+{event.y_root+10}")
-        label = ttk.Label(tooltip, text=text, justify='left', relief='solid', borderwidth=1)
+        label = ttk.Label(tooltip, text=text() if callable(text) else text, justify='left', relief='solid', borderwidth=1)
         label.pack()
         def hide_tooltip():
             tooltip.destroy()